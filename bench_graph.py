@@ -0,0 +1,177 @@
+# bench_graph.py
+"""
+Benchmark del motor de copia contra mock_graph.py (sin tocar el tenant).
+
+Por cada escenario (masiva / detracciones) y cantidad de filas arma un Excel
+(CSV) y los archivos de origen en una carpeta temporal, siembra en el mock la
+base con los meses y una carpeta por fila, y corre process_masiva /
+process_detracciones tal cual lo hace el script. Informa requests emitidos
+(HTTP y sub-requests de $batch), 429 inyectados, tiempo total y subidas/seg.
+
+Uso:
+    python bench_graph.py                                # 100, 1k y 10k filas
+    python bench_graph.py --rows 1000 --workers 1 8 --latency 0.02 --throttle 0.02
+    python bench_graph.py --json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from mock_graph import MockGraphServer
+
+MESES = ["01. ENERO", "02. FEBRERO", "03. MARZO", "04. ABRIL", "05. MAYO", "06. JUNIO",
+         "07. JULIO", "08. AGOSTO", "09. SETIEMBRE", "10. OCTUBRE", "11. NOVIEMBRE", "12. DICIEMBRE"]
+BASE_PATH = "LJC/2025"
+SCENARIOS = ("masiva", "detracciones")
+
+
+def folder_name(i: int) -> str:
+    return f"0701-{i:05d} CLIENTE {i}"
+
+
+def comprobante(i: int) -> str:
+    return f"F001-{i:06d}"
+
+
+def make_inputs(workdir: Path, rows: int, file_kb: int) -> Dict[str, Path]:
+    """Excel (CSV), archivo único de masiva y carpeta de PDFs de detracciones."""
+    excel = workdir / "bench.csv"
+    with open(excel, "w", encoding="utf-8") as f:
+        f.write("CARPETAS,COMPROBANTE\n")
+        for i in range(rows):
+            f.write(f"0701-{i:05d},{comprobante(i)}\n")
+    same_file = workdir / "masivo.pdf"
+    same_file.write_bytes(os.urandom(file_kb * 1024))
+    src_dir = workdir / "pdfs"
+    src_dir.mkdir()
+    body = os.urandom(1024)
+    for i in range(rows):
+        (src_dir / f"{comprobante(i)}.pdf").write_bytes(body)
+    return {"excel": excel, "same_file": same_file, "src_dir": src_dir}
+
+
+def run_scenario(bulk, server: MockGraphServer, scenario: str, rows: int, months: int, workers: int,
+                 server_copy: bool, file_kb: int) -> Dict:
+    from graph_client import AdaptiveLimiter, GraphClient, RetryPolicy
+    from upload_session import DEFAULT_SESSION_STORE, UploadSessionStore
+
+    graph = server.graph
+    graph.reset()
+    names = [folder_name(i) for i in range(rows)]
+    for mes in MESES[:months]:
+        graph.drive.seed(f"{BASE_PATH}/{mes}", names)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_graph_") as tmp:
+        workdir = Path(tmp)
+        inputs = make_inputs(workdir, rows, file_kb)
+        limiter = AdaptiveLimiter(initial=max(workers // 2, 1), maximum=max(workers, 4)) if workers > 1 else None
+        client = GraphClient("bench", pool_size=max(workers, 4) + 2,
+                             retry=RetryPolicy(base_delay=0.05, budget=100_000), limiter=limiter)
+        os.chdir(workdir)  # .upload_sessions.json queda en la carpeta temporal
+        saved_row_cache = os.environ.get("GRAPH_ROW_CACHE")
+        os.environ["GRAPH_ROW_CACHE"] = str(workdir / "row_cache")  # la caché del usuario no se toca
+        bulk.SESSIONS = UploadSessionStore(workdir / DEFAULT_SESSION_STORE)  # uno por corrida
+        log = io.StringIO()
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(log):
+                ids = bulk.resolve_site_and_drive(client)
+                if scenario == "masiva":
+                    bulk.process_masiva(client, ids["site_id"], ids["drive_id"], BASE_PATH, str(inputs["excel"]),
+                                        str(inputs["same_file"]), None, False, workers=workers,
+                                        server_copy=server_copy)
+                else:
+                    bulk.process_detracciones(client, ids["site_id"], ids["drive_id"], BASE_PATH, str(inputs["excel"]),
+                                              str(inputs["src_dir"]), None, ".pdf", False, workers=workers)
+            wall = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+            if saved_row_cache is None:
+                os.environ.pop("GRAPH_ROW_CACHE", None)
+            else:
+                os.environ["GRAPH_ROW_CACHE"] = saved_row_cache
+            bulk.PAYLOADS.close_all()
+            client.close()
+
+    stats = graph.snapshot()
+    expected = rows * months
+    # En --server-copy el archivo temporal del staging se borra al final: no cuenta
+    uploads = stats.get("files", 0)
+    return {
+        "scenario": scenario + (" (server-copy)" if server_copy and scenario == "masiva" else ""),
+        "rows": rows,
+        "months": months,
+        "workers": workers,
+        "uploads": uploads,
+        "expected": expected,
+        "requests": stats.get("requests", 0),
+        "http_requests": stats.get("http_requests", 0),
+        "batch_subrequests": stats.get("batch_subrequests", 0),
+        "throttled": stats.get("throttled", 0),
+        "wall_s": round(wall, 3),
+        "uploads_per_s": round(uploads / wall, 1) if wall else None,
+        "by_kind": {k: v for k, v in sorted(stats.items()) if " " in k},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de copia contra un Graph simulado")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rows", nargs="+", type=int, default=[100, 1000, 10000], help="Filas del Excel por corrida")
+    parser.add_argument("--months", type=int, default=1, help="Meses sembrados en la base (1-12)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 8], help="Valores de --workers a medir")
+    parser.add_argument("--server-copy", action="store_true", help="Masiva con --server-copy (/copy en el servidor)")
+    parser.add_argument("--file-kb", type=int, default=100, help="Tamaño del archivo único de masiva (KB)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por request (segundos)")
+    parser.add_argument("--page-size", type=int, default=200, help="Items por página de /children")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Proporción de requests con 429 (0-1)")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After de los 429 (segundos)")
+    parser.add_argument("--json", default=None, help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+    if not 1 <= args.months <= len(MESES):
+        parser.error(f"--months debe estar entre 1 y {len(MESES)}")
+
+    server = MockGraphServer(latency=args.latency, page_size=args.page_size, throttle_rate=args.throttle,
+                             retry_after=args.retry_after).start()
+    # La URL base de Graph se fija al importar graph_client: primero el mock, después el script
+    os.environ["GRAPH_BASE_URL"] = server.graph_url
+    import bulk_copy_sharepoint_graph as bulk
+
+    bulk.SITE_HOSTNAME = server.graph.site_host
+    bulk.SITE_REL_PATH = server.graph.site_path
+    bulk.DRIVE_NAME = server.graph.drive.drive_name
+    bulk.MESES = MESES[:args.months]
+
+    results: List[Dict] = []
+    print(f"{'escenario':26} {'filas':>6} {'hilos':>5} {'subidas':>8} {'requests':>9} {'429':>5} "
+          f"{'seg':>8} {'subidas/s':>10}")
+    try:
+        for scenario in args.scenarios:
+            for rows in args.rows:
+                for workers in args.workers:
+                    r = run_scenario(bulk, server, scenario, rows, args.months, workers, args.server_copy,
+                                     args.file_kb)
+                    results.append(r)
+                    flag = "" if r["uploads"] == r["expected"] else f"  ⚠️ se esperaban {r['expected']}"
+                    print(f"{r['scenario']:26} {r['rows']:>6} {r['workers']:>5} {r['uploads']:>8} "
+                          f"{r['requests']:>9} {r['throttled']:>5} {r['wall_s']:>8.2f} "
+                          f"{r['uploads_per_s'] or 0:>10.1f}{flag}")
+    finally:
+        server.stop()
+
+    if args.json:
+        payload = {"python": sys.version.split()[0], "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "options": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}
+        Path(args.json).write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
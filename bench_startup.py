@@ -0,0 +1,147 @@
+# bench_startup.py
+"""
+Benchmark de arranque de cada script de entrada.
+
+Por cada entry point mide, en procesos nuevos:
+  - import_ms: costo de importar el módulo (python -X importtime), con los
+    imports directos más pesados;
+  - first_request_ms: desde que arranca el proceso hasta su primera llamada
+    de red (se intercepta socket.getaddrinfo y el proceso termina ahí, así
+    que no se contacta a Graph ni a Entra ID);
+  - help_ms (si el script tiene --help): lo que tarda en mostrar la ayuda.
+
+Uso:
+    python bench_startup.py                 # tabla por consola
+    python bench_startup.py --repeat 5 --json startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+MARKER = "@@FIRST_NETWORK_CALL@@"
+
+# nombre → (script, argumentos, stdin, tiene --help)
+ENTRY_POINTS = {
+    "bulk_copy_sharepoint_graph": ("bulk_copy_sharepoint_graph.py",
+                                   ["--mode", "masiva", "--excel", "masivo.xlsx", "--same-file", "masivo.pdf", "--dry"],
+                                   None, True),
+    "copy_children": ("copy_children.py", [], None, False),
+    "index": ("index.py", [], "1\n", False),
+    "copy_graph_batch": ("copy_graph_batch.py", [], None, False),
+    "extraer_detracciones": ("extraer_detracciones.py", None, None, False),  # sin red: solo import
+}
+
+# Corre el script como __main__ y corta en el primer acceso a red (resolución DNS)
+_WRAPPER = f"""
+import os, runpy, socket, sys
+def _first_network_call(host, *a, **k):
+    sys.stdout.write("\\n{MARKER} %s\\n" % host)
+    sys.stdout.flush()
+    os._exit(0)
+socket.getaddrinfo = _first_network_call
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def import_profile(module: str) -> Dict:
+    """Total de -X importtime para `import module` y sus imports directos más pesados."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       cwd=ROOT, capture_output=True, text=True)
+    total_us = 0
+    direct: List = []
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        # La sangría indica la profundidad: 1 espacio = nivel superior, 3 = import directo de ese módulo
+        if len(name) - len(name.lstrip()) == 3:
+            direct.append((int(cumulative), name.strip()))
+    heavy = sorted(direct, reverse=True)[:5]
+    return {"import_ms": total_us / 1000, "heaviest": [f"{n} {us / 1000:.0f}ms" for us, n in heavy],
+            "import_ok": r.returncode == 0}
+
+
+def first_request(script: str, args: List[str], stdin: Optional[str], timeout: float = 120) -> Dict:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", _WRAPPER, script, *args], cwd=ROOT, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if stdin:
+        proc.stdin.write(stdin)
+    proc.stdin.close()
+    host = None
+    deadline = start + timeout
+    for line in proc.stdout:
+        if line.startswith(MARKER):
+            host = line[len(MARKER):].strip()
+            break
+        if time.perf_counter() > deadline:
+            proc.kill()
+            break
+    elapsed = (time.perf_counter() - start) * 1000
+    proc.wait()
+    return {"first_request_ms": elapsed if host else None, "first_host": host,
+            "exit_ms": None if host else elapsed}
+
+
+def help_time(script: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, script, "--help"], cwd=ROOT, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def bench(names: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name in names:
+        script, args, stdin, has_help = ENTRY_POINTS[name]
+        imports = [import_profile(name) for _ in range(repeat)]
+        row = {"import_ms": _median([i["import_ms"] for i in imports]), "heaviest": imports[-1]["heaviest"]}
+        if args is not None:
+            runs = [first_request(script, args, stdin) for _ in range(repeat)]
+            row["first_request_ms"] = _median([r["first_request_ms"] for r in runs])
+            row["first_host"] = runs[-1]["first_host"]
+            if row["first_request_ms"] is None:
+                row["exit_ms"] = _median([r["exit_ms"] for r in runs])
+        if has_help:
+            row["help_ms"] = _median([help_time(script) for _ in range(repeat)])
+        results[name] = row
+    return results
+
+
+def _fmt(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de los scripts")
+    parser.add_argument("--repeat", type=int, default=3, help="Corridas por medición (se informa la mediana)")
+    parser.add_argument("--only", nargs="*", choices=sorted(ENTRY_POINTS), help="Medir solo estos entry points")
+    parser.add_argument("--json", default=None, help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    results = bench(args.only or list(ENTRY_POINTS), max(args.repeat, 1))
+    print(f"{'entry point':28} {'import ms':>10} {'1ª red ms':>10} {'--help ms':>10}  imports más pesados")
+    for name, r in results.items():
+        print(f"{name:28} {_fmt(r['import_ms']):>10} {_fmt(r.get('first_request_ms')):>10} "
+              f"{_fmt(r.get('help_ms')):>10}  {', '.join(r['heaviest'][:3])}")
+        if r.get("first_host"):
+            print(f"{'':28} primera llamada de red a {r['first_host']}")
+    if args.json:
+        payload = {"python": sys.version.split()[0], "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+        Path(args.json).write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
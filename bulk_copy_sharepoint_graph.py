@@ -1,79 +1,139 @@
 import os
-import re
 import sys
 import json
 import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.parse import quote
 
 import requests
-import pandas as pd
+
+from folder_index import FolderNameIndex
+from local_index import LocalFileIndex
+from copy_plan import (check_sources, parse_shard, read_plan, read_shard_results, shard_tasks,
+                       write_plan, write_shard_result)
+from graph_batch import batch_get, batch_list
+from graph_client import GRAPH, AdaptiveLimiter, GraphClient, RetryPolicy, TokenSource
+from graph_metrics import GraphMetrics
+from progress_events import EventStream
+from folder_mirror import FolderMirror, DEFAULT_MIRROR_DB
+from payload_cache import PayloadCache
+from quickxorhash import hash_files
+from run_journal import RunJournal, journal_path_for, shard_journal_path
+from site_cache import DEFAULT_SITE_CACHE, DEFAULT_TTL, SiteCache, SiteNotFound
+from upload_session import UploadSessionStore, upload_resumable
+from token_provider import DEFAULT_TOKEN_CACHE, TokenProvider
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ============ CONFIG ============
-# Credenciales (App Registration en Entra ID)
-with open("config_tenant.json", "r", encoding="utf-8") as f:
-    config = json.load(f)
+# Se lee en load_config() al ejecutar, no al importar: --help o un error de
+# argumentos no tocan disco ni red. Los valores de abajo son los de antes de cargarla.
+CONFIG_FILE = os.environ.get("GRAPH_CONFIG_FILE", "config_tenant.json")
 
-TENANT_ID     = config["sharepoint"]["tenant_id"]
-CLIENT_ID     = config["sharepoint"]["client_id"]
-CLIENT_SECRET = config["sharepoint"]["client_secret"]
+# Credenciales (App Registration en Entra ID)
+TENANT_ID     = None
+CLIENT_ID     = None
+CLIENT_SECRET = None
 
 # Sitio de SharePoint (ajústalo a tu tenant)
 SITE_HOSTNAME = os.environ.get("GRAPH_SITE_HOSTNAME", "lajoyaminingsac.sharepoint.com")
 # Ruta del sitio (Site relative path). Ej: /sites/Finanzas  o  /teams/Finanzas
-SITE_REL_PATH = config["sharepoint"]["site_name"]
-DRIVE_NAME = config["sharepoint"]["document_library"]
+SITE_REL_PATH = None
+DRIVE_NAME = None
 
 # Ruta BASE fija que pediste:
-BASE_PATH = config["sharepoint"]["base_path"]
+BASE_PATH = None
 
 # Lista de meses a verificar (en el orden que quieras):
-MESES = config["sharepoint"]["lista_meses"]
+MESES: List[str] = []
 # Si quieres solo nombres simples, usa: ["ENERO","FEBRERO",...,"DICIEMBRE"]
+
+# Carpeta (relativa al drive) donde se deja el archivo único en modo --server-copy
+STAGING_PATH = "_staging_copias"
+# Tiempo máximo de espera por cada /copy antes de caer a subida directa (segundos)
+COPY_TIMEOUT = 300
+
+# Caché MSAL en disco: invocaciones repetidas (p.ej. desde la UI) no vuelven a pedir token
+TOKEN_CACHE = os.environ.get("GRAPH_TOKEN_CACHE", DEFAULT_TOKEN_CACHE)
+# site_id/drive_id ya resueltos, por (host, sitio, biblioteca); GRAPH_SITE_CACHE="" la desactiva
+SITE_CACHE_FILE = os.environ.get("GRAPH_SITE_CACHE", DEFAULT_SITE_CACHE)
+SITE_CACHE_TTL = float(os.environ.get("GRAPH_SITE_CACHE_TTL", DEFAULT_TTL))
 # =================================
 
+# Contenido de los archivos a subir: un mmap por archivo compartido por todas las subidas
+PAYLOADS = PayloadCache()
+# Desde este tamaño se sube con upload session reanudable en vez de un solo PUT
+LARGE_FILE_THRESHOLD = 4 * 1024 * 1024
+# uploadUrl de sesiones en curso, para reanudar tras un corte
+SESSIONS = UploadSessionStore()
+# Llamadas a Graph, duración por etapa y throughput de subidas (--metrics-out)
+METRICS = GraphMetrics()
+# Eventos JSON por línea para la UI (--events)
+EVENTS = EventStream()
+SITE_CACHE = SiteCache(SITE_CACHE_FILE or None, SITE_CACHE_TTL)
+
+
+def load_config(path: str = CONFIG_FILE) -> Dict:
+    """Carga config_tenant.json en las constantes del módulo (una sola vez por proceso)."""
+    global TENANT_ID, CLIENT_ID, CLIENT_SECRET, SITE_REL_PATH, DRIVE_NAME, BASE_PATH, MESES, STAGING_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    sp = config["sharepoint"]
+    TENANT_ID     = sp["tenant_id"]
+    CLIENT_ID     = sp["client_id"]
+    CLIENT_SECRET = sp["client_secret"]
+    SITE_REL_PATH = sp["site_name"]
+    DRIVE_NAME    = sp["document_library"]
+    BASE_PATH     = sp["base_path"]
+    MESES         = sp["lista_meses"]
+    STAGING_PATH  = sp.get("staging_path", STAGING_PATH)
+    return config
+
 
 # ---------- Autenticación / llamadas Graph ----------
-def graph_token() -> str:
-    url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
-    data = {
-        "client_id": CLIENT_ID,
-        "scope": "https://graph.microsoft.com/.default",
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials",
-    }
-    r = requests.post(url, data=data)
-    r.raise_for_status()
-    return r.json()["access_token"]
-
-def gget(token: str, url: str, params=None):
-    r = requests.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
-    r.raise_for_status()
-    return r.json()
-
-def gput_upload(token: str, upload_url: str, content: bytes):
-    r = requests.put(
-        upload_url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/octet-stream",
-        },
-        data=content,
-    )
-    r.raise_for_status()
-    return r.json()
+def graph_token() -> TokenSource:
+    """Token renovable: caché MSAL persistida + renovación en segundo plano antes de expirar."""
+    # Token fijo (p.ej. contra mock_graph.py): no se llama a Entra ID
+    if os.environ.get("GRAPH_ACCESS_TOKEN"):
+        return os.environ["GRAPH_ACCESS_TOKEN"]
+    return TokenProvider(TENANT_ID, CLIENT_ID, CLIENT_SECRET, cache_path=TOKEN_CACHE).start_background_refresh()
+
+def gbatch_get(client: GraphClient, urls: List[str]) -> List[Optional[Dict]]:
+    """Varios GET independientes en un solo POST /$batch (None = 404)."""
+    return batch_get(partial(client.post, idempotent=True), client.get, urls)
+
+def gbatch_list(client: GraphClient, urls: List[str]) -> List[Optional[List[Dict]]]:
+    """Igual que gbatch_get pero siguiendo los nextLink de cada colección."""
+    return batch_list(partial(client.post, idempotent=True), client.get, urls)
+
+def gput_upload(client: GraphClient, upload_url: str, content):
+    return client.put(upload_url, data=content, headers={"Content-Type": "application/octet-stream"})
 
 # ---------- Resolución de sitio/drive y navegación ----------
-def resolve_site_and_drive(token: str) -> Dict[str, str]:
-    # 1) site
-    site = gget(
-        token,
-        f"https://graph.microsoft.com/v1.0/sites/{SITE_HOSTNAME}:{SITE_REL_PATH}"
-    )
+def resolve_site_and_drive(client: GraphClient) -> Dict[str, str]:
+    """site_id/drive_id desde la caché de resolución o, si no están (o vencieron), desde Graph."""
+    ids, _ = SITE_CACHE.resolve(SITE_HOSTNAME, SITE_REL_PATH, DRIVE_NAME, lambda: lookup_site_and_drive(client))
+    return ids
+
+def check_drive(client: GraphClient, ids: Dict[str, str]) -> Dict:
+    """GET barato del root del drive: da 404 si el sitio o la biblioteca ya no existen con esos ids."""
+    return client.get(f"{GRAPH}/sites/{ids['site_id']}/drives/{ids['drive_id']}/root", params={"$select": "id"})
+
+def lookup_site_and_drive(client: GraphClient) -> Dict[str, str]:
+    # 1) site y 2) drives (bibliotecas) del sitio, ambos direccionados por ruta en un solo $batch
+    site_url = f"{GRAPH}/sites/{SITE_HOSTNAME}:{SITE_REL_PATH}"
+    site, drives_page = gbatch_get(client, [site_url, f"{site_url}:/drives"])
+    if not site or drives_page is None:
+        raise RuntimeError(f"No encontré el sitio '{SITE_HOSTNAME}:{SITE_REL_PATH}'")
     site_id = site["id"]
-
-    # 2) drives (bibliotecas) del sitio
-    drives = gget(token, f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives")["value"]
+    drives = drives_page.get("value", [])
 
     # 3) buscar por nombre exacto (case-insensitive)
     drive = next(
@@ -86,14 +146,14 @@ def resolve_site_and_drive(token: str) -> Dict[str, str]:
 
     return {"site_id": site_id, "drive_id": drive["id"]}
 
-def list_children(token: str, site_id: str, drive_id: str, parent_item_id: str) -> List[Dict]:
+def list_children(client: GraphClient, site_id: str, drive_id: str, parent_item_id: str) -> List[Dict]:
     """
     Lista hijos inmediatos de una carpeta por item-id.
     """
-    url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}/children"
+    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}/children"
     items = []
     while True:
-        j = gget(token, url)
+        j = client.get(url)
         items.extend(j.get("value", []))
         if "@odata.nextLink" in j:
             url = j["@odata.nextLink"]
@@ -101,106 +161,385 @@ def list_children(token: str, site_id: str, drive_id: str, parent_item_id: str)
             break
     return items
 
-def get_item_by_path(token: str, site_id: str, drive_id: str, rel_path: str) -> Dict:
+def list_children_many(client: GraphClient, site_id: str, drive_id: str, parent_item_ids: List[str],
+                       select: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Lista los hijos de varias carpetas a la vez (vía $batch, de 20 en 20).
+    """
+    query = f"?$select={select}" if select else ""
+    urls = [f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{pid}/children{query}"
+            for pid in parent_item_ids]
+    return {pid: items or [] for pid, items in zip(parent_item_ids, gbatch_list(client, urls))}
+
+def get_item_by_path(client: GraphClient, site_id: str, drive_id: str, rel_path: str) -> Dict:
     """
     Obtiene un item (carpeta/archivo) por path relativo al drive.
     Si no existe, lanza error.
     """
     rel = "/" + rel_path.strip("/")
-    url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root:{rel}"
-    return gget(token, url)
+    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/root:{rel}"
+    return client.get(url)
 
-def ensure_path_exists(token: str, site_id: str, drive_id: str, rel_path: str) -> Dict:
+def ensure_path_exists(client: GraphClient, site_id: str, drive_id: str, rel_path: str) -> Dict:
     """
     Navega segmento a segmento y devuelve el item final (no crea nuevas carpetas;
     si quisieras crear, aquí puedes añadir POST a children para crear faltantes).
     """
     rel_path = rel_path.strip("/")
+    drive_url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}"
     if not rel_path:
-        return gget(token, f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root")
+        return client.get(f"{drive_url}/root")
 
+    # root + cada ruta parcial ('A', 'A/B', 'A/B/C') son GET independientes: un solo $batch
     segments = rel_path.split("/")
-    current = gget(token, f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root")
-    for seg in segments:
-        # Buscar hijo con ese nombre exacto
-        childs = list_children(token, site_id, drive_id, current["id"])
-        nxt = next((c for c in childs if c["name"].strip().lower() == seg.strip().lower() and "folder" in c), None)
-        if not nxt:
+    urls = [f"{drive_url}/root"] + [
+        f"{drive_url}/root:/{quote('/'.join(segments[:n + 1]), safe='/')}" for n in range(len(segments))
+    ]
+    items = gbatch_get(client, urls)
+    current = items[0]
+    if current is None:
+        raise SiteNotFound(f"No existe la biblioteca {drive_id} del sitio {site_id} (404)")
+    for seg, nxt in zip(segments, items[1:]):
+        if not nxt or "folder" not in nxt:
             raise FileNotFoundError(f"No existe la carpeta: {seg} en {current['name']}")
         current = nxt
     return current  # carpeta final
 
 # ---------- Utilidades de matching ----------
-def starts_with_folder(child_name: str, prefix: str) -> bool:
-    return child_name.strip().upper().startswith(prefix.strip().upper())
-
-def find_child_folders_by_prefix(token: str, site_id: str, drive_id: str, parent_id: str, prefix: str) -> List[Dict]:
-    items = list_children(token, site_id, drive_id, parent_id)
-    return [it for it in items if it.get("folder") and starts_with_folder(it.get("name",""), prefix)]
-
-def find_local_file_by_token(src_dir: Path, token: str, ext: Optional[str] = None) -> Optional[Path]:
-    token = str(token).strip()
-    if not token:
-        return None
-    patt = re.compile(re.escape(token))
-    for p in src_dir.rglob("*"):
-        if p.is_file():
-            if ext and p.suffix.lower() != ext.lower():
-                continue
-            if patt.search(p.name):
-                return p
-    return None
+def index_child_folders(client: GraphClient, site_id: str, drive_id: str, parent_id: str, mirror: Optional[FolderMirror] = None) -> FolderNameIndex:
+    """
+    Lista UNA sola vez las subcarpetas de parent_id y las indexa por nombre.
+    El resultado se reutiliza para todas las filas del Excel durante la corrida.
+    Con espejo local (--mirror) no hay llamadas a Graph.
+    """
+    items = mirror.children(parent_id) if mirror else list_children(client, site_id, drive_id, parent_id)
+    return FolderNameIndex(it for it in items if it.get("folder"))
 
-def upload_file_to_folder(token: str, site_id: str, drive_id: str, folder_id: str, local_path: Path) -> Dict:
-    upload_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{local_path.name}:/content"
-    return gput_upload(token, upload_url, local_path.read_bytes())
+def list_child_folders_many(client: GraphClient, site_id: str, drive_id: str, parent_ids: List[str], mirror: Optional[FolderMirror] = None) -> Dict[str, List[Dict]]:
+    """Subcarpetas de varias carpetas (p.ej. todos los meses) con un solo $batch por cada 20."""
+    if mirror:
+        listings = {pid: mirror.children(pid) for pid in parent_ids}
+    else:
+        listings = list_children_many(client, site_id, drive_id, parent_ids)
+    return {pid: [it for it in items if it.get("folder")] for pid, items in listings.items()}
+
+def match_local_files(src_index: LocalFileIndex, tokens) -> Dict[str, Path]:
+    """Comprobante → archivo local (el primero si hay varios); avisa los ambiguos una sola vez."""
+    matches = src_index.match(tokens)
+    for tok, paths in sorted(src_index.ambiguous(matches).items()):
+        print(f"  ⚠️  Comprobante '{tok}' coincide con {len(paths)} archivos; se usa '{paths[0]}' "
+              f"(otros: {', '.join(p.name for p in paths[1:4])}{'…' if len(paths) > 4 else ''})")
+    return {tok: paths[0] for tok, paths in matches.items() if paths}
+
+def upload_file_to_folder(client: GraphClient, site_id: str, drive_id: str, folder_id: str, local_path: Path) -> Dict:
+    item_url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{quote(local_path.name)}:"
+    if local_path.stat().st_size >= LARGE_FILE_THRESHOLD:
+        return upload_resumable(client, f"{item_url}/createUploadSession", local_path, store=SESSIONS, payloads=PAYLOADS)
+    with PAYLOADS.open(local_path) as body:
+        return gput_upload(client, f"{item_url}/content", body)
+
+
+# ---------- Ejecución de subidas (secuencial o con pool de hilos) ----------
+# Semáforo por drive: limita subidas simultáneas contra una misma biblioteca
+_drive_slots: Dict[str, threading.BoundedSemaphore] = {}
+_drive_slots_lock = threading.Lock()
+
+def drive_slot(drive_id: str, limit: int) -> threading.BoundedSemaphore:
+    with _drive_slots_lock:
+        if drive_id not in _drive_slots:
+            _drive_slots[drive_id] = threading.BoundedSemaphore(limit)
+        return _drive_slots[drive_id]
+
+def task_event(task: Dict) -> Dict:
+    """Campos de una tarea para los eventos de progreso."""
+    return {"row": task["row"], "file": task["local_path"].name, "folder": task["folder"].get("name", ""),
+            "mes": task.get("mes", ""), "size": task.get("size") or task["local_path"].stat().st_size}
+
+def upload_task(client: GraphClient, site_id: str, drive_id: str, task: Dict, journal: Optional[RunJournal] = None,
+                announced: bool = False) -> Dict:
+    """announced: el "started" de la tarea ya se emitió (respaldo de --server-copy)."""
+    # Sin --events no se arma el evento (task_event hace stat() del archivo local)
+    info = task_event(task) if EVENTS.enabled else None
+    if info and not announced:
+        EVENTS.emit("started", **info)
+    start = time.perf_counter()
+    try:
+        up = upload_file_to_folder(client, site_id, drive_id, task["folder"]["id"], task["local_path"])
+    except Exception as e:
+        if info:
+            EVENTS.emit("failed", **info, error=str(e))
+        raise
+    elapsed = time.perf_counter() - start
+    METRICS.record_upload(up.get("size") or task.get("size") or 0, elapsed)
+    if info:
+        EVENTS.emit("uploaded", **info, seconds=round(elapsed, 3), url=up.get("webUrl"))
+    if journal is not None:
+        journal.record(task["row"], task["folder"]["id"], task["local_path"])
+    return up
+
+def run_upload_task(client: GraphClient, site_id: str, drive_id: str, task: Dict, drive_limit: int,
+                    journal: Optional[RunJournal] = None, announced: bool = False) -> Dict:
+    with drive_slot(drive_id, drive_limit):
+        return upload_task(client, site_id, drive_id, task, journal, announced)
+
+def skip_identical(client: GraphClient, site_id: str, drive_id: str, tasks: List[Dict]) -> List[Dict]:
+    """
+    --skip-identical: descarta las tareas cuyo destino ya tiene un archivo con
+    el mismo nombre y el mismo quickXorHash que el archivo local.
+    """
+    if not tasks:
+        return tasks
+    local_hashes = hash_files(t["local_path"] for t in tasks)
+    folder_ids = list(dict.fromkeys(t["folder"]["id"] for t in tasks))
+    listings = list_children_many(client, site_id, drive_id, folder_ids, select="name,file")
+    remote = {
+        (fid, it.get("name", "").lower()): ((it.get("file") or {}).get("hashes") or {}).get("quickXorHash")
+        for fid, items in listings.items() for it in items if it.get("file")
+    }
+    pending = [
+        t for t in tasks
+        if remote.get((t["folder"]["id"], t["local_path"].name.lower())) != local_hashes[str(t["local_path"])]
+    ]
+    if len(pending) < len(tasks):
+        print(f"  ＝ {len(tasks) - len(pending)} destino(s) ya tienen el archivo idéntico; se omiten")
+        EVENTS.emit("skipped", count=len(tasks) - len(pending), reason="identical")
+    return pending
+
+def skip_journaled(tasks: List[Dict], journal: Optional[RunJournal]) -> List[Dict]:
+    """--resume: descarta las tareas que la bitácora ya registra como subidas."""
+    if journal is None:
+        return tasks
+    pending = [t for t in tasks if not journal.is_done(t["row"], t["folder"]["id"], t["local_path"])]
+    if len(pending) < len(tasks):
+        print(f"  ↷ {len(tasks) - len(pending)} subida(s) ya registradas en {journal.path.name}; se omiten")
+        EVENTS.emit("skipped", count=len(tasks) - len(pending), reason="resume")
+    return pending
+
+def execute_uploads(client: GraphClient, site_id: str, drive_id: str, base_path: str, tasks: List[Dict], dry: bool,
+                    workers: int = 1, drive_limit: Optional[int] = None, journal: Optional[RunJournal] = None,
+                    announced: bool = False) -> int:
+    """
+    Ejecuta las tareas {row, local_path, mes, folder} producidas por el descubrimiento.
+    Con workers > 1 las subidas corren en paralelo, pero los resultados se
+    reportan en el mismo orden en que se planificaron. Devuelve el total subido.
+    announced: no se emite "started" (ya lo emitió execute_server_copies).
+    """
+    if dry:
+        for t in tasks:
+            print(f"  [DRY] Copiaría '{t['local_path'].name}' → {base_path}/{t['mes']}/{t['folder']['name']}")
+        return 0
+
+    drive_limit = drive_limit or max(workers, 1)
+    for t in tasks:
+        PAYLOADS.retain(t["local_path"])
+    pool = None
+    if workers > 1:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        futures = [pool.submit(run_upload_task, client, site_id, drive_id, t, drive_limit, journal, announced)
+                   for t in tasks]
+        results = (fut.result() for fut in futures)
+    else:
+        results = (upload_task(client, site_id, drive_id, t, journal, announced) for t in tasks)
+
+    total = 0
+    try:
+        for t, up in zip(tasks, results):
+            print(f"  ✅ Copiado '{t['local_path'].name}' → {up.get('webUrl')}")
+            total += 1
+    finally:
+        if pool:
+            # Ante un error se cancela lo pendiente (igual que el modo secuencial)
+            pool.shutdown(wait=True, cancel_futures=True)
+        PAYLOADS.close_all()
+    return total
+
+
+# ---------- Copia del lado del servidor (subir una vez + /copy) ----------
+def upload_to_staging(client: GraphClient, site_id: str, drive_id: str, local_path: Path) -> Dict:
+    """Sube el archivo una sola vez a STAGING_PATH (Graph crea las carpetas faltantes)."""
+    rel = f"{STAGING_PATH.strip('/')}/{uuid.uuid4().hex}_{local_path.name}"
+    upload_url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/root:/{quote(rel, safe='/')}:/content"
+    with PAYLOADS.open(local_path) as body:
+        return gput_upload(client, upload_url, body)
+
+def start_copy(client: GraphClient, site_id: str, drive_id: str, item_id: str, folder_id: str, name: str) -> str:
+    """Lanza driveItem /copy hacia folder_id y devuelve la URL de monitoreo (Location)."""
+    url = (f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{item_id}/copy"
+           "?@microsoft.graph.conflictBehavior=replace")
+    body = {"parentReference": {"driveId": drive_id, "id": folder_id}, "name": name}
+    r = client.request("POST", url, json=body)
+    return r.headers["Location"]
+
+def copy_status(client: GraphClient, monitor_url: str) -> str:
+    """El monitor de /copy es anónimo (no lleva Authorization). Devuelve status de Graph."""
+    try:
+        return client.get(monitor_url, auth=False).get("status", "inProgress")
+    except requests.HTTPError:
+        return "failed"
+
+def delete_item(client: GraphClient, site_id: str, drive_id: str, item_id: str):
+    client.delete(f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{item_id}")
+
+def execute_server_copies(client: GraphClient, site_id: str, drive_id: str, base_path: str, tasks: List[Dict],
+                          workers: int = 1, drive_limit: Optional[int] = None, journal: Optional[RunJournal] = None) -> int:
+    """
+    Modo masiva con un solo archivo: lo sube una vez a STAGING_PATH y lo
+    replica en el servidor con /copy. Los monitores se consultan en paralelo y
+    los destinos cuya copia falle (o no termine en COPY_TIMEOUT) se suben
+    con PUT directo. Devuelve el total copiado.
+    """
+    if not tasks:
+        return 0
+    local_path = tasks[0]["local_path"]
+    staged = upload_to_staging(client, site_id, drive_id, local_path)
+    print(f"  ⬆️  '{local_path.name}' subido una vez a {STAGING_PATH}; replicando en el servidor...")
+
+    pool = ThreadPoolExecutor(max_workers=max(workers, 4), thread_name_prefix="copy")
+    fallback: List[Dict] = []
+    total = 0
+    try:
+        def _start(t):
+            if EVENTS.enabled:
+                EVENTS.emit("started", **task_event(t))
+            try:
+                mon = start_copy(client, site_id, drive_id, staged["id"], t["folder"]["id"], local_path.name)
+            except requests.RequestException:
+                return None
+            # Cada copia se mide desde que existe su monitor, no desde el inicio de la tanda
+            return mon, time.perf_counter()
+
+        monitors = list(pool.map(_start, tasks))
+        pending = []
+        for t, started in zip(tasks, monitors):
+            if started:
+                pending.append((t, *started))
+            else:
+                fallback.append(t)
+
+        deadline = time.monotonic() + COPY_TIMEOUT
+        delay = 0.5
+        while pending:
+            statuses = list(pool.map(lambda tm: copy_status(client, tm[1]), pending))
+            still = []
+            for (t, mon, t0), status in zip(pending, statuses):
+                if status == "completed":
+                    print(f"  ✅ Copiado '{local_path.name}' → {base_path}/{t['mes']}/{t['folder']['name']}")
+                    if journal is not None:
+                        journal.record(t["row"], t["folder"]["id"], local_path)
+                    elapsed = time.perf_counter() - t0
+                    METRICS.record_upload(staged.get("size", 0), elapsed)
+                    if EVENTS.enabled:
+                        EVENTS.emit("uploaded", **task_event(t), seconds=round(elapsed, 3), url=None)
+                    total += 1
+                elif status == "failed":
+                    fallback.append(t)
+                else:
+                    still.append((t, mon, t0))
+            pending = still
+            if pending and time.monotonic() > deadline:
+                fallback.extend(t for t, _, _ in pending)
+                pending = []
+            if pending:
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+    finally:
+        pool.shutdown(wait=True)
+        try:
+            delete_item(client, site_id, drive_id, staged["id"])
+        except requests.RequestException as e:
+            print(f"  ⚠️  No se pudo borrar el archivo temporal de {STAGING_PATH}: {e}")
+
+    if fallback:
+        print(f"  ⚠️  {len(fallback)} copia(s) en servidor fallaron; subiendo directo")
+        order = {id(t): n for n, t in enumerate(tasks)}
+        fallback.sort(key=lambda t: order[id(t)])
+        # Su "started" ya salió al lanzar el /copy: el respaldo solo cierra con uploaded / failed
+        total += execute_uploads(client, site_id, drive_id, base_path, fallback, False, workers, drive_limit, journal,
+                                 announced=True)
+    return total
 
 
 # ---------- Lógica principal ----------
-def process_masiva(token: str, site_id: str, drive_id: str, base_path: str, excel_path: str, same_file: str, sheet: Optional[str], dry: bool):
-    base_folder = ensure_path_exists(token, site_id, drive_id, base_path)
+def resolve_base_folder(client: GraphClient, site_id: str, drive_id: str, base_path: str, mirror: Optional[FolderMirror] = None) -> Dict:
+    if mirror:
+        return mirror.resolve_path(base_path)
+    return ensure_path_exists(client, site_id, drive_id, base_path)
+
+def plan_tasks(rows: "pd.DataFrame", meses_encontrados: List[Dict], mes_folders: Dict[str, List[Dict]],
+               no_folder_msg: str, no_file_msg: Optional[str] = None) -> List[Dict]:
+    """
+    rows: row, prefix, source (None si no hay archivo local) y columnas extra
+    para los mensajes. Avisa por mes las filas sin carpeta / sin archivo y
+    devuelve las tareas en orden mes → fila → carpeta.
+    """
+    from copy_planner import plan_copies
+
+    months = [(m["name"], mes_folders[m["id"]]) for m in meses_encontrados]
+    plan, unmatched, folders = plan_copies(rows, months)
+    missing = plan["source"].isna()
+    no_file = plan[missing].drop_duplicates(["row", "mes_pos"])
+    plan = plan[~missing]
+
+    unmatched_by_mes = dict(tuple(unmatched.groupby("mes_pos")))
+    no_file_by_mes = dict(tuple(no_file.groupby("mes_pos")))
+    for pos, (mes, _) in enumerate(months):
+        print(f"↳ Mes: {mes}")
+        warnings = []
+        if pos in unmatched_by_mes:
+            warnings += [(r.row, no_folder_msg.format(**r._asdict())) for r in unmatched_by_mes[pos].itertuples(index=False)]
+        if no_file_msg and pos in no_file_by_mes:
+            warnings += [(r.row, no_file_msg.format(**r._asdict())) for r in no_file_by_mes[pos].itertuples(index=False)]
+        for _, msg in sorted(warnings, key=lambda w: w[0]):
+            print(msg)
+
+    return [{"row": r.row, "local_path": r.source, "mes": r.mes, "folder": folders[r.folder]}
+            for r in plan.itertuples(index=False)]
+
+def discover_months(client: GraphClient, site_id: str, drive_id: str, base_path: str,
+                    mirror: Optional[FolderMirror] = None):
+    """Carpetas de MESES existentes bajo la base y las subcarpetas de cada una."""
+    with METRICS.stage("discover"):
+        return _discover_months(client, site_id, drive_id, base_path, mirror)
+
+def _discover_months(client: GraphClient, site_id: str, drive_id: str, base_path: str,
+                     mirror: Optional[FolderMirror] = None):
+    base_folder = resolve_base_folder(client, site_id, drive_id, base_path, mirror)
+    base_index = index_child_folders(client, site_id, drive_id, base_folder["id"], mirror)
+    meses_encontrados = []
+    for mes in MESES:
+        mes_folder = base_index.exact(mes)
+        if mes_folder:
+            meses_encontrados.append(mes_folder)
+    # Un solo listado por mes (todos los meses en $batch); cada fila se resuelve en memoria
+    mes_folders = list_child_folders_many(client, site_id, drive_id, [m["id"] for m in meses_encontrados], mirror)
+    return meses_encontrados, mes_folders
+
+def plan_masiva(client: GraphClient, site_id: str, drive_id: str, base_path: str, excel_path: str, same_file: str,
+                sheet: Optional[str], mirror: Optional[FolderMirror] = None) -> List[Dict]:
+    # pandas/openpyxl se importan recién acá: el resto del script (--help, --execute) no los necesita
+    import pandas as pd
+    from row_source import read_rows
+
     same_file_path = Path(same_file)
     if not same_file_path.exists():
         raise FileNotFoundError(f"No existe el archivo a copiar: {same_file_path}")
 
-    df = pd.read_excel(excel_path, sheet_name=sheet)
+    df = read_rows(excel_path, ["CARPETAS"], sheet=sheet)
     if "CARPETAS" not in df.columns:
         raise ValueError("El Excel debe tener columna 'CARPETAS'")
 
-    total = 0
+    meses_encontrados, mes_folders = discover_months(client, site_id, drive_id, base_path, mirror)
+    rows = pd.DataFrame({"row": df.index, "prefix": df["CARPETAS"], "source": same_file_path})
+    # No todas las filas tendrán carpeta en todos los meses; solo avisamos
+    return plan_tasks(rows, meses_encontrados, mes_folders,
+                      "  ⚠️  No hay carpeta que empiece con '{prefix}' en {mes}")
 
-    # Iterar meses existentes bajo la base
-    meses_encontrados = []
-    childs_base = list_children(token, site_id, drive_id, base_folder["id"])
-    child_names = {c["name"].strip().upper(): c for c in childs_base if c.get("folder")}
-    for mes in MESES:
-        key = mes.strip().upper()
-        if key in child_names:
-            meses_encontrados.append(child_names[key])
-
-    for mes_folder in meses_encontrados:
-        print(f"↳ Mes: {mes_folder['name']}")
-        for _, row in df.iterrows():
-            prefix = str(row["CARPETAS"]).strip()
-            if not prefix:
-                continue
-            matches = find_child_folders_by_prefix(token, site_id, drive_id, mes_folder["id"], prefix)
-            if not matches:
-                # No todas las filas tendrán carpeta en todos los meses; solo avisamos
-                print(f"  ⚠️  No hay carpeta que empiece con '{prefix}' en {mes_folder['name']}")
-                continue
-            for fol in matches:
-                if dry:
-                    print(f"  [DRY] Copiaría '{same_file_path.name}' → {base_path}/{mes_folder['name']}/{fol['name']}")
-                else:
-                    up = upload_file_to_folder(token, site_id, drive_id, fol["id"], same_file_path)
-                    print(f"  ✅ Copiado '{same_file_path.name}' → {up.get('webUrl')}")
-                    total += 1
-    print(f"Listo (MASIVA). Archivos subidos: {total}")
+def plan_detracciones(client: GraphClient, site_id: str, drive_id: str, base_path: str, excel_path: str, src_dir: str,
+                      sheet: Optional[str], ext: str, mirror: Optional[FolderMirror] = None) -> List[Dict]:
+    import pandas as pd
+    from row_source import read_rows
 
-def process_detracciones(token: str, site_id: str, drive_id: str, base_path: str, excel_path: str, src_dir: str, sheet: Optional[str], ext: str, dry: bool):
-    base_folder = ensure_path_exists(token, site_id, drive_id, base_path)
-    df = pd.read_excel(excel_path, sheet_name=sheet)
+    df = read_rows(excel_path, ["CARPETAS", "COMPROBANTE"], sheet=sheet)
     required = {"CARPETAS", "COMPROBANTE"}
     if not required.issubset(df.columns):
         raise ValueError("El Excel debe tener columnas 'CARPETAS' y 'COMPROBANTE'")
@@ -208,49 +547,128 @@ def process_detracciones(token: str, site_id: str, drive_id: str, base_path: str
     src_root = Path(src_dir)
     if not src_root.exists():
         raise FileNotFoundError(f"No existe el directorio de origen: {src_root}")
+    # Un solo recorrido del directorio; todos los comprobantes se resuelven de una vez para todos los meses
+    src_index = LocalFileIndex(src_root, ext=ext)
+    local_files = match_local_files(src_index, df["COMPROBANTE"])
+
+    meses_encontrados, mes_folders = discover_months(client, site_id, drive_id, base_path, mirror)
+    df = df[df["COMPROBANTE"] != ""]
+    rows = pd.DataFrame({"row": df.index, "prefix": df["CARPETAS"], "nro": df["COMPROBANTE"],
+                         "source": df["COMPROBANTE"].map(local_files)})
+    return plan_tasks(rows, meses_encontrados, mes_folders,
+                      "  ⚠️  Carpeta prefijo '{prefix}' no encontrada en {mes}",
+                      f"  ⚠️  No se encontró archivo con comprobante '{{nro}}' en {src_root}")
+
+def run_tasks(client: GraphClient, site_id: str, drive_id: str, base_path: str, tasks: List[Dict], dry: bool,
+              workers: int = 1, drive_limit: Optional[int] = None, server_copy: bool = False,
+              journal: Optional[RunJournal] = None, resume: bool = False, identical: bool = False) -> int:
+    """Etapa de ejecución: filtros opcionales (--resume, --skip-identical) y subidas."""
+    if resume:
+        tasks = skip_journaled(tasks, journal)
+    if identical:
+        with METRICS.stage("skip_identical"):
+            tasks = skip_identical(client, site_id, drive_id, tasks)
+    # En --dry no se sube nada: sin "planned" la UI no queda esperando N subidas
+    if EVENTS.enabled and not dry:
+        sizes = {str(t["local_path"]): task_event(t)["size"] for t in tasks}
+        EVENTS.emit("planned", total=len(tasks), bytes=sum(sizes[str(t["local_path"])] for t in tasks))
+    start = time.perf_counter()
+    with METRICS.stage("upload"):
+        # /copy replica un único archivo: solo aplica si todas las tareas suben el mismo
+        if server_copy and not dry and len({str(t["local_path"]) for t in tasks}) == 1:
+            total = execute_server_copies(client, site_id, drive_id, base_path, tasks, workers, drive_limit, journal)
+        else:
+            total = execute_uploads(client, site_id, drive_id, base_path, tasks, dry, workers, drive_limit, journal)
+    EVENTS.emit("finished", uploaded=total, seconds=round(time.perf_counter() - start, 3))
+    return total
+
+def process_masiva(client: GraphClient, site_id: str, drive_id: str, base_path: str, excel_path: str, same_file: str, sheet: Optional[str], dry: bool,
+                   mirror: Optional[FolderMirror] = None, workers: int = 1, drive_limit: Optional[int] = None,
+                   server_copy: bool = False, journal: Optional[RunJournal] = None, resume: bool = False,
+                   identical: bool = False, plan_out: Optional[str] = None):
+    with METRICS.stage("plan"):
+        tasks = plan_masiva(client, site_id, drive_id, base_path, excel_path, same_file, sheet, mirror)
+    if plan_out:
+        save_plan(plan_out, "masiva", site_id, drive_id, base_path, excel_path, tasks)
+        return
+    total = run_tasks(client, site_id, drive_id, base_path, tasks, dry, workers, drive_limit, server_copy,
+                      journal, resume, identical)
+    print(f"Listo (MASIVA). Archivos subidos: {total}")
 
-    total = 0
-    childs_base = list_children(token, site_id, drive_id, base_folder["id"])
-    child_names = {c["name"].strip().upper(): c for c in childs_base if c.get("folder")}
-    meses_encontrados = []
-    for mes in MESES:
-        key = mes.strip().upper()
-        if key in child_names:
-            meses_encontrados.append(child_names[key])
-
-    for mes_folder in meses_encontrados:
-        print(f"↳ Mes: {mes_folder['name']}")
-        for _, row in df.iterrows():
-            prefix = str(row["CARPETAS"]).strip()
-            nro = str(row["COMPROBANTE"]).strip()
-            if not prefix or not nro:
-                continue
-
-            matches = find_child_folders_by_prefix(token, site_id, drive_id, mes_folder["id"], prefix)
-            if not matches:
-                print(f"  ⚠️  Carpeta prefijo '{prefix}' no encontrada en {mes_folder['name']}")
-                continue
+def process_detracciones(client: GraphClient, site_id: str, drive_id: str, base_path: str, excel_path: str, src_dir: str, sheet: Optional[str], ext: str, dry: bool,
+                         mirror: Optional[FolderMirror] = None, workers: int = 1, drive_limit: Optional[int] = None,
+                         journal: Optional[RunJournal] = None, resume: bool = False, identical: bool = False,
+                         plan_out: Optional[str] = None):
+    with METRICS.stage("plan"):
+        tasks = plan_detracciones(client, site_id, drive_id, base_path, excel_path, src_dir, sheet, ext, mirror)
+    if plan_out:
+        save_plan(plan_out, "detracciones", site_id, drive_id, base_path, excel_path, tasks)
+        return
+    total = run_tasks(client, site_id, drive_id, base_path, tasks, dry, workers, drive_limit, False,
+                      journal, resume, identical)
+    print(f"Listo (DETRACCIONES). Archivos subidos: {total}")
 
-            f = find_local_file_by_token(src_root, nro, ext=ext)
-            if not f:
-                print(f"  ⚠️  No se encontró archivo con comprobante '{nro}' en {src_root}")
+def save_plan(plan_out: str, mode: str, site_id: str, drive_id: str, base_path: str, excel_path: str, tasks: List[Dict]):
+    header = {"mode": mode, "site_id": site_id, "drive_id": drive_id, "base_path": base_path,
+              "excel": str(Path(excel_path).resolve())}
+    n = write_plan(plan_out, header, tasks)
+    print(f"Plan guardado en {plan_out}: {n} subida(s). Ejecutar con --execute {plan_out}")
+
+def process_plan(client: GraphClient, plan_path: str, header: Dict, tasks: List[Dict], dry: bool, workers: int = 1,
+                 drive_limit: Optional[int] = None, server_copy: bool = False, journal: Optional[RunJournal] = None,
+                 resume: bool = False, identical: bool = False, shard=None):
+    """--execute: sube lo que dice el plan, sin resolver sitio, meses ni carpetas."""
+    if shard:
+        tasks = shard_tasks(tasks, shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(tasks)} subida(s) del plan")
+    problems = check_sources(tasks)
+    if problems:
+        for p in problems:
+            print(f"  ⚠️  Archivo del plan {p}")
+        raise FileNotFoundError(f"El plan {plan_path} referencia archivos que cambiaron; vuelva a planificar")
+    print(f"Ejecutando plan {plan_path} ({header.get('mode')}, creado {header.get('created')}): {len(tasks)} subida(s)")
+    total = run_tasks(client, header["site_id"], header["drive_id"], header["base_path"], tasks, dry, workers,
+                      drive_limit, server_copy and header.get("mode") == "masiva", journal, resume, identical)
+    if shard and not dry:
+        out = write_shard_result(plan_path, shard, header, len(tasks), total, journal.path if journal is not None else None)
+        print(f"Resultado del shard en {out}")
+    print(f"Listo (PLAN). Archivos subidos: {total}")
+
+def merge_shards(plan_path: str, journal_path: Optional[str] = None) -> int:
+    """
+    --merge-shards: suma los resultados de cada shard del plan y vuelca sus
+    bitácoras en la bitácora principal (así un --resume sin shards las ve).
+    """
+    header, _ = read_plan(plan_path)
+    results, n = read_shard_results(plan_path)
+    if not results:
+        raise FileNotFoundError(f"No hay resultados de shards para {plan_path}")
+    main_journal = RunJournal(journal_path or journal_path_for(header["excel"]))
+    total = 0
+    try:
+        for i in range(1, n + 1):
+            rec = results.get(i)
+            if rec is None:
+                print(f"  ⚠️  Falta el resultado del shard {i}/{n} (¿no terminó?)")
                 continue
-
-            for fol in matches:
-                if dry:
-                    print(f"  [DRY] Copiaría '{f.name}' → {base_path}/{mes_folder['name']}/{fol['name']}")
-                else:
-                    up = upload_file_to_folder(token, site_id, drive_id, fol["id"], f)
-                    print(f"  ✅ Copiado '{f.name}' → {up.get('webUrl')}")
-                    total += 1
-    print(f"Listo (DETRACCIONES). Archivos subidos: {total}")
+            if rec.get("plan_created") != header.get("created"):
+                print(f"  ⚠️  El shard {i}/{n} se ejecutó con otra versión del plan ({rec.get('plan_created')})")
+            print(f"  Shard {i}/{n}: {rec['uploaded']} de {rec['planned']} subida(s) ({rec['finished']})")
+            total += rec["uploaded"]
+            shard_journal = Path(rec["journal"]) if rec.get("journal") else None
+            if shard_journal and shard_journal.exists() and shard_journal != main_journal.path:
+                main_journal.absorb(shard_journal)
+    finally:
+        main_journal.close()
+    print(f"Listo ({str(header.get('mode', 'plan')).upper()}). Archivos subidos: {total}")
+    return total
 
 
 # ---------- CLI ----------
 def main():
     parser = argparse.ArgumentParser(description="Copia masiva de archivos a SharePoint (Graph)")
-    parser.add_argument("--mode", choices=["masiva","detracciones"], required=True, help="Tipo de proceso")
-    parser.add_argument("--excel", required=True, help="Ruta al Excel (XLSX)")
+    parser.add_argument("--mode", choices=["masiva","detracciones"], help="Tipo de proceso")
+    parser.add_argument("--excel", help="Ruta al Excel (XLSX, CSV o Parquet)")
     parser.add_argument("--sheet", default=None, help="Nombre de hoja (opcional)")
     # MASIVA
     parser.add_argument("--same-file", help="Archivo único a copiar (modo masiva)")
@@ -259,26 +677,139 @@ def main():
     parser.add_argument("--ext", default=".pdf", help="Extensión a buscar en detracciones (default .pdf)")
     # General
     parser.add_argument("--dry", action="store_true", help="Simular sin subir")
+    parser.add_argument("--mirror", nargs="?", const=DEFAULT_MIRROR_DB, default=None,
+                        help=f"Resolver carpetas desde un espejo local SQLite sincronizado con /delta (default {DEFAULT_MIRROR_DB})")
+    parser.add_argument("--workers", type=int, default=1, help="Subidas en paralelo (default 1 = secuencial)")
+    parser.add_argument("--drive-limit", type=int, default=None,
+                        help="Máximo de subidas simultáneas por biblioteca (default = --workers)")
+    parser.add_argument("--retry-budget", type=int, default=500,
+                        help="Reintentos totales permitidos en la corrida ante 429/503/errores transitorios (default 500)")
+    parser.add_argument("--journal", default=None,
+                        help="Bitácora JSONL de subidas completadas (default: <excel>.journal.jsonl al lado del Excel)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Omitir las subidas que la bitácora ya registra (reanudar una corrida cortada)")
+    parser.add_argument("--skip-identical", action="store_true",
+                        help="No subir si el destino ya tiene un archivo con el mismo nombre y quickXorHash")
+    parser.add_argument("--server-copy", action="store_true",
+                        help="Modo masiva: subir el archivo una sola vez y replicarlo con /copy en SharePoint")
+    # Planificar y ejecutar por separado
+    parser.add_argument("--plan-out", default=None,
+                        help="Solo descubrir y emparejar: escribir las subidas previstas en este JSONL, sin subir")
+    parser.add_argument("--execute", default=None,
+                        help="Subir lo indicado en un plan de --plan-out, sin consultas de descubrimiento")
+    parser.add_argument("--shard", default=None,
+                        help="Con --execute: ejecutar solo la parte i/N del plan (repartida por carpeta destino)")
+    parser.add_argument("--merge-shards", default=None, metavar="PLAN",
+                        help="Sumar los resultados de los shards de un plan y unir sus bitácoras")
+    parser.add_argument("--events", action="store_true",
+                        help="Emitir eventos de progreso JSON por línea ('@event {...}') junto con la salida normal")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Guardar métricas de la corrida (latencias p50/p95/p99 por endpoint y etapa, "
+                             "requests, throughput) en este JSON y un textfile de Prometheus (.prom) al lado")
     args = parser.parse_args()
 
+    if args.merge_shards:
+        merge_shards(args.merge_shards, args.journal)
+        return
+
     # Validaciones mínimas
+    if args.execute and args.plan_out:
+        parser.error("--plan-out y --execute no se usan juntos")
+    if not args.execute and not (args.mode and args.excel):
+        parser.error("--mode y --excel son requeridos (salvo con --execute)")
     if args.mode == "masiva" and not args.same_file:
         parser.error("--same-file es requerido en modo 'masiva'")
     if args.mode == "detracciones" and not args.src_dir:
         parser.error("--src-dir es requerido en modo 'detracciones'")
-
-    if not (TENANT_ID and CLIENT_ID and CLIENT_SECRET):
+    if args.workers < 1:
+        parser.error("--workers debe ser >= 1")
+    shard = None
+    if args.shard:
+        if not args.execute:
+            parser.error("--shard solo aplica con --execute")
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.events:
+        EVENTS.enable()
+    try:
+        load_config()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ No se pudo leer la configuración {CONFIG_FILE}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not (TENANT_ID and CLIENT_ID and CLIENT_SECRET) and not os.environ.get("GRAPH_ACCESS_TOKEN"):
         print("❌ Falta configurar GRAPH_TENANT_ID / GRAPH_CLIENT_ID / GRAPH_CLIENT_SECRET", file=sys.stderr)
         sys.exit(1)
 
-    token = graph_token()
-    ids = resolve_site_and_drive(token)
+    # Pool de conexiones a la medida de los hilos de subida (+ monitores de /copy).
+    # Con varios hilos, AIMD decide cuántos van en paralelo (tope = hilos del pool) según el throttling.
+    limiter = AdaptiveLimiter(initial=max(args.workers // 2, 1), maximum=max(args.workers, 4)) if args.workers > 1 else None
+    with METRICS.stage("token"):
+        token = graph_token()
+        if callable(token):
+            token()  # primera adquisición (o lectura de la caché MSAL)
+    client = GraphClient(token, pool_size=max(args.workers, 4) + 2,
+                         retry=RetryPolicy(budget=args.retry_budget), limiter=limiter, metrics=METRICS)
+    try:
+        run(args, client, shard)
+    finally:
+        if args.metrics_out:
+            mode = args.mode or "plan"
+            json_path, prom_path = METRICS.write(args.metrics_out, {"mode": mode})
+            print(f"Métricas guardadas en {json_path} y {prom_path}")
+
+
+def run(args, client: GraphClient, shard=None):
+    if args.execute:
+        header, tasks = read_plan(args.execute)
+        journal_file = args.journal or journal_path_for(header["excel"])
+        if shard:
+            # Cada shard escribe su propia bitácora: pueden correr en otras máquinas
+            journal_file = shard_journal_path(journal_file, shard)
+        journal = None if args.dry else RunJournal(journal_file)
+        try:
+            process_plan(client, args.execute, header, tasks, args.dry, args.workers, args.drive_limit,
+                         args.server_copy, journal, args.resume, args.skip_identical, shard)
+        finally:
+            if journal is not None:
+                journal.close()
+        return
+
+    def lookup():
+        with METRICS.stage("resolve"):
+            return lookup_site_and_drive(client)
+
+    # Ids de la caché validados una vez contra el root del drive; si dan 404
+    # (sitio/biblioteca recreados) se resuelven de nuevo. La corrida no se reintenta.
+    ids = SITE_CACHE.resolve_checked(SITE_HOSTNAME, SITE_REL_PATH, DRIVE_NAME, lookup,
+                                     lambda ids: check_drive(client, ids))
+    run_mode(args, client, ids)
+
+
+def run_mode(args, client: GraphClient, ids: Dict[str, str]):
     site_id, drive_id = ids["site_id"], ids["drive_id"]
 
-    if args.mode == "masiva":
-        process_masiva(token, site_id, drive_id, BASE_PATH, args.excel, args.same_file, args.sheet, args.dry)
-    else:
-        process_detracciones(token, site_id, drive_id, BASE_PATH, args.excel, args.src_dir, args.sheet, args.ext, args.dry)
+    mirror = None
+    if args.mirror:
+        mirror = FolderMirror(args.mirror, site_id, drive_id)
+        with METRICS.stage("mirror_sync"):
+            changes = mirror.sync(client.get)
+        print(f"Espejo local '{args.mirror}' sincronizado ({changes} cambios)")
+
+    # Bitácora de subidas completadas (no aplica en --dry ni al solo planificar)
+    journal = None if args.dry or args.plan_out else RunJournal(args.journal or journal_path_for(args.excel))
+    try:
+        if args.mode == "masiva":
+            process_masiva(client, site_id, drive_id, BASE_PATH, args.excel, args.same_file, args.sheet, args.dry, mirror, args.workers, args.drive_limit,
+                           args.server_copy, journal, args.resume, args.skip_identical, args.plan_out)
+        else:
+            process_detracciones(client, site_id, drive_id, BASE_PATH, args.excel, args.src_dir, args.sheet, args.ext, args.dry, mirror, args.workers, args.drive_limit,
+                                 journal, args.resume, args.skip_identical, args.plan_out)
+    finally:
+        if journal is not None:
+            journal.close()
 
 
 if __name__ == "__main__":
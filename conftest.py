@@ -0,0 +1,54 @@
+# conftest.py
+"""
+Fixtures compartidas de los tests: un mock_graph.py levantado en un puerto
+libre. La URL base de Graph se fija al importar graph_client, así que se
+exporta GRAPH_BASE_URL antes de que los tests importen los scripts.
+"""
+import os
+import socket
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+MOCK_PORT = _free_port()
+os.environ["GRAPH_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1.0"
+os.environ["GRAPH_ACCESS_TOKEN"] = "test-token"
+os.environ["GRAPH_SITE_CACHE"] = ""  # sin .site_cache.json en el directorio de trabajo
+
+from mock_graph import MockGraphServer  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def row_cache(tmp_path_factory):
+    """Caché de planillas en una carpeta temporal, no en la del usuario."""
+    path = tmp_path_factory.mktemp("row_cache")
+    os.environ["GRAPH_ROW_CACHE"] = str(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    with MockGraphServer(port=MOCK_PORT, site_host="mock.sharepoint.com", site_path="/sites/Bench") as server:
+        yield server
+
+
+@pytest.fixture
+def graph(mock_server):
+    """MockGraph vacío para cada test."""
+    mock_server.graph.reset()
+    return mock_server.graph
+
+
+@pytest.fixture
+def client(mock_server):
+    from graph_client import GraphClient
+
+    c = GraphClient("test-token")
+    yield c
+    c.close()
@@ -1,91 +1,246 @@
 import os
-import pandas as pd
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from office365.runtime.auth.client_credential import ClientCredential
 from office365.sharepoint.client_context import ClientContext
 from office365.sharepoint.files.file import File
 
-# Cargar configuración
-with open("config_tenant.json", "r") as f:
-    config = json.load(f)
+from folder_index import FolderNameIndex
+from row_source import read_rows
 
-tenant_id = config["sharepoint"]["tenant_id"]
-client_id = config["sharepoint"]["client_id"]
-client_secret = config["sharepoint"]["client_secret"]
-authority = f"https://login.microsoftonline.com/{tenant_id}"
-scope = ["https://graph.microsoft.com/.default"]
-
-tenant = config["sharepoint"]["tenant"]
-site_url = f"https://{tenant}.sharepoint.com/sites/BacklogTI"
-#client_id = config["sharepoint"]["client_id_vendor"]
-#client_secret = config["sharepoint"]["client_secret_vendor"]
+CONFIG_FILE = "config_tenant.json"
+config = None
+client_id = client_secret = site_url = None
 documento_local = "masivo.pdf"
-entrada = int(input("Ingresa 1 para masivo, 2 para uno a uno: "))
-if entrada == 1:
-    excel_path = "masivo.xlsx"
-    nombre_columna_prefijo = "CARPETAS"  # columna con valores tipo 0701-0057
-
-    # === Autenticación con SharePoint ===
-    # ctx = ClientContext(site_url).with_credentials(ClientCredential(client_id, client_secret))
-    #ctx = ClientContext(site_url).with_user_credentials(client_id, client_secret)
-    ctx = ClientContext(site_url).with_credentials(ClientCredential(client_id, client_secret))
-    # === Leer Excel ===
-    df = pd.read_excel(excel_path)
-    library_name = config["sharepoint"]["document_library_prod"] # diccionario de carpetas
-    library_folder = config["sharepoint"]["document_library"]
-    for i in library_name:
-        folder_root = ctx.web.get_folder_by_server_relative_url(f"{library_folder}")
-        folders = folder_root.folders.get().execute_query()
-        for dir in folders:
-            folder_subroot = ctx.web.get_folder_by_server_relative_url(f"{i}/{dir.name}")
-            dirs = folder_subroot.folders.get().execute_query()
-        # === Buscar cada carpeta por prefijo y copiar el archivo ===
-            for prefix in df[nombre_columna_prefijo]:
-                matching_folder = next((f for f in dirs if f.name.startswith(str(prefix))), None)
-
-                if matching_folder:
-                    target_url = f"{i}/{dir.name}/{matching_folder.name}/{os.path.basename(documento_local)}"
-                    with open(documento_local, "rb") as file:
-                        ctx.web.get_folder_by_server_relative_url(f"{i}/{dir.name}/{matching_folder.name}")\
-                            .upload_file(os.path.basename(documento_local), file.read())\
-                            .execute_query()
-                    print(f"📁 Copiado en: {matching_folder.name}")
-                else:
-                    print(f"⚠️ Carpeta no encontrada para prefijo: {prefix}")
-else:
-    excel_path = "detracciones.xlsx"
-    nombre_columna_prefijo = "CARPETAS"  # columna con valores tipo 0701-0057
-    nombre_columna_comprobante = "COMPROBANTE"
-    ctx = ClientContext(site_url).with_credentials(ClientCredential(client_id, client_secret))
-
-    # === Leer Excel ===
-    df = pd.read_excel(excel_path)
-    print(df)
-    library_name = config["sharepoint"]["document_library"]
-    folder_root = ctx.web.get_folder_by_server_relative_url(f"{library_name}")
-    token = ctx.authentication_context.acquire_token_for_app(client_id, client_secret)
-    print("Access Token:", token.url)
-    web = ctx.web.get().execute_query()
-    print("Conectado a:", web.properties["Title"])
-    lists = ctx.web.lists.get().execute_query()
-    for l in lists:
-        print(l.properties["Title"])
-    folders = folder_root.folders.get().execute_query()
+
+# Subidas simultáneas dentro de cada biblioteca (las bibliotecas además corren en paralelo entre sí)
+subidas_por_biblioteca = 4
+
+
+def load_config(path=CONFIG_FILE):
+    """Cargar configuración (al ejecutar, no al importar)."""
+    global config, client_id, client_secret, site_url, subidas_por_biblioteca
+    with open(path, "r") as f:
+        config = json.load(f)
+
+    client_id = config["sharepoint"]["client_id"]
+    client_secret = config["sharepoint"]["client_secret"]
+
+    tenant = config["sharepoint"]["tenant"]
+    site_url = f"https://{tenant}.sharepoint.com/sites/BacklogTI"
+    #client_id = config["sharepoint"]["client_id_vendor"]
+    #client_secret = config["sharepoint"]["client_secret_vendor"]
+    subidas_por_biblioteca = int(config["sharepoint"].get("subidas_por_biblioteca", subidas_por_biblioteca))
+    return config
+
+print_lock = threading.Lock()
+
+
+def log(library, msg):
+    with print_lock:
+        print(f"[{library}] {msg}")
+
+
+def new_context():
+    return ClientContext(site_url).with_credentials(ClientCredential(client_id, client_secret))
+
+
+def list_folders(ctx, server_relative_url):
+    return ctx.web.get_folder_by_server_relative_url(server_relative_url).folders.get().execute_query()
+
+
+def find_folder(dirs_index, prefix):
+    """
+    Primera carpeta cuyo nombre empieza con `prefix`. Una celda vacía no es
+    un prefijo: "".startswith coincidiría con cualquier carpeta del mes.
+    """
+    prefix = str(prefix)
+    if not prefix.strip():
+        return None
+    return next(iter(dirs_index.startswith(prefix)), None)
+
+
+class LibraryCopy:
+    """
+    Copias hacia una biblioteca: su propio ClientContext para listar y uno por
+    hilo de subida (ClientContext no es thread-safe), con a lo sumo `workers`
+    subidas simultáneas. Lleva el resumen de la biblioteca.
+    """
+
+    def __init__(self, library, workers):
+        self.library = library
+        # Último segmento de la ruta ("Documentos", "/sites/X/Documentos" → "Documentos")
+        self.name = library.rstrip("/").rsplit("/", 1)[-1] or library
+        self._ctx = None
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix=f"up-{self.name}")
+        self.futures = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.copied = 0
+        self.not_found = 0
+        self.errors = []
+        self.failure = None  # error que cortó la biblioteca (listado, credenciales...)
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def ctx(self):
+        """ClientContext para listar; se crea al primer uso, dentro del hilo de la biblioteca."""
+        if self._ctx is None:
+            self._ctx = new_context()
+        return self._ctx
+
+    def _thread_ctx(self):
+        if not hasattr(self._local, "ctx"):
+            self._local.ctx = new_context()
+        return self._local.ctx
+
+    def _upload(self, folder_url, local_path, label):
+        try:
+            with open(local_path, "rb") as file:
+                self._thread_ctx().web.get_folder_by_server_relative_url(folder_url)\
+                    .upload_file(os.path.basename(local_path), file.read())\
+                    .execute_query()
+        except Exception as e:
+            with self._lock:
+                self.errors.append((folder_url, local_path, str(e)))
+            log(self.name, f"❌ Error subiendo {os.path.basename(local_path)} a {label}: {e}")
+            return
+        with self._lock:
+            self.copied += 1
+        log(self.name, f"📁 Copiado en: {label}")
+
+    def upload(self, folder_url, local_path, label):
+        self.futures.append(self.pool.submit(self._upload, folder_url, local_path, label))
+
+    def missing(self, msg):
+        with self._lock:
+            self.not_found += 1
+        log(self.name, msg)
+
+    def wait(self):
+        for fut in self.futures:
+            fut.result()
+        self.pool.shutdown(wait=True)
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+
+def as_library_list(value):
+    """document_library(_prod) puede ser una sola biblioteca o una lista."""
+    return [value] if isinstance(value, str) else list(value)
+
+
+def copy_one_library(library, copy_library):
+    """
+    Copia una biblioteca. Un error que la corta (p.ej. al listar sus carpetas)
+    queda en lib.failure sin frenar a las demás; las subidas ya encoladas
+    terminan igual antes de devolver.
+    """
+    lib = LibraryCopy(library, subidas_por_biblioteca)
+    try:
+        copy_library(lib)
+    except Exception as e:
+        lib.failure = str(e)
+        log(lib.name, f"❌ Error copiando la biblioteca: {e}")
+    finally:
+        lib.wait()
+    return lib
+
+
+def run_libraries(libraries, copy_library):
+    """Una biblioteca por hilo; cada una con sus propias subidas en paralelo."""
+    with ThreadPoolExecutor(max_workers=max(len(libraries), 1), thread_name_prefix="library") as pool:
+        futures = [pool.submit(copy_one_library, lib, copy_library) for lib in libraries]
+        results = [fut.result() for fut in futures]
+    print("\n=== Resumen ===")
+    for r in results:
+        failure = f" — interrumpida: {r.failure}" if r.failure else ""
+        print(f"{r.library}: {r.copied} copiados, {r.not_found} sin carpeta, {len(r.errors)} errores "
+              f"({r.seconds:.1f}s){failure}")
+    print(f"TOTAL: {sum(r.copied for r in results)} copiados, {sum(r.not_found for r in results)} sin carpeta, "
+          f"{sum(len(r.errors) for r in results)} errores, "
+          f"{sum(1 for r in results if r.failure)} biblioteca(s) interrumpida(s)")
+    return results
+
+
+def copy_masiva(lib, folders, prefixes):
+    """Copia documento_local en la carpeta de cada prefijo, en cada mes de `folders`."""
     for dir in folders:
-        folder_subroot = ctx.web.get_folder_by_server_relative_url(f"{library_name}/{dir.name}")
-        dirs = folder_subroot.folders.get().execute_query()
+        dirs = list_folders(lib.ctx, f"{lib.library}/{dir.name}")
+        # Prefijo tal cual (distingue mayúsculas, no recorta espacios), como str.startswith
+        dirs_index = FolderNameIndex(dirs, name_of=lambda f: f.name, normalize=str)
+    # === Buscar cada carpeta por prefijo y copiar el archivo ===
+        for prefix in prefixes:
+            matching_folder = find_folder(dirs_index, prefix)
+
+            if matching_folder:
+                lib.upload(f"{lib.library}/{dir.name}/{matching_folder.name}", documento_local, matching_folder.name)
+            else:
+                lib.missing(f"⚠️ Carpeta no encontrada para prefijo: {prefix}")
+    return lib
+
+
+def copy_detracciones(lib, df, nombre_columna_prefijo, nombre_columna_comprobante):
+    folders = list_folders(lib.ctx, f"{lib.library}")
+    for dir in folders:
+        dirs = list_folders(lib.ctx, f"{lib.library}/{dir.name}")
+        # Prefijo tal cual (distingue mayúsculas, no recorta espacios), como str.startswith
+        dirs_index = FolderNameIndex(dirs, name_of=lambda f: f.name, normalize=str)
         for index, row in df.iterrows():
             nombre_carpeta = row[nombre_columna_prefijo]
             nombre_comprobante = f"detracciones/{row[nombre_columna_comprobante]}.pdf"
-            documento_local = f"detracciones/"
-            matching_folder = next((f for f in dirs if f.name.startswith(str(nombre_carpeta))), None)
+            matching_folder = find_folder(dirs_index, nombre_carpeta)
             if matching_folder:
-                target_url = f"{library_name}/{matching_folder.name}/{os.path.basename(nombre_comprobante)}"
-                with open(nombre_comprobante, "rb") as file:
-                    ctx.web.get_folder_by_server_relative_url(f"{library_name}/{dir.name}/{matching_folder.name}") \
-                        .upload_file(os.path.basename(nombre_comprobante), file.read()) \
-                        .execute_query()
-                print(f"📁 Copiado en: {matching_folder.name}")
+                lib.upload(f"{lib.library}/{dir.name}/{matching_folder.name}", nombre_comprobante, matching_folder.name)
             else:
-                print(f"⚠️ Carpeta no encontrada para prefijo: {nombre_carpeta}")
\ No newline at end of file
+                lib.missing(f"⚠️ Carpeta no encontrada para prefijo: {nombre_carpeta}")
+    return lib
+
+
+def main():
+    load_config()
+    entrada = int(input("Ingresa 1 para masivo, 2 para uno a uno: "))
+    if entrada == 1:
+        excel_path = "masivo.xlsx"
+        nombre_columna_prefijo = "CARPETAS"  # columna con valores tipo 0701-0057
+
+        # === Autenticación con SharePoint ===
+        # ctx = ClientContext(site_url).with_credentials(ClientCredential(client_id, client_secret))
+        #ctx = ClientContext(site_url).with_user_credentials(client_id, client_secret)
+        ctx = new_context()
+        # === Leer Excel ===
+        df = read_rows(excel_path, [nombre_columna_prefijo])
+        library_name = config["sharepoint"]["document_library_prod"] # diccionario de carpetas
+        library_folder = config["sharepoint"]["document_library"]
+        # Los meses se toman de document_library una sola vez, para todas las bibliotecas
+        folders = list_folders(ctx, f"{library_folder}")
+
+        run_libraries(as_library_list(library_name), lambda lib: copy_masiva(lib, folders, df[nombre_columna_prefijo]))
+    else:
+        excel_path = "detracciones.xlsx"
+        nombre_columna_prefijo = "CARPETAS"  # columna con valores tipo 0701-0057
+        nombre_columna_comprobante = "COMPROBANTE"
+        ctx = new_context()
+
+        # === Leer Excel ===
+        df = read_rows(excel_path, [nombre_columna_prefijo, nombre_columna_comprobante])
+        print(df)
+        library_name = config["sharepoint"]["document_library"]
+        token = ctx.authentication_context.acquire_token_for_app(client_id, client_secret)
+        print("Access Token:", token.url)
+        web = ctx.web.get().execute_query()
+        print("Conectado a:", web.properties["Title"])
+        lists = ctx.web.lists.get().execute_query()
+        for l in lists:
+            print(l.properties["Title"])
+
+        run_libraries(as_library_list(library_name),
+                      lambda lib: copy_detracciones(lib, df, nombre_columna_prefijo, nombre_columna_comprobante))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,29 @@
 import os
 import math
 import json
-import msal
-import pandas as pd
-import requests
+from functools import lru_cache
 from urllib.parse import quote
 
-GRAPH = "https://graph.microsoft.com/v1.0"
+from folder_index import FolderNameIndex
+from graph_client import GRAPH, GraphClient
+from token_provider import TokenProvider
+from folder_mirror import FolderMirror, DEFAULT_MIRROR_DB
+from payload_cache import PayloadCache
+from run_journal import RunJournal, journal_path_for
+from site_cache import SiteCache, is_not_found
+from upload_session import INITIAL_CHUNK, UploadSessionStore, upload_resumable
 
 # =========================
 # 1) CONFIG
 # =========================
+# Config, token, cliente y site/drive se obtienen recién al primer uso (ver
+# __getattr__ al final): importar el módulo no lee archivos ni llama a Graph.
+CONFIG_FILE   = "config_tenant.json"
 
-with open("config_tenant.json", "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-TENANT_ID     = config["sharepoint"]["tenant_id"]
-CLIENT_ID     = config["sharepoint"]["client_id"]
-CLIENT_SECRET = config["sharepoint"]["client_secret"]
+@lru_cache(maxsize=None)
+def load_config() -> dict:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 SITE_DOMAIN   = "lajoyaminingsac.sharepoint.com"  # solo host
 SITE_NAME     = "BacklogTI"                       # lo que va tras /sites/
@@ -37,51 +43,33 @@ DEFAULT_BASE_REL_PATH = "LJC/2025/JUL"
 # ¿Crear segmentos ausentes en la base?
 CREATE_MISSING = False
 
+# Espejo local SQLite del árbol de carpetas (None = listar siempre contra Graph)
+MIRROR_DB = None                    # p.ej. DEFAULT_MIRROR_DB
+
+# site_id/drive_id resueltos en corridas anteriores (ver site_cache.py)
+SITE_CACHE = SiteCache()
+
 
 # =========================
 # 2) AUTH (app-only)
 # =========================
-def get_access_token():
-    app = msal.ConfidentialClientApplication(
-        CLIENT_ID,
-        authority=f"https://login.microsoftonline.com/{TENANT_ID}",
-        client_credential=CLIENT_SECRET,
-    )
-    tok = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in tok:
-        raise RuntimeError(f"No se obtuvo token: {tok}")
-    return tok["access_token"]
+# Caché MSAL en disco + renovación antes de expirar (ver token_provider.py)
+@lru_cache(maxsize=None)
+def get_tokens() -> TokenProvider:
+    sp = load_config()["sharepoint"]
+    return TokenProvider(sp["tenant_id"], sp["client_id"], sp["client_secret"]).start_background_refresh()
 
-TOKEN = get_access_token()
-HEADERS = {"Authorization": f"Bearer {TOKEN}"}
+def get_access_token():
+    return get_tokens()()
 
 
 # =========================
 # 3) Helpers HTTP
 # =========================
-def gget(url, **kw):
-    r = requests.get(url, headers=HEADERS, timeout=30, **kw)
-    if r.status_code >= 400:
-        print("GET ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json()
-
-def gpost(url, body: dict):
-    r = requests.post(url, headers={**HEADERS, "Content-Type": "application/json"}, json=body, timeout=60)
-    if r.status_code >= 400:
-        print("POST ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json()
-
-def gput(url, data=None, headers_extra=None):
-    hdrs = dict(HEADERS)
-    if headers_extra:
-        hdrs.update(headers_extra)
-    r = requests.put(url, headers=hdrs, data=data, timeout=120)
-    if r.status_code not in (200, 201, 202):
-        print("PUT ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json() if r.text else {}
+# Sesión keep-alive compartida (ver graph_client.py)
+@lru_cache(maxsize=None)
+def get_client() -> GraphClient:
+    return GraphClient(get_tokens())
 
 
 # =========================
@@ -89,43 +77,64 @@ def gput(url, data=None, headers_extra=None):
 # =========================
 def get_site_id(site_domain: str, site_name: str) -> str:
     url = f"{GRAPH}/sites/{site_domain}:/sites/{site_name}"
-    data = gget(url)
+    data = get_client().get(url)
     return data["id"]
 
 def get_drive_id_by_name(site_id: str, drive_name: str) -> str:
     url = f"{GRAPH}/sites/{site_id}/drives?$select=id,name"
-    data = gget(url)
+    data = get_client().get(url)
     for d in data.get("value", []):
         if d["name"].lower() == drive_name.lower():
             return d["id"]
     raise RuntimeError(f"No encontré la biblioteca/drive '{drive_name}' en el sitio.")
 
-SITE_ID = get_site_id(SITE_DOMAIN, SITE_NAME)
-DRIVE_ID = get_drive_id_by_name(SITE_ID, DRIVE_NAME)
+def lookup_site_drive(drive_name: str) -> dict:
+    site_id = get_site_id(SITE_DOMAIN, SITE_NAME)
+    return {"site_id": site_id, "drive_id": get_drive_id_by_name(site_id, drive_name)}
+
+@lru_cache(maxsize=None)
+def get_site_drive(drive_name: str = DRIVE_NAME) -> tuple:
+    """(SITE_ID, DRIVE_ID) del sitio y la biblioteca: de la caché de resolución o de Graph, una vez por proceso."""
+    ids, _ = SITE_CACHE.resolve(SITE_DOMAIN, f"/sites/{SITE_NAME}", drive_name, lambda: lookup_site_drive(drive_name))
+    return ids["site_id"], ids["drive_id"]
+
+def refresh_site_drive(drive_name: str = DRIVE_NAME) -> bool:
+    """
+    Tras un 404: si los ids venían de la caché se resuelven de nuevo.
+    True si cambiaron (vale la pena reintentar con get_site_drive()).
+    """
+    fresh = SITE_CACHE.revalidate(SITE_DOMAIN, f"/sites/{SITE_NAME}", drive_name, lambda: lookup_site_drive(drive_name))
+    if fresh is None:
+        return False
+    get_site_drive.cache_clear()
+    print(f"⚠️  La biblioteca '{drive_name}' cambió de id; se usa el nuevo")
+    return True
 
 
 # =========================
 # 5) Navegación de carpetas
 # =========================
 def get_drive_root() -> dict:
-    url = f"{GRAPH}/sites/{SITE_ID}/drives/{DRIVE_ID}/root?$select=id,name,webUrl"
-    return gget(url)
+    site_id, drive_id = get_site_drive()
+    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/root?$select=id,name,webUrl"
+    return get_client().get(url)
 
 def get_drive_root_(drive_id: str):
-    url = f"{GRAPH}/sites/{SITE_ID}/drives/{drive_id}/root?$select=id,name,webUrl"
-    return gget(url)
+    url = f"{GRAPH}/sites/{get_site_drive()[0]}/drives/{drive_id}/root?$select=id,name,webUrl"
+    return get_client().get(url)
 
 def get_item_by_path(rel_path):
     # rel_path: e.g. "LJC/2025" (sin barra inicial)
     rel = quote(rel_path.strip("/"), safe="/")
-    url = f"{GRAPH}/sites/{SITE_ID}/drives/{DRIVE_ID}/root:/{rel}"
-    return gget(url)  # driveItem del folder
+    site_id, drive_id = get_site_drive()
+    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/root:/{rel}"
+    return get_client().get(url)  # driveItem del folder
 
 def list_subfolders_by_id(site_id, drive_id, parent_id):
     url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{parent_id}/children?$select=id,name,folder,webUrl"
     folders = []
     while url:
-        data = gget(url)
+        data = get_client().get(url)
         # 👉 solo los que tienen facet 'folder'
         folders.extend([it for it in data.get("value", []) if it.get("folder")])
         url = data.get("@odata.nextLink")
@@ -136,69 +145,80 @@ def list_subfolders_by_path(site_id, drive_id, rel_path):
     return list_subfolders_by_id(site_id, drive_id, parent["id"])
 
 def list_children_root_(drive_name: str):
-    site_list = get_site_id(SITE_DOMAIN, SITE_NAME)
-    drive_list = get_drive_id_by_name(site_list, drive_name)
+    site_list, drive_list = get_site_drive(drive_name)
     current = get_drive_root()
     url = f"{GRAPH}/sites/{site_list}/drives/{drive_list}/items/{current['id']}/children?$select=id,name,folder,webUrl"
     items = []
     # print(site_id, drive_id, parent_id, parent_id)
     while url:
-        data = gget(url)
+        data = get_client().get(url)
         items.extend([it for it in data.get("value", []) if it.get("folder")])
         url = data.get("@odata.nextLink")
     return items
 
 def list_children_root():
-    site = get_site_id(SITE_DOMAIN, SITE_NAME)
-    drive = get_drive_id_by_name(SITE_ID, DRIVE_NAME)
+    site, drive = get_site_drive()
     current = get_drive_root()
     url = f"{GRAPH}/sites/{site}/drives/{drive}/items/{current['id']}/children?$select=id,name,folder,webUrl"
     items = []
     # print(site_id, drive_id, parent_id, parent_id)
     while url:
-        data = gget(url)
+        data = get_client().get(url)
         items.extend([it for it in data.get("value", []) if it.get("folder")])
         url = data.get("@odata.nextLink")
     return items
 
+# Espejo activo (ver enable_mirror); None = sin espejo
+MIRROR = None
+
+def enable_mirror(db_path: str = DEFAULT_MIRROR_DB):
+    """Sincroniza el espejo local vía /delta y lo usa para resolver carpetas."""
+    global MIRROR
+    MIRROR = FolderMirror(db_path, *get_site_drive())
+    changes = MIRROR.sync(get_client().get)
+    print(f"Espejo local '{db_path}' sincronizado ({changes} cambios)")
+    return MIRROR
+
 def list_children(site_id: str, drive_id: str, parent_id: str):
+    if MIRROR is not None and drive_id == MIRROR.drive_id:
+        return MIRROR.children(parent_id)
     url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{parent_id}/children?$select=id,name,folder,webUrl"
     items = []
     #print(site_id, drive_id, parent_id, parent_id)
     while url:
-        data = gget(url)
+        data = get_client().get(url)
         items.extend(data.get("value", []))
         url = data.get("@odata.nextLink")
     return items
 
-def resolve_child_folder(site_id: str, drive_id: str, parent_id: str, segment: str):
-    """Busca subcarpeta por igualdad (case-insensitive), prefijo, luego contiene."""
-    kids = list_children(site_id, drive_id, parent_id)
-    seg = segment.strip().lower()
-    folders = [k for k in kids if k.get("folder")]
-
-    for k in folders:
-        if k["name"].lower() == seg:
-            return k
+# Índices de subcarpetas ya listadas: (drive_id, parent_id) -> FolderNameIndex
+_FOLDER_INDEXES = {}
 
-    pref = [k for k in folders if k["name"].lower().startswith(seg)]
-    if len(pref) == 1:
-        return pref[0]
-    if len(pref) > 1:
-        pref.sort(key=lambda x: len(x["name"]), reverse=True)
-        return pref[0]
+def folder_index(site_id: str, drive_id: str, parent_id: str) -> FolderNameIndex:
+    """Lista e indexa las subcarpetas de parent_id una sola vez por corrida."""
+    key = (drive_id, parent_id)
+    if key not in _FOLDER_INDEXES:
+        kids = list_children(site_id, drive_id, parent_id)
+        _FOLDER_INDEXES[key] = FolderNameIndex(k for k in kids if k.get("folder"))
+    return _FOLDER_INDEXES[key]
 
-    contains = [k for k in folders if seg in k["name"].lower()]
-    return contains[0] if contains else None
+def resolve_child_folder(site_id: str, drive_id: str, parent_id: str, segment: str):
+    """Busca subcarpeta por igualdad (case-insensitive), prefijo, luego contiene."""
+    return folder_index(site_id, drive_id, parent_id).resolve(segment)
 
 def create_child_folder(site_id: str, drive_id: str, parent_id: str, name: str):
     url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{parent_id}/children"
     body = {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-    return gpost(url, body)
+    created = get_client().post(url, body)
+    _FOLDER_INDEXES.pop((drive_id, parent_id), None)
+    return created
 
 def walk_path(site_id: str, drive_id: str, rel_path: str, create_if_missing: bool = False) -> dict:
     """Resuelve 'LJC/2025/JUL' segmento por segmento desde el root del drive."""
-    current = get_drive_root(site_id, drive_id)
+    if MIRROR is not None and drive_id == MIRROR.drive_id:
+        current = MIRROR.get_root()
+    else:
+        current = get_drive_root_(drive_id)
     path = (rel_path or "").strip("/")
 
     if not path:
@@ -212,6 +232,9 @@ def walk_path(site_id: str, drive_id: str, rel_path: str, create_if_missing: boo
         if not create_if_missing:
             raise FileNotFoundError(f"No encontré la carpeta '{seg}' dentro de '{current['name']}'")
         current = create_child_folder(site_id, drive_id, current["id"], seg)
+        if MIRROR is not None:
+            # Incorporar al espejo la carpeta recién creada
+            MIRROR.sync(get_client().get)
     return current
 
 def resolve_leaf_by_prefix(site_id: str, drive_id: str, parent_id: str, wanted_prefix: str):
@@ -224,45 +247,23 @@ def resolve_leaf_by_prefix(site_id: str, drive_id: str, parent_id: str, wanted_p
 # =========================
 # 6) Upload (simple/sesión)
 # =========================
+# Un mmap por archivo; los trozos de la sesión son vistas sin copia
+PAYLOADS = PayloadCache()
+# uploadUrl de sesiones en curso, para reanudar tras un corte
+SESSIONS = UploadSessionStore()
+
 def upload_small(site_id: str, drive_id: str, folder_id: str, file_path: str):
     name = os.path.basename(file_path)
     url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{quote(name)}:/content"
     with open(file_path, "rb") as f:
-        up = gput(url, data=f)
+        up = get_client().put(url, data=f)
     return up
 
-def create_upload_session(site_id: str, drive_id: str, folder_id: str, file_name: str):
-    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{quote(file_name)}:/createUploadSession"
-    body = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
-    return gpost(url, body)
-
-def upload_large(site_id: str, drive_id: str, folder_id: str, file_path: str, chunk_size=5*1024*1024):
+def upload_large(site_id: str, drive_id: str, folder_id: str, file_path: str, chunk_size=INITIAL_CHUNK):
+    """Upload session reanudable: la uploadUrl queda en SESSIONS y el trozo se adapta al rendimiento."""
     name = os.path.basename(file_path)
-    session = create_upload_session(site_id, drive_id, folder_id, name)
-    upload_url = session["uploadUrl"]
-
-    size = os.path.getsize(file_path)
-    with open(file_path, "rb") as f:
-        start = 0
-        while start < size:
-            end = min(start + chunk_size, size) - 1
-            length = end - start + 1
-            chunk = f.read(length)
-
-            headers = {
-                "Content-Length": str(length),
-                "Content-Range": f"bytes {start}-{end}/{size}",
-            }
-            r = requests.put(upload_url, headers=headers, data=chunk, timeout=180)
-            if r.status_code not in (200, 201, 202):
-                print("Chunk ERR:", r.status_code, r.text)
-                r.raise_for_status()
-
-            if r.status_code in (200, 201):
-                return r.json()
-            start = end + 1
-
-    raise RuntimeError("Upload session no confirmó finalización.")
+    create_url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{quote(name)}:/createUploadSession"
+    return upload_resumable(get_client(), create_url, file_path, store=SESSIONS, payloads=PAYLOADS, chunk_size=chunk_size)
 
 def upload_auto(site_id: str, drive_id: str, folder_id: str, file_path: str, threshold=4*1024*1024):
     size = os.path.getsize(file_path)
@@ -282,13 +283,15 @@ def process_excel(
     col_base=COL_BASE,
     default_base=DEFAULT_BASE_REL_PATH,
     create_missing=CREATE_MISSING,
-    detracciones=False
+    detracciones=False,
+    mirror_db=MIRROR_DB,
+    resume=False,
+    journal_path=None
 ):
-    # Leer todo como texto para no romper códigos/prefijos (evita ".0")
-    df = pd.read_excel(excel_file, sheet_name=sheet_name, dtype=str, keep_default_na=False)
+    from row_source import read_rows  # pandas/openpyxl solo cuando se procesa un Excel
 
-    # Normaliza encabezados (trim)
-    df.columns = [str(c).strip() for c in df.columns]
+    # Solo las columnas usadas, como texto para no romper códigos/prefijos (evita ".0")
+    df = read_rows(excel_file, [col_prefix, col_file, col_base], sheet=sheet_name)
 
     # Validar columnas obligatorias
     if col_prefix not in df.columns:
@@ -296,8 +299,16 @@ def process_excel(
     if col_file not in df.columns:
         raise ValueError(f"No encuentro la columna '{col_file}' (ruta de archivo) en {excel_file}")
 
+    if mirror_db:
+        enable_mirror(mirror_db)
+
+    # Bitácora de subidas completadas; con resume=True se omiten las ya hechas
+    journal = RunJournal(journal_path or journal_path_for(excel_file))
+    site_id, drive_id = get_site_drive()
+
     ok = 0
     fail = 0
+    skipped = 0
 
     for i, row in df.iterrows():
         leaf = (row[col_prefix] or "").strip()
@@ -317,19 +328,51 @@ def process_excel(
             fail += 1
             continue
 
-        try:
-            base_item = walk_path(SITE_ID, DRIVE_ID, base_rel, create_if_missing=create_missing)
-            leaf_item = resolve_leaf_by_prefix(SITE_ID, DRIVE_ID, base_item["id"], leaf)
-            up = upload_auto(SITE_ID, DRIVE_ID, leaf_item["id"], file_path)
-            print(f"[{i}] ✅ {os.path.basename(file_path)} → {up.get('webUrl')}")
-            ok += 1
-        except Exception as e:
-            print(f"[{i}] ❌ {leaf}: {e}")
-            fail += 1
-
+        for attempt in (1, 2):
+            try:
+                base_item = walk_path(site_id, drive_id, base_rel, create_if_missing=create_missing)
+                leaf_item = resolve_leaf_by_prefix(site_id, drive_id, base_item["id"], leaf)
+                if resume and journal.is_done(i, leaf_item["id"], file_path):
+                    skipped += 1
+                    break
+                up = upload_auto(site_id, drive_id, leaf_item["id"], file_path)
+                journal.record(i, leaf_item["id"], file_path)
+                print(f"[{i}] ✅ {os.path.basename(file_path)} → {up.get('webUrl')}")
+                ok += 1
+            except Exception as e:
+                # 404 con site/drive de la caché: puede que la biblioteca se haya recreado
+                if attempt == 1 and is_not_found(e) and refresh_site_drive():
+                    site_id, drive_id = get_site_drive()
+                    continue
+                print(f"[{i}] ❌ {leaf}: {e}")
+                fail += 1
+            break
+
+    journal.close()
+    if skipped:
+        print(f"\n↷ {skipped} fila(s) ya subidas según {journal.path.name}; omitidas")
     print(f"\nResumen: OK={ok}  FALLIDOS={fail}")
 
 
+# Nombres que antes se calculaban al importar; se resuelven al primer acceso
+_LAZY = {
+    "config": load_config,
+    "TENANT_ID": lambda: load_config()["sharepoint"]["tenant_id"],
+    "CLIENT_ID": lambda: load_config()["sharepoint"]["client_id"],
+    "CLIENT_SECRET": lambda: load_config()["sharepoint"]["client_secret"],
+    "TOKENS": get_tokens,
+    "TOKEN": get_access_token,
+    "CLIENT": get_client,
+    "SITE_ID": lambda: get_site_drive()[0],
+    "DRIVE_ID": lambda: get_site_drive()[1],
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # =========================
 # 8) MAIN
 # =========================
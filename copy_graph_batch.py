@@ -1,82 +1,90 @@
 import os
 import json
-import requests
-import msal
-import pandas as pd
+from functools import lru_cache
 from urllib.parse import quote
 
+from folder_index import FolderNameIndex
+from graph_client import GRAPH, GraphClient
+from site_cache import SiteCache, is_not_found
+from token_provider import TokenProvider
+
+# site_id/drive_id resueltos en corridas anteriores (ver site_cache.py)
+SITE_CACHE = SiteCache()
+
 # ------------------------------
 # 🔹 1) Leer configuración
 # ------------------------------
-with open("config_tenant.json", "r", encoding="utf-8") as f:
-    config = json.load(f)
-
-tenant_id       = config["sharepoint"]["tenant_id"]
-client_id       = config["sharepoint"]["client_id"]
-client_secret   = config["sharepoint"]["client_secret"]
-site_name       = config["sharepoint"]["site_name"]        # p.ej. "BacklogTI"
-site_domain     = config["sharepoint"]["site_domain"]      # p.ej. "lajoyaminingsac.sharepoint.com"
-document_library= config["sharepoint"]["document_library"] # p.ej. "Documentos compartidos"
+# Todo se resuelve al primer uso (lru_cache): importar no lee archivos ni llama a Graph
+@lru_cache(maxsize=None)
+def load_config() -> dict:
+    with open("config_tenant.json", "r", encoding="utf-8") as f:
+        # site_name p.ej. "BacklogTI", site_domain p.ej. "lajoyaminingsac.sharepoint.com",
+        # document_library p.ej. "Documentos compartidos"
+        return json.load(f)["sharepoint"]
 
 # ------------------------------
 # 🔹 2) MSAL: token app-only
 # ------------------------------
-authority = f"https://login.microsoftonline.com/{tenant_id}"
-scope = ["https://graph.microsoft.com/.default"]
-
-app = msal.ConfidentialClientApplication(
-    client_id, authority=authority, client_credential=client_secret
-)
-tok = app.acquire_token_for_client(scopes=scope)
-if "access_token" not in tok:
-    raise RuntimeError(f"No se pudo obtener token: {tok}")
-
-headers = {"Authorization": f"Bearer {tok['access_token']}"}
-GRAPH = "https://graph.microsoft.com/v1.0"
+# Caché MSAL en disco + renovación antes de expirar (ver token_provider.py)
+@lru_cache(maxsize=None)
+def get_tokens() -> TokenProvider:
+    sp = load_config()
+    return TokenProvider(sp["tenant_id"], sp["client_id"], sp["client_secret"]).start_background_refresh()
 
 # ------------------------------
 # 🔹 3) Utilidades Graph
 # ------------------------------
-def gget(url, **kw):
-    r = requests.get(url, headers=headers, timeout=30, **kw)
-    if r.status_code >= 400:
-        print("GET ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json()
-
-def gpost(url, json_body):
-    r = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=json_body, timeout=30)
-    if r.status_code >= 400:
-        print("POST ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json()
-
-def gupload(url, data):
-    r = requests.put(url, headers=headers, data=data, timeout=120)
-    if r.status_code not in (200, 201):
-        print("PUT ERR:", r.status_code, url, r.text)
-        r.raise_for_status()
-    return r.json()
+# Sesión keep-alive compartida (ver graph_client.py)
+@lru_cache(maxsize=None)
+def get_client() -> GraphClient:
+    return GraphClient(get_tokens())
 
 # ------------------------------
 # 🔹 4) siteId y driveId
 # ------------------------------
-def get_site_id():
-    url = f"{GRAPH}/sites/{site_domain}:/sites/{site_name}"
-    resp = gget(url)
+def lookup_site_id():
+    sp = load_config()
+    url = f"{GRAPH}/sites/{sp['site_domain']}:/sites/{sp['site_name']}"
+    resp = get_client().get(url)
     return resp["id"]
 
-site_id = get_site_id()
-
-def get_drive_id_by_name(drive_name: str):
-    url = f"{GRAPH}/sites/{site_id}/drives?$select=id,name"
-    data = gget(url)
+def get_drive_id_by_name(drive_name: str, site_id=None):
+    url = f"{GRAPH}/sites/{site_id or get_site_id()}/drives?$select=id,name"
+    data = get_client().get(url)
     for d in data.get("value", []):
         if d["name"].lower() == drive_name.lower():
             return d["id"]
     raise RuntimeError(f"No encontré la biblioteca '{drive_name}' en el sitio.")
 
-drive_id = get_drive_id_by_name(document_library)
+def _site_key():
+    sp = load_config()
+    return sp["site_domain"], f"/sites/{sp['site_name']}", sp["document_library"]
+
+def lookup_site_drive() -> dict:
+    site_id = lookup_site_id()
+    return {"site_id": site_id, "drive_id": get_drive_id_by_name(_site_key()[2], site_id)}
+
+@lru_cache(maxsize=None)
+def get_site_drive() -> tuple:
+    """(siteId, driveId) de la caché de resolución o de Graph, una vez por proceso."""
+    ids, _ = SITE_CACHE.resolve(*_site_key(), lookup_site_drive)
+    return ids["site_id"], ids["drive_id"]
+
+def refresh_site_drive() -> bool:
+    """Tras un 404 con ids de la caché: los resuelve de nuevo. True si cambiaron."""
+    if SITE_CACHE.revalidate(*_site_key(), lookup_site_drive) is None:
+        return False
+    get_site_drive.cache_clear()
+    return True
+
+def get_site_id():
+    return get_site_drive()[0]
+
+def get_drive_id():
+    return get_site_drive()[1]
+
+def drive_url() -> str:
+    return f"{GRAPH}/sites/{get_site_id()}/drives/{get_drive_id()}"
 
 # ------------------------------
 # 🔹 5) Resolver carpeta por prefijo
@@ -87,53 +95,43 @@ def get_item_by_path(rel_path: str):
     rel_path: 'Facturas/LJC/2025/JUL'
     """
     rel_path = rel_path.strip("/")
-    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/root:/{quote(rel_path, safe='/')}"
-    return gget(url)  # {id, name, ...}
+    url = f"{drive_url()}/root:/{quote(rel_path, safe='/')}"
+    return get_client().get(url)  # {id, name, ...}
 
 def list_children(folder_id: str):
     """Lista subcarpetas inmediatas de folder_id (paginado)."""
-    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}/children?$select=id,name,folder"
+    url = f"{drive_url()}/items/{folder_id}/children?$select=id,name,folder"
     items = []
     while url:
-        data = gget(url)
+        data = get_client().get(url)
         items.extend([it for it in data.get("value", []) if it.get("folder")])
         url = data.get("@odata.nextLink")
     return items
 
+# parent_id -> FolderNameIndex (un listado por carpeta padre en toda la corrida)
+_folder_indexes = {}
+
+def folder_index(parent_id: str) -> FolderNameIndex:
+    if parent_id not in _folder_indexes:
+        _folder_indexes[parent_id] = FolderNameIndex(list_children(parent_id))
+    return _folder_indexes[parent_id]
+
 def find_child_by_prefix(parent_id: str, wanted_prefix: str):
     """
     Devuelve la subcarpeta cuyo nombre:
       1) coincide exacto (case-insensitive), o
-      2) empieza con wanted_prefix, o
+      2) empieza con wanted_prefix (el más largo, más específico), o
       3) lo contiene (fallback).
     """
-    wanted = str(wanted_prefix).strip()
-    kids = list_children(parent_id)
-
-    # exacto
-    for it in kids:
-        if it["name"].lower() == wanted.lower():
-            return it
-
-    # empieza con
-    pref = wanted.lower()
-    matches = [it for it in kids if it["name"].lower().startswith(pref)]
-    if len(matches) == 1:
-        return matches[0]
-    if len(matches) > 1:
-        # el más largo (más específico)
-        matches.sort(key=lambda x: len(x["name"]), reverse=True)
-        return matches[0]
-
-    # contiene
-    contains = [it for it in kids if pref in it["name"].lower()]
-    return contains[0] if contains else None
+    return folder_index(parent_id).resolve(str(wanted_prefix))
 
 def create_folder(parent_id: str, name: str):
     """Crea una subcarpeta (si quieres permitir crear cuando no existe)."""
-    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{parent_id}/children"
+    url = f"{drive_url()}/items/{parent_id}/children"
     body = {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-    return gpost(url, body)
+    created = get_client().post(url, body)
+    _folder_indexes.pop(parent_id, None)
+    return created
 
 def ensure_target_folder(base_folder: str, excel_leaf: str, create_if_missing=False):
     """
@@ -157,9 +155,9 @@ def ensure_target_folder(base_folder: str, excel_leaf: str, create_if_missing=Fa
 # ------------------------------
 def upload_file_to_folder_id(folder_id: str, local_file: str):
     file_name = os.path.basename(local_file)
-    url = f"{GRAPH}/sites/{site_id}/drives/{drive_id}/items/{folder_id}:/{quote(file_name)}:/content"
+    url = f"{drive_url()}/items/{folder_id}:/{quote(file_name)}:/content"
     with open(local_file, "rb") as f:
-        info = gupload(url, f)
+        info = get_client().put(url, data=f)
     print(f"✅ Subido: {info.get('name')}  →  {info.get('webUrl')}")
     return info
 
@@ -167,8 +165,10 @@ def upload_file_to_folder_id(folder_id: str, local_file: str):
 # 🔹 7) Carga masiva desde Excel (columna = prefijo)
 # ------------------------------
 def upload_from_excel(excel_file: str, column_name: str, local_file: str, base_folder: str, create_if_missing=False):
-    # Leer TODO como texto para evitar "0701-0057" -> "701-0057.0"
-    df = pd.read_excel(excel_file, dtype=str, keep_default_na=False)
+    from row_source import read_rows  # pandas/openpyxl solo al procesar el Excel
+
+    # Leer como texto para evitar "0701-0057" -> "701-0057.0"
+    df = read_rows(excel_file, [column_name])
 
     if column_name not in df.columns:
         raise ValueError(f"La columna '{column_name}' no existe en {excel_file}")
@@ -177,11 +177,16 @@ def upload_from_excel(excel_file: str, column_name: str, local_file: str, base_f
         leaf = (raw or "").strip()
         if not leaf:
             continue
-        try:
-            target = ensure_target_folder(base_folder, leaf, create_if_missing=create_if_missing)
-            upload_file_to_folder_id(target["id"], local_file)
-        except Exception as ex:
-            print(f"⚠️ {leaf}: {ex}")
+        for attempt in (1, 2):
+            try:
+                target = ensure_target_folder(base_folder, leaf, create_if_missing=create_if_missing)
+                upload_file_to_folder_id(target["id"], local_file)
+            except Exception as ex:
+                # 404 con site/drive de la caché: la biblioteca pudo recrearse; se reintenta con los ids nuevos
+                if attempt == 1 and is_not_found(ex) and refresh_site_drive():
+                    continue
+                print(f"⚠️ {leaf}: {ex}")
+            break
 
 # ------------------------------
 # 🔹 8) Ejecución
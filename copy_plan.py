@@ -0,0 +1,153 @@
+# copy_plan.py
+"""
+Plan de copias serializado (JSONL) para separar descubrimiento y ejecución.
+
+La primera línea es la cabecera (modo, sitio, drive, base y Excel de origen);
+cada línea siguiente es una subida: fila del Excel, archivo local y su
+tamaño, y la carpeta destino (id, nombre y mes). Con --plan-out se escribe
+y con --execute se vuelve a leer para subir sin consultar Graph; el mismo
+plan se puede revisar y ejecutar las veces que haga falta.
+
+Con --shard i/N cada proceso (o máquina) ejecuta solo su parte del plan,
+repartida por id de carpeta destino: dos shards nunca escriben en la misma
+carpeta. Cada shard deja un archivo de resultado que --merge-shards suma.
+"""
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+PathLike = Union[str, Path]
+Shard = Tuple[int, int]
+
+PLAN_VERSION = 1
+
+
+def _plain(value):
+    """Enteros de numpy/pandas (índice del DataFrame) → int de Python para json."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def write_plan(path: PathLike, header: Dict, tasks: List[Dict]) -> int:
+    sizes: Dict[str, int] = {}
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        head = {"plan": PLAN_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), **header, "tasks": len(tasks)}
+        f.write(json.dumps(head, ensure_ascii=False) + "\n")
+        for t in tasks:
+            src = str(Path(t["local_path"]).resolve())  # el plan puede ejecutarse desde otra carpeta
+            if src not in sizes:
+                sizes[src] = os.path.getsize(src)
+            f.write(json.dumps({
+                "row": _plain(t["row"]),
+                "source": src,
+                "size": sizes[src],
+                "mes": t["mes"],
+                "folder_id": t["folder"]["id"],
+                "folder_name": t["folder"].get("name", ""),
+            }, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+    return len(tasks)
+
+
+def read_plan(path: PathLike) -> Tuple[Dict, List[Dict]]:
+    """
+    Devuelve (cabecera, tareas) con las tareas en el formato de
+    execute_uploads: {row, local_path, mes, folder: {id, name}} más `size`.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+        header = json.loads(first) if first.strip() else {}
+        if header.get("plan") != PLAN_VERSION:
+            raise ValueError(f"{path} no es un plan de copias válido (versión {header.get('plan')!r})")
+        tasks = []
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            tasks.append({
+                "row": rec["row"],
+                "local_path": Path(rec["source"]),
+                "size": rec.get("size"),
+                "mes": rec.get("mes", ""),
+                "folder": {"id": rec["folder_id"], "name": rec.get("folder_name", "")},
+            })
+    return header, tasks
+
+
+def check_sources(tasks: List[Dict]) -> List[str]:
+    """Archivos del plan que ya no existen o cambiaron de tamaño desde que se planificó."""
+    problems: List[str] = []
+    seen: Dict[str, bool] = {}
+    for t in tasks:
+        src = str(t["local_path"])
+        if src in seen:
+            continue
+        seen[src] = True
+        if not os.path.exists(src):
+            problems.append(f"no existe: {src}")
+        elif t.get("size") is not None and os.path.getsize(src) != t["size"]:
+            problems.append(f"cambió de tamaño ({t['size']} → {os.path.getsize(src)} bytes): {src}")
+    return problems
+
+
+# ---------- Shards ----------
+def parse_shard(text: str) -> Shard:
+    """'2/4' → (2, 4); los shards se numeran desde 1."""
+    try:
+        i, n = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard inválido '{text}': se espera i/N, p.ej. 1/4")
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(f"Shard inválido '{text}': i debe estar entre 1 y N")
+    return i, n
+
+
+def shard_of(folder_id: str, n: int) -> int:
+    """Shard (1..n) de una carpeta destino; crc32 da lo mismo en cualquier máquina."""
+    return zlib.crc32(folder_id.encode("utf-8")) % n + 1
+
+
+def shard_tasks(tasks: List[Dict], shard: Shard) -> List[Dict]:
+    i, n = shard
+    return [t for t in tasks if shard_of(t["folder"]["id"], n) == i]
+
+
+def shard_result_path(plan_path: PathLike, shard: Shard) -> Path:
+    """plan.jsonl → plan.shard2of4.result.json"""
+    p = Path(plan_path)
+    return p.with_name(f"{p.stem}.shard{shard[0]}of{shard[1]}.result.json")
+
+
+def write_shard_result(plan_path: PathLike, shard: Shard, header: Dict, planned: int, uploaded: int,
+                       journal: Optional[PathLike] = None) -> Path:
+    out = shard_result_path(plan_path, shard)
+    out.write_text(json.dumps({
+        "plan": str(Path(plan_path).resolve()),
+        "plan_created": header.get("created"),
+        "mode": header.get("mode"),
+        "shard": f"{shard[0]}/{shard[1]}",
+        "planned": planned,
+        "uploaded": uploaded,
+        "journal": str(journal) if journal else None,
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, ensure_ascii=False), encoding="utf-8")
+    return out
+
+
+def read_shard_results(plan_path: PathLike) -> Tuple[Dict[int, Dict], Optional[int]]:
+    """Resultados por número de shard y N (None si no hay ninguno)."""
+    p = Path(plan_path)
+    results: Dict[int, Dict] = {}
+    total_shards = None
+    for f in sorted(p.parent.glob(f"{p.stem}.shard*of*.result.json")):
+        rec = json.loads(f.read_text(encoding="utf-8"))
+        i, n = parse_shard(rec["shard"])
+        if total_shards is not None and n != total_shards:
+            raise ValueError(f"Resultados de shards con N distinto ({total_shards} y {n}) para {p.name}")
+        total_shards = n
+        results[i] = rec
+    return results, total_shards
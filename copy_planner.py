@@ -0,0 +1,75 @@
+# copy_planner.py
+"""
+Plan de copias (fila del Excel → carpeta destino, por mes) armado con pandas.
+
+En vez de recorrer meses × filas × carpetas en Python, se arma una tabla con
+todas las carpetas de todos los meses (nombre ya normalizado) y se hace un
+join con los prefijos del Excel: un merge por cada largo de prefijo distinto,
+comparando el prefijo contra los primeros L caracteres de cada carpeta.
+Mismo criterio que FolderNameIndex.startswith (sin distinguir mayúsculas ni
+espacios alrededor) y mismo orden que el recorrido anterior:
+mes → fila → orden del listado de carpetas.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+
+def _norm(series: pd.Series) -> pd.Series:
+    """Vectorizado de folder_index.norm_folder_name."""
+    return series.astype(str).str.strip().str.lower()
+
+
+def folder_table(months: Sequence[Tuple[str, Sequence[Dict]]]) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    months: [(nombre_mes, carpetas de Graph)] en el orden de MESES.
+    Devuelve la tabla (mes_pos, mes, folder, name_norm) y la lista plana de
+    carpetas; `folder` es la posición en esa lista.
+    """
+    folders: List[Dict] = []
+    mes_pos: List[int] = []
+    mes_names: List[str] = []
+    for pos, (mes, items) in enumerate(months):
+        folders.extend(items)
+        mes_pos.extend([pos] * len(items))
+        mes_names.extend([mes] * len(items))
+    table = pd.DataFrame({
+        "mes_pos": mes_pos,
+        "mes": mes_names,
+        "folder": range(len(folders)),
+        "name_norm": _norm(pd.Series([f.get("name", "") for f in folders], dtype=object)),
+    })
+    return table, folders
+
+
+def plan_copies(rows: pd.DataFrame, months: Sequence[Tuple[str, Sequence[Dict]]]):
+    """
+    rows: columnas 'row' y 'prefix'; cualquier otra (p.ej. 'source') pasa al plan.
+    Devuelve (plan, unmatched, folders):
+      - plan: una fila por (fila del Excel, carpeta destino) con row, mes, folder
+        (posición en `folders`) y las columnas extra de `rows`.
+      - unmatched: (row, mes, prefix) de las filas sin carpeta en ese mes.
+    """
+    table, folders = folder_table(months)
+    rows = rows.assign(key=_norm(rows["prefix"]))
+    rows = rows[rows["key"] != ""]
+
+    parts = []
+    for length, group in rows.groupby(rows["key"].str.len(), sort=False):
+        candidates = table.assign(key=table["name_norm"].str[:length])
+        parts.append(group.merge(candidates, on="key", how="inner"))
+    extra = [c for c in rows.columns if c != "key"]
+    if parts:
+        plan = pd.concat(parts, ignore_index=True)
+    else:
+        plan = pd.DataFrame(columns=extra + ["mes_pos", "mes", "folder"])
+    plan = plan.sort_values(["mes_pos", "row", "folder"], kind="stable", ignore_index=True)
+
+    # Filas × meses sin ninguna carpeta que empiece con el prefijo
+    month_df = pd.DataFrame({"mes_pos": range(len(months)), "mes": [m for m, _ in months]})
+    pairs = rows[["row", "prefix"]].merge(month_df, how="cross")
+    hit = plan[["row", "mes_pos"]].drop_duplicates().assign(_hit=True)
+    pairs = pairs.merge(hit, on=["row", "mes_pos"], how="left")
+    unmatched = pairs[pairs["_hit"].isna()].sort_values(["mes_pos", "row"], kind="stable", ignore_index=True)
+
+    return plan[extra + ["mes_pos", "mes", "folder"]], unmatched[["row", "mes_pos", "mes", "prefix"]], folders
@@ -5,10 +5,8 @@ import unicodedata
 from pathlib import Path
 from typing import Iterable, List, Tuple, Dict, Optional
 
-import pandas as pd
-import pdfplumber
-from PIL import Image
-from unidecode import unidecode
+# pdfplumber / PyPDF2 / pandas se importan dentro de cada función: son lentos de
+# cargar y no hacen falta solo por importar el módulo
 
 # -----------------------
 # Utilidades de texto
@@ -54,6 +52,8 @@ def find_constancia_blocks(
     if not targets:
         return results
 
+    import pdfplumber
+
     with pdfplumber.open(str(pdf_path)) as pdf:
         for pidx, page in enumerate(pdf.pages):
             raw_text = page.extract_text() or ""
@@ -159,10 +159,12 @@ def crop_to_pdf_and_png(pdf_path: Path, page_index: int, bbox, salida_dir: Path,
 # Lectura de Excel
 # -----------------------
 def read_constancias_from_excel(xlsx_path: Path, sheet: Optional[str], column_name: str) -> List[str]:
-    df = pd.read_excel(xlsx_path, sheet_name=sheet)
+    from row_source import read_rows
+
+    df = read_rows(xlsx_path, [column_name], sheet=sheet)
     if column_name not in df.columns:
-        raise ValueError(f"En el Excel no existe la columna '{column_name}'. Columnas: {list(df.columns)}")
-    series = df[column_name].dropna().astype(str).map(lambda s: re.sub(r"\D", "", s))
+        raise ValueError(f"En el Excel no existe la columna '{column_name}'.")
+    series = df[column_name].map(lambda s: re.sub(r"\D", "", s))
     return [s for s in series if s.strip()]
 
 # -----------------------
@@ -0,0 +1,68 @@
+# folder_index.py
+"""
+Índice de nombres de carpeta, construido una vez por carpeta padre.
+
+Reemplaza los recorridos lineales (que además re-normalizaban cada nombre en
+cada comparación) por: hash para igualdad exacta, lista ordenada + bisect para
+prefijos y un recorrido sobre nombres ya normalizados solo como último recurso.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def norm_folder_name(name: Any) -> str:
+    return str(name).strip().lower()
+
+
+class FolderNameIndex:
+    """
+    `items` pueden ser dicts de Graph ({"name": ...}) u objetos con `.name`
+    (office365); `name_of` indica cómo leer el nombre.
+    `normalize` define qué nombres se consideran iguales: por defecto sin
+    distinguir mayúsculas ni espacios de los extremos; normalize=str compara
+    el nombre tal cual (como str.startswith).
+    Las búsquedas devuelven los items en el orden original del listado.
+    """
+
+    def __init__(self, items: Iterable[Any], name_of: Callable[[Any], str] = lambda it: it.get("name", ""),
+                 normalize: Callable[[Any], str] = norm_folder_name):
+        self.items: List[Any] = list(items)
+        self.name_of = name_of
+        self.normalize = normalize
+        self._norm: List[str] = [normalize(name_of(it)) for it in self.items]
+        self._exact: Dict[str, int] = {}
+        for pos, key in enumerate(self._norm):
+            self._exact.setdefault(key, pos)
+        self._sorted = sorted((key, pos) for pos, key in enumerate(self._norm))
+        self._sorted_keys = [key for key, _ in self._sorted]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def exact(self, name: str) -> Optional[Any]:
+        pos = self._exact.get(self.normalize(name))
+        return self.items[pos] if pos is not None else None
+
+    def startswith(self, prefix: str) -> List[Any]:
+        key = self.normalize(prefix)
+        lo = bisect_left(self._sorted_keys, key)
+        hi = bisect_right(self._sorted_keys, key + _MAX_CHAR, lo)
+        return [self.items[pos] for pos in sorted(pos for _, pos in self._sorted[lo:hi])]
+
+    def contains(self, text: str) -> List[Any]:
+        key = self.normalize(text)
+        return [self.items[pos] for pos, name in enumerate(self._norm) if key in name]
+
+    def resolve(self, segment: str) -> Optional[Any]:
+        """Igualdad (case-insensitive) → prefijo más largo → contiene."""
+        hit = self.exact(segment)
+        if hit is not None:
+            return hit
+        pref = self.startswith(segment)
+        if pref:
+            # max() se queda con el primero entre los de igual largo (igual que sort estable)
+            return max(pref, key=lambda it: len(self.name_of(it)))
+        contains = self.contains(segment)
+        return contains[0] if contains else None
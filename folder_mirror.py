@@ -0,0 +1,176 @@
+# folder_mirror.py
+"""
+Espejo local (SQLite) del árbol de carpetas de una biblioteca de SharePoint.
+
+Se refresca incrementalmente con el endpoint /delta de Graph guardando el
+deltaLink; una corrida "en caliente" cuesta una llamada delta en lugar de
+miles de listados de /children.
+"""
+import sqlite3
+from typing import Callable, Dict, List, Optional
+
+from graph_client import GRAPH
+
+DEFAULT_MIRROR_DB = "sharepoint_mirror.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id        TEXT PRIMARY KEY,
+    parent_id TEXT,
+    name      TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    web_url   TEXT,
+    child_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_items_parent ON items(parent_id);
+CREATE TABLE IF NOT EXISTS state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class FolderMirror:
+    """
+    Solo guarda carpetas (driveItems con facet 'folder'), indexadas por id.
+    `fetch(url) -> dict` es el GET autenticado de cada script.
+    """
+
+    def __init__(self, db_path: str, site_id: str, drive_id: str):
+        self.db_path = db_path
+        self.site_id = site_id
+        self.drive_id = drive_id
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(items)")}
+        if "child_count" not in columns:
+            # Base creada antes de guardar childCount
+            self.conn.execute("ALTER TABLE items ADD COLUMN child_count INTEGER NOT NULL DEFAULT 0")
+        if self._get_state("drive_id") != drive_id:
+            # Otro drive (o base nueva): empezar de cero
+            self.reset()
+            self._set_state("drive_id", drive_id)
+            self.conn.commit()
+
+    # ---------- estado ----------
+    def _get_state(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: Optional[str]):
+        self.conn.execute(
+            "INSERT INTO state(key, value) VALUES(?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def reset(self):
+        self.conn.execute("DELETE FROM items")
+        self.conn.execute("DELETE FROM state")
+        self.conn.commit()
+
+    # ---------- sincronización ----------
+    def _delta_start_url(self) -> str:
+        return (
+            f"{GRAPH}/sites/{self.site_id}/drives/{self.drive_id}/root/delta"
+            "?$select=id,name,folder,root,parentReference,deleted,webUrl"
+        )
+
+    def _apply(self, item: Dict):
+        if "deleted" in item:
+            self.conn.execute("DELETE FROM items WHERE id = ?", (item["id"],))
+            return
+        if "folder" not in item and "root" not in item:
+            return  # archivos: no se guardan
+        if "root" in item:
+            self._set_state("root_id", item["id"])
+        parent_id = (item.get("parentReference") or {}).get("id")
+        name = item.get("name", "")
+        child_count = (item.get("folder") or {}).get("childCount", 0)
+        self.conn.execute(
+            "INSERT INTO items(id, parent_id, name, name_norm, web_url, child_count) VALUES(?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET parent_id = excluded.parent_id, name = excluded.name, "
+            "name_norm = excluded.name_norm, web_url = excluded.web_url, child_count = excluded.child_count",
+            (item["id"], parent_id, name, name.strip().lower(), item.get("webUrl"), child_count),
+        )
+
+    def sync(self, fetch: Callable[[str], Dict]) -> int:
+        """
+        Aplica los cambios desde el último deltaLink (o hace la carga inicial).
+        Devuelve la cantidad de items recibidos.
+        """
+        url = self._get_state("delta_link") or self._delta_start_url()
+        received = 0
+        while url:
+            try:
+                page = fetch(url)
+            except Exception as e:
+                # 410 Gone: el deltaLink expiró; Graph pide resincronizar completo
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status == 410 and received == 0 and self._get_state("delta_link"):
+                    self.reset()
+                    self._set_state("drive_id", self.drive_id)
+                    url = self._delta_start_url()
+                    continue
+                raise
+            for item in page.get("value", []):
+                self._apply(item)
+            received += len(page.get("value", []))
+            if "@odata.deltaLink" in page:
+                self._set_state("delta_link", page["@odata.deltaLink"])
+                url = None
+            else:
+                url = page.get("@odata.nextLink")
+        self.conn.commit()
+        return received
+
+    # ---------- consultas ----------
+    @staticmethod
+    def _row_to_item(row) -> Dict:
+        # Mismo shape que un driveItem de Graph: el facet "folder" no puede ir vacío,
+        # los llamadores filtran carpetas con it.get("folder")
+        item_id, parent_id, name, web_url, child_count = row
+        return {
+            "id": item_id,
+            "name": name,
+            "folder": {"childCount": child_count or 0},
+            "webUrl": web_url,
+            "parentReference": {"id": parent_id},
+        }
+
+    def get_root(self) -> Dict:
+        root_id = self._get_state("root_id")
+        if not root_id:
+            raise RuntimeError("El espejo local no está sincronizado (sin carpeta raíz).")
+        return self.get_item(root_id)
+
+    def get_item(self, item_id: str) -> Dict:
+        row = self.conn.execute(
+            "SELECT id, parent_id, name, web_url, child_count FROM items WHERE id = ?", (item_id,)
+        ).fetchone()
+        if not row:
+            raise FileNotFoundError(f"No existe la carpeta con id {item_id} en el espejo local")
+        return self._row_to_item(row)
+
+    def children(self, parent_id: str) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT id, parent_id, name, web_url, child_count FROM items WHERE parent_id = ? ORDER BY name",
+            (parent_id,),
+        ).fetchall()
+        return [self._row_to_item(r) for r in rows]
+
+    def resolve_path(self, rel_path: str) -> Dict:
+        """Igual que ensure_path_exists: segmento a segmento, nombre exacto (case-insensitive)."""
+        current = self.get_root()
+        for seg in [s for s in rel_path.strip("/").split("/") if s]:
+            row = self.conn.execute(
+                "SELECT id, parent_id, name, web_url, child_count FROM items WHERE parent_id = ? AND name_norm = ?",
+                (current["id"], seg.strip().lower()),
+            ).fetchone()
+            if not row:
+                raise FileNotFoundError(f"No existe la carpeta: {seg} en {current['name']}")
+            current = self._row_to_item(row)
+        return current
+
+    def close(self):
+        self.conn.close()
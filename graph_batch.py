@@ -0,0 +1,108 @@
+# graph_batch.py
+"""
+Lecturas de metadatos agrupadas con JSON $batch de Graph.
+
+Hasta 20 GET independientes viajan en un solo POST /$batch; cada respuesta
+vuelve a su posición original y los @odata.nextLink se siguen en las tandas
+siguientes. Los sub-requests con throttling (429/503) o error transitorio
+vuelven a la tanda siguiente, después de esperar el Retry-After que trae la
+sub-respuesta; los demás errores se piden de nuevo solos para que lancen.
+"""
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from graph_client import GRAPH, RETRY_STATUSES
+
+BATCH_URL = f"{GRAPH}/$batch"
+MAX_BATCH = 20  # límite de Graph por $batch
+
+# Sub-requests con este status no se reintentan: se devuelven como None
+MISSING_STATUSES = {404}
+# Veces que un sub-request con throttling vuelve a un $batch antes de pedirse solo
+MAX_BATCH_RETRIES = 5
+MAX_RETRY_DELAY = 60.0
+
+
+def _relative(url: str) -> str:
+    """Los requests dentro de $batch van relativos a /v1.0."""
+    if url.startswith(GRAPH):
+        url = url[len(GRAPH):]
+    return url if url.startswith("/") else "/" + url
+
+
+def _retry_after(resp: Optional[Dict], attempt: int) -> float:
+    """Espera antes de reenviar: Retry-After de la sub-respuesta o backoff con jitter."""
+    headers = {k.lower(): v for k, v in ((resp or {}).get("headers") or {}).items()}
+    try:
+        return min(float(headers["retry-after"]), MAX_RETRY_DELAY)
+    except (KeyError, TypeError, ValueError):
+        return random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempt))
+
+
+def _run(post: Callable[[str, Dict], Dict], fetch: Callable[[str], Dict], urls: List[str], follow_next: bool) -> List:
+    results: List = [None] * len(urls)
+    if follow_next:
+        results = [[] for _ in urls]
+    missing = set()
+    # (posición, url, reintentos hechos)
+    pending = [(pos, url, 0) for pos, url in enumerate(urls)]
+
+    while pending:
+        chunk, pending = pending[:MAX_BATCH], pending[MAX_BATCH:]
+        payload = {
+            "requests": [
+                {"id": str(n), "method": "GET", "url": _relative(url)}
+                for n, (_, url, _) in enumerate(chunk)
+            ]
+        }
+        responses = {r.get("id"): r for r in post(BATCH_URL, payload).get("responses", [])}
+
+        retry = []
+        wait = 0.0
+        for n, (pos, url, attempt) in enumerate(chunk):
+            resp = responses.get(str(n))
+            status = resp.get("status", 500) if resp else 500
+            if status in MISSING_STATUSES:
+                missing.add(pos)
+                continue
+            if status in RETRY_STATUSES and attempt < MAX_BATCH_RETRIES:
+                # Throttling/error transitorio: a la próxima tanda, tras el Retry-After
+                retry.append((pos, url, attempt + 1))
+                wait = max(wait, _retry_after(resp, attempt))
+                continue
+            if status >= 400:
+                # Error definitivo (o reintentos agotados): pedido solo, con los
+                # reintentos de GraphClient; lanza si vuelve a fallar
+                body = fetch(url)
+            else:
+                body = resp.get("body") or {}
+
+            if not follow_next:
+                results[pos] = body
+                continue
+            results[pos].extend(body.get("value", []))
+            next_link = body.get("@odata.nextLink")
+            if next_link:
+                pending.append((pos, next_link, 0))
+
+        if retry:
+            time.sleep(wait)
+            pending = retry + pending
+
+    for pos in missing:
+        results[pos] = None
+    return results
+
+
+def batch_get(post: Callable[[str, Dict], Dict], fetch: Callable[[str], Dict], urls: List[str]) -> List[Optional[Dict]]:
+    """
+    Devuelve el body de cada URL en el mismo orden (None si Graph respondió 404).
+    `post(url, body)` y `fetch(url)` son los helpers autenticados del script.
+    """
+    return _run(post, fetch, urls, follow_next=False)
+
+
+def batch_list(post: Callable[[str, Dict], Dict], fetch: Callable[[str], Dict], urls: List[str]) -> List[Optional[List[Dict]]]:
+    """Como batch_get, pero junta todas las páginas de 'value' de cada colección."""
+    return _run(post, fetch, urls, follow_next=True)
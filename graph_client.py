@@ -0,0 +1,249 @@
+# graph_client.py
+"""
+Cliente HTTP único para Microsoft Graph, compartido por todos los scripts.
+
+Usa una requests.Session con conexiones keep-alive (sin repetir TCP/TLS en
+cada llamada), un pool dimensionado según la concurrencia, timeouts
+uniformes por método y un solo lugar donde se reportan los errores.
+
+Los 429/503 (throttling) y errores transitorios se reintentan respetando
+Retry-After, con backoff exponencial con jitter y un presupuesto de
+reintentos por corrida. Los POST (p.ej. /copy o crear carpeta) solo se
+reintentan ante 429, que Graph rechaza sin procesar, salvo que el llamador
+indique idempotent=True; opcionalmente un limitador AIMD ajusta cuántas
+llamadas van en paralelo.
+
+Con `metrics=` (GraphMetrics) cada llamada queda registrada: clase de
+endpoint, status, bytes, latencia total (con reintentos) y reintentos.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from graph_metrics import GraphMetrics, body_size
+
+# GRAPH_BASE_URL permite apuntar a otro endpoint (p.ej. mock_graph.py para benchmarks)
+GRAPH = os.environ.get("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0").rstrip("/")
+
+# Timeouts (segundos) por método; las subidas necesitan más margen
+TIMEOUTS = {"GET": 30, "POST": 60, "PUT": 180, "DELETE": 30}
+
+TokenSource = Union[str, Callable[[], str]]
+
+# Status que vale la pena reintentar; 429/503 además indican throttling
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+# Repetirlos no duplica efectos: se reintentan ante cualquier status de RETRY_STATUSES
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class RetryPolicy:
+    """
+    Backoff exponencial con "full jitter" salvo que Graph indique Retry-After.
+    `budget` es el total de reintentos permitidos en la corrida (compartido
+    entre hilos): si se agota, el error se propaga en vez de insistir.
+    """
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 1.0, max_delay: float = 60.0, budget: int = 500):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.budget <= 0:
+                return False
+            self.budget -= 1
+            return True
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_delay)
+                except ValueError:
+                    pass  # formato fecha HTTP: usar backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class AdaptiveLimiter:
+    """
+    Control de concurrencia AIMD: cada respuesta OK suma ~1 al límite por
+    "ventana" completa; cada throttling lo divide a la mitad (como mucho una
+    vez por `cooldown` segundos, para no colapsar por una ráfaga de 429).
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, cooldown: float = 2.0):
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+class GraphClient:
+    """
+    `token` puede ser el access token o una función que lo devuelva
+    (así se puede renovar sin recrear el cliente). Si además expone
+    `force_refresh()` (TokenProvider), un 401 renueva el token y reintenta una vez.
+    `pool_size` debería ser >= cantidad de hilos que usan el cliente.
+    """
+
+    def __init__(self, token: TokenSource, pool_size: int = 10, retry: Optional[RetryPolicy] = None,
+                 limiter: Optional[AdaptiveLimiter] = None, metrics: Optional[GraphMetrics] = None):
+        self._token = token
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter
+        self.metrics = metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def token(self) -> str:
+        return self._token() if callable(self._token) else self._token
+
+    def request(self, method: str, url: str, *, auth: bool = True, headers: Optional[Dict] = None,
+                ok_statuses=None, idempotent: Optional[bool] = None, **kw) -> requests.Response:
+        """
+        auth=False para URLs pre-autenticadas (uploadUrl de sesiones, monitores de /copy).
+        idempotent=None lo decide el método; un POST que se puede repetir sin
+        efectos duplicados (p.ej. un $batch de GET) pasa idempotent=True para
+        reintentarse también ante 5xx y errores de red.
+        Lanza requests.HTTPError (tras imprimir el detalle de Graph) si el status no es OK
+        y ya no corresponde reintentar.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        start = time.perf_counter()
+        state = {"response": None, "retries": 0}
+        try:
+            return self._request(method, url, auth, headers, ok_statuses, idempotent, kw, state)
+        finally:
+            r = state["response"]
+            if self.metrics is not None:
+                self.metrics.record_request(
+                    method, url, r.status_code if r is not None else 0,
+                    body_size(r.request.body) if r is not None else 0,
+                    len(r.content) if r is not None and not kw.get("stream") else 0,
+                    time.perf_counter() - start, state["retries"])
+
+    def _request(self, method: str, url: str, auth: bool, headers: Optional[Dict], ok_statuses, idempotent: bool,
+                 kw: Dict, state: Dict) -> requests.Response:
+        """`state` recibe la última respuesta y los reintentos hechos (para las métricas)."""
+        kw.setdefault("timeout", TIMEOUTS.get(method.upper(), 60))
+        data = kw.get("data")
+        start_pos = data.tell() if hasattr(data, "seek") and hasattr(data, "tell") else None
+
+        attempt = 0
+        refreshed = False
+        while True:
+            hdrs = {"Authorization": f"Bearer {self.token}"} if auth else {}
+            if headers:
+                hdrs.update(headers)
+            if start_pos is not None:
+                data.seek(start_pos)  # reenviar el archivo completo en cada intento
+            try:
+                with self._slot():
+                    r = self.session.request(method, url, headers=hdrs, **kw)
+                state["response"] = r
+            except (requests.ConnectionError, requests.Timeout) as e:
+                state["response"] = None
+                # Sin conectar, el servidor no recibió nada: se puede repetir cualquier método
+                if not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+                if attempt + 1 >= self.retry.max_attempts or not self.retry.take():
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                state["retries"] += 1
+                continue
+
+            failed = (ok_statuses and r.status_code not in ok_statuses) or (not ok_statuses and r.status_code >= 400)
+            if not failed:
+                if self.limiter:
+                    self.limiter.on_success()
+                return r
+            if r.status_code == 401 and auth and not refreshed and hasattr(self._token, "force_refresh"):
+                self._token.force_refresh()
+                refreshed = True
+                state["retries"] += 1
+                continue
+            if r.status_code in THROTTLE_STATUSES and self.limiter:
+                self.limiter.on_throttle()
+            retryable = r.status_code in RETRY_STATUSES if idempotent else r.status_code == 429
+            if retryable and attempt + 1 < self.retry.max_attempts and self.retry.take():
+                wait = self.retry.delay(attempt, r)
+                print(f"{method.upper()} {r.status_code}: reintento {attempt + 1} en {wait:.1f}s", url)
+                time.sleep(wait)
+                attempt += 1
+                state["retries"] += 1
+                continue
+            print(f"{method.upper()} ERR:", r.status_code, url, r.text)
+            r.raise_for_status()
+            # ok_statuses excluyó un 2xx/3xx: raise_for_status no lo considera error
+            raise requests.HTTPError(f"Status inesperado {r.status_code} para {url}", response=r)
+
+    @contextmanager
+    def _slot(self):
+        if self.limiter is None:
+            yield
+        else:
+            with self.limiter.slot():
+                yield
+
+    @staticmethod
+    def _json(r: requests.Response) -> Dict:
+        return r.json() if r.content else {}
+
+    def get(self, url: str, params=None, **kw) -> Dict:
+        return self._json(self.request("GET", url, params=params, **kw))
+
+    def post(self, url: str, body: Optional[Dict] = None, **kw) -> Dict:
+        return self._json(self.request("POST", url, json=body, **kw))
+
+    def put(self, url: str, data=None, headers: Optional[Dict] = None, **kw) -> Dict:
+        return self._json(self.request("PUT", url, data=data, headers=headers, **kw))
+
+    def delete(self, url: str, **kw):
+        self.request("DELETE", url, **kw)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,239 @@
+# graph_metrics.py
+"""
+Métricas de una corrida: cada llamada a Graph (clase de endpoint, método,
+status, bytes enviados/recibidos, latencia y reintentos), la duración de
+cada etapa (token, resolución del sitio, planificación, subidas...) y el
+throughput de las subidas.
+
+GraphClient las registra si recibe `metrics=`; los scripts marcan las
+etapas con `with METRICS.stage("plan"): ...`. Al final se escriben como
+JSON (percentiles p50/p95/p99 por endpoint y por etapa) y como textfile de
+Prometheus (node_exporter --collector.textfile) para graficar corridas.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
+
+PathLike = Union[str, Path]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def endpoint_class(url: str) -> str:
+    """Agrupa URLs de Graph por tipo de operación (sin ids ni nombres)."""
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    if "/v1.0" not in path and "/beta" not in path:
+        # URLs pre-autenticadas: uploadUrl de sesiones y monitores de /copy
+        return "preauth"
+    if path.endswith("/$batch"):
+        return "batch"
+    if path.endswith("/createUploadSession"):
+        return "upload-session"
+    if path.endswith("/content"):
+        return "content"
+    if path.endswith("/copy"):
+        return "copy"
+    if path.endswith("/delta"):
+        return "delta"
+    if path.endswith("/children"):
+        return "children"
+    if path.endswith("/drives"):
+        return "drives"
+    if re.search(r"/drives/[^/]+/root(:|$)", path):
+        return "by-path"
+    if "/items/" in path:
+        return "item"
+    if "/sites/" in path:
+        return "site"
+    return "other"
+
+
+def body_size(body) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    try:
+        return len(body)  # bytes, bytearray, memoryview
+    except TypeError:
+        return 0  # stream sin largo conocido
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    k = max(math.ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+
+def summarize(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    out = {"count": len(ordered), "sum": round(sum(ordered), 6),
+           "min": round(ordered[0], 6) if ordered else 0.0, "max": round(ordered[-1], 6) if ordered else 0.0}
+    for q in QUANTILES:
+        out[f"p{round(q * 100)}"] = round(percentile(ordered, q), 6)
+    return out
+
+
+class _RequestStats:
+    __slots__ = ("latencies", "statuses", "sent", "received", "retries")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = defaultdict(int)
+        self.sent = 0
+        self.received = 0
+        self.retries = 0
+
+
+class GraphMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.requests: Dict[Tuple[str, str], _RequestStats] = defaultdict(_RequestStats)
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.upload_seconds: List[float] = []
+        self.upload_bytes = 0
+
+    def record_request(self, method: str, url: str, status: int, sent: int, received: int,
+                       seconds: float, retries: int):
+        """status 0 = sin respuesta (error de conexión/timeout agotados los reintentos)."""
+        key = (endpoint_class(url), method.upper())
+        with self._lock:
+            s = self.requests[key]
+            s.latencies.append(seconds)
+            s.statuses[status] += 1
+            s.sent += sent
+            s.received += received
+            s.retries += retries
+
+    def record_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name].append(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_upload(self, size: int, seconds: float):
+        with self._lock:
+            self.upload_seconds.append(seconds)
+            self.upload_bytes += size
+
+    # ---------- exportación ----------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            wall = time.perf_counter() - self._t0
+            requests = []
+            for (endpoint, method), s in sorted(self.requests.items()):
+                requests.append({
+                    "endpoint": endpoint,
+                    "method": method,
+                    "statuses": {str(k): v for k, v in sorted(s.statuses.items())},
+                    "bytes_sent": s.sent,
+                    "bytes_received": s.received,
+                    "retries": s.retries,
+                    "latency_s": summarize(s.latencies),
+                })
+            uploads = len(self.upload_seconds)
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_s": round(wall, 3),
+                "requests_total": sum(r["latency_s"]["count"] for r in requests),
+                "retries_total": sum(r["retries"] for r in requests),
+                "requests": requests,
+                "stages": {name: summarize(v) for name, v in self.stages.items()},
+                "uploads": {
+                    "count": uploads,
+                    "bytes": self.upload_bytes,
+                    "latency_s": summarize(self.upload_seconds),
+                    "per_s": round(uploads / wall, 3) if wall else 0.0,
+                    "bytes_per_s": round(self.upload_bytes / wall, 1) if wall else 0.0,
+                },
+            }
+
+    def prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        snap = self.snapshot()
+        base = dict(labels or {})
+        lines: List[str] = []
+
+        def fmt(extra: Dict[str, str]) -> str:
+            merged = {**base, **extra}
+            if not merged:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in merged.items()) + "}"
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for extra, value in samples:
+                lines.append(f"{name}{fmt(extra)} {value}")
+
+        reqs = snap["requests"]
+        metric("graph_requests_total", "counter", "Llamadas a Graph por endpoint, método y status",
+               [({"endpoint": r["endpoint"], "method": r["method"], "status": st}, n)
+                for r in reqs for st, n in r["statuses"].items()])
+        metric("graph_request_retries_total", "counter", "Reintentos (429/5xx/red/401)",
+               [({"endpoint": r["endpoint"], "method": r["method"]}, r["retries"]) for r in reqs])
+        metric("graph_request_bytes_sent_total", "counter", "Bytes enviados en el cuerpo",
+               [({"endpoint": r["endpoint"], "method": r["method"]}, r["bytes_sent"]) for r in reqs])
+        metric("graph_request_bytes_received_total", "counter", "Bytes recibidos en el cuerpo",
+               [({"endpoint": r["endpoint"], "method": r["method"]}, r["bytes_received"]) for r in reqs])
+        samples = []
+        for r in reqs:
+            lbl = {"endpoint": r["endpoint"], "method": r["method"]}
+            lat = r["latency_s"]
+            samples += [({**lbl, "quantile": str(q)}, lat[f"p{round(q * 100)}"]) for q in QUANTILES]
+        metric("graph_request_duration_seconds", "summary", "Latencia por llamada (incluye reintentos)", samples)
+        for r in reqs:
+            lbl = {"endpoint": r["endpoint"], "method": r["method"]}
+            lines.append(f"graph_request_duration_seconds_sum{fmt(lbl)} {r['latency_s']['sum']}")
+            lines.append(f"graph_request_duration_seconds_count{fmt(lbl)} {r['latency_s']['count']}")
+
+        samples = []
+        for name, st in snap["stages"].items():
+            samples += [({"stage": name, "quantile": str(q)}, st[f"p{round(q * 100)}"]) for q in QUANTILES]
+        metric("copy_stage_duration_seconds", "summary", "Duración de cada etapa de la corrida", samples)
+        for name, st in snap["stages"].items():
+            lines.append(f"copy_stage_duration_seconds_sum{fmt({'stage': name})} {st['sum']}")
+            lines.append(f"copy_stage_duration_seconds_count{fmt({'stage': name})} {st['count']}")
+
+        up = snap["uploads"]
+        metric("copy_uploads_total", "counter", "Archivos subidos", [({}, up["count"])])
+        metric("copy_upload_bytes_total", "counter", "Bytes de archivos subidos", [({}, up["bytes"])])
+        metric("copy_upload_throughput_bytes_per_second", "gauge", "Bytes subidos / duración de la corrida",
+               [({}, up["bytes_per_s"])])
+        metric("copy_run_duration_seconds", "gauge", "Duración total de la corrida", [({}, snap["wall_s"])])
+        metric("copy_run_started_timestamp_seconds", "gauge", "Inicio de la corrida (epoch)",
+               [({}, round(self.started, 3))])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: PathLike, labels: Optional[Dict[str, str]] = None) -> Tuple[Path, Path]:
+        """Escribe `path` (JSON) y el textfile de Prometheus al lado (.prom)."""
+        path = Path(path)
+        prom = path.with_suffix(".prom") if path.suffix.lower() == ".json" else path.with_name(path.name + ".prom")
+        payload = {**(labels or {}), **self.snapshot()}
+        for target, text in ((path, json.dumps(payload, indent=2, ensure_ascii=False)), (prom, self.prometheus(labels))):
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, target)  # node_exporter no debe leer un archivo a medio escribir
+        return path, prom
@@ -1,4 +1,5 @@
-from copy_children import *
+from copy_children import (COL_BASE, COL_FILE, COL_PREFIX, CREATE_MISSING, DEFAULT_BASE_REL_PATH, EXCEL_FILE,
+                            SHEET_NAME, process_excel)
 
 if __name__ == "__main__":
     entrada = int(input("Ingresa 1 para masivo, 2 para uno a uno: "))
@@ -0,0 +1,109 @@
+# local_index.py
+"""
+Índice de archivos locales para ubicar comprobantes (modo detracciones).
+
+El directorio de origen se recorre una sola vez por corrida; después cada
+comprobante se resuelve en memoria. Todos los comprobantes del Excel se
+buscan juntos con un autómata Aho-Corasick: cada nombre de archivo se lee
+una sola vez, sin importar cuántos comprobantes haya, y se conserva la
+semántica anterior (el comprobante aparece en cualquier parte del nombre).
+"""
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+PathLike = Union[str, Path]
+
+
+class _Matcher:
+    """Aho-Corasick mínimo: encuentra todos los patrones contenidos en un texto."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for pat in patterns:
+            self._add(pat)
+        self._link()
+
+    def _add(self, pat: str):
+        node = 0
+        for ch in pat:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(pat)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[str]:
+        found: List[str] = []
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found.extend(self._out[node])
+        return found
+
+
+class LocalFileIndex:
+    """
+    Archivos de `root` (recursivo) con extensión `ext`, en el orden del
+    recorrido. `match(tokens)` devuelve, por comprobante, todos los archivos
+    cuyo nombre lo contiene; si el nombre (sin extensión) es exactamente el
+    comprobante, ese archivo va primero.
+    """
+
+    def __init__(self, root: PathLike, ext: Optional[str] = None):
+        self.root = Path(root)
+        self.ext = ext.lower() if ext else None
+        self.files: List[Path] = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if self.ext and os.path.splitext(name)[1].lower() != self.ext:
+                    continue
+                self.files.append(Path(dirpath) / name)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def match(self, tokens: Iterable[str]) -> Dict[str, List[Path]]:
+        wanted = {str(t).strip() for t in tokens}
+        wanted.discard("")
+        exact: Dict[str, List[Path]] = {t: [] for t in wanted}
+        partial: Dict[str, List[Path]] = {t: [] for t in wanted}
+        if wanted:
+            matcher = _Matcher(wanted)
+            for p in self.files:
+                for tok in dict.fromkeys(matcher.find_all(p.name)):
+                    (exact if p.stem == tok else partial)[tok].append(p)
+        return {t: exact[t] + partial[t] for t in wanted}
+
+    @staticmethod
+    def ambiguous(matches: Dict[str, List[Path]]) -> Dict[str, List[Path]]:
+        """Comprobantes con más de un candidato, salvo que uno solo coincida exacto con el nombre."""
+        out = {}
+        for tok, paths in matches.items():
+            exact = sum(1 for p in paths if p.stem == tok)
+            if exact > 1 or (exact == 0 and len(paths) > 1):
+                out[tok] = paths
+        return out
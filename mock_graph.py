@@ -0,0 +1,434 @@
+# mock_graph.py
+"""
+Servidor HTTP local que imita los endpoints de Microsoft Graph que usan los
+scripts, para medir el motor de copia sin tocar el tenant real.
+
+Cubre: sitio por ruta (host:/sites/x) y sus drives, /drives, root, root:/ruta,
+children con paginado @odata.nextLink, creación de carpetas, PUT de
+contenido (por id y por ruta), createUploadSession + PUT por rangos, /copy
+con monitor, DELETE, root/delta y $batch.
+
+Perillas: latencia por request, tamaño de página, proporción de 429
+inyectados (con Retry-After) y cálculo opcional del quickXorHash.
+Además expone /_stats (conteo de requests) y /_reset.
+
+Uso suelto (los scripts apuntan acá con GRAPH_BASE_URL y GRAPH_ACCESS_TOKEN):
+    python mock_graph.py --port 8765 --latency 0.02 --throttle 0.05 \\
+        --seed "LJC/2025/01. ENERO" --folders 1000
+    set GRAPH_BASE_URL=http://127.0.0.1:8765/v1.0
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from quickxorhash import QuickXorHash
+
+SITE_ID = "mock-site"
+DRIVE_ID = "mock-drive"
+ROOT_ID = "root"
+
+Response = Tuple[int, Dict[str, str], Optional[Dict]]
+
+
+def _error(status: int, code: str, message: str) -> Response:
+    return status, {}, {"error": {"code": code, "message": message}}
+
+
+class MockDrive:
+    """Árbol en memoria de una biblioteca: carpetas y archivos (sin contenido)."""
+
+    def __init__(self, drive_name: str = "Facturas"):
+        self.drive_name = drive_name
+        self._ids = itertools.count(1)
+        self.items: Dict[str, Dict] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.items[ROOT_ID] = {"id": ROOT_ID, "name": "root", "root": {}, "folder": {"childCount": 0},
+                               "webUrl": "https://mock/root"}
+        self.children[ROOT_ID] = []
+
+    def _new_id(self) -> str:
+        return f"item{next(self._ids)}"
+
+    def child_by_name(self, parent_id: str, name: str) -> Optional[Dict]:
+        low = name.lower()
+        for cid in self.children.get(parent_id, []):
+            if self.items[cid]["name"].lower() == low:
+                return self.items[cid]
+        return None
+
+    def add(self, parent_id: str, name: str, folder: bool, size: int = 0, qxh: Optional[str] = None) -> Dict:
+        existing = self.child_by_name(parent_id, name)
+        if existing is not None and not folder:
+            # conflictBehavior=replace: se reemplaza el archivo
+            existing.update({"size": size, "file": {"hashes": {"quickXorHash": qxh}} if qxh else {"hashes": {}}})
+            return existing
+        item = {
+            "id": self._new_id(),
+            "name": name,
+            "webUrl": f"{self.items[parent_id]['webUrl']}/{name}",
+            "parentReference": {"driveId": DRIVE_ID, "id": parent_id},
+        }
+        if folder:
+            item["folder"] = {"childCount": 0}
+            self.children[item["id"]] = []
+        else:
+            item["size"] = size
+            item["file"] = {"hashes": {"quickXorHash": qxh} if qxh else {}}
+        self.items[item["id"]] = item
+        self.children[parent_id].append(item["id"])
+        return item
+
+    def by_path(self, path: str, create: bool = False) -> Optional[Dict]:
+        current = self.items[ROOT_ID]
+        for seg in [s for s in path.strip("/").split("/") if s]:
+            nxt = self.child_by_name(current["id"], seg)
+            if nxt is None:
+                if not create:
+                    return None
+                nxt = self.add(current["id"], seg, folder=True)
+            current = nxt
+        return current
+
+    def remove(self, item_id: str):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        parent = (item.get("parentReference") or {}).get("id")
+        if parent in self.children:
+            self.children[parent].remove(item_id)
+        for cid in list(self.children.pop(item_id, [])):
+            self.remove(cid)
+
+    def files(self) -> int:
+        return sum(1 for it in self.items.values() if "file" in it)
+
+    def seed(self, base: str, names: List[str]) -> Dict:
+        """Crea `base` y dentro una carpeta por cada nombre. Devuelve la carpeta base."""
+        parent = self.by_path(base, create=True)
+        for name in names:
+            self.add(parent["id"], name, folder=True)
+        return parent
+
+
+class MockGraph:
+    """Lógica de los endpoints, independiente del transporte HTTP (se reusa en $batch)."""
+
+    def __init__(self, base_url: str = "", site_host: str = "mock.sharepoint.com", site_path: str = "/sites/Bench",
+                 drive_name: str = "Facturas", latency: float = 0.0, page_size: int = 200,
+                 throttle_rate: float = 0.0, retry_after: float = 0.0, hashes: bool = False,
+                 copy_delay: float = 0.0, seed: int = 0):
+        self.base_url = base_url
+        self.site_host = site_host
+        self.site_path = site_path
+        self.latency = latency
+        self.page_size = page_size
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.hashes = hashes
+        self.copy_delay = copy_delay
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.drive = MockDrive(drive_name)
+        self.sessions: Dict[str, Dict] = {}
+        self._session_ids = itertools.count(1)
+        self.monitors: Dict[str, Dict] = {}
+        self.stats: Counter = Counter()
+
+    @property
+    def graph_url(self) -> str:
+        return f"{self.base_url}/v1.0"
+
+    def reset(self, drive_name: Optional[str] = None):
+        with self.lock:
+            self.drive = MockDrive(drive_name or self.drive.drive_name)
+            self.sessions.clear()
+            self.monitors.clear()
+            self.stats.clear()
+
+    # ---------- despacho ----------
+    def handle(self, method: str, raw_url: str, headers: Dict[str, str], body: bytes, sub: bool = False) -> Response:
+        parts = urlsplit(raw_url)
+        path = unquote(parts.path)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if path.startswith("/v1.0"):
+            path = path[len("/v1.0"):]
+
+        if path == "/_stats":
+            return 200, {}, self.snapshot()
+        if path == "/_reset":
+            self.reset()
+            return 204, {}, None
+
+        self.stats["requests"] += 1
+        self.stats["batch_subrequests" if sub else "http_requests"] += 1
+        if self.throttle_rate and self.random.random() < self.throttle_rate:
+            self.stats["throttled"] += 1
+            status, hdrs, payload = _error(429, "TooManyRequests", "Mock throttling")
+            return status, {"Retry-After": f"{self.retry_after:g}"}, payload
+
+        try:
+            status, hdrs, payload = self._route(method, path, query, headers, body)
+        except KeyError as e:
+            status, hdrs, payload = _error(404, "itemNotFound", f"No existe {e}")
+        self.stats[f"{method} {self._kind(path)}"] += 1
+        return status, hdrs, payload
+
+    @staticmethod
+    def _kind(path: str) -> str:
+        if path.startswith("/upload/"):
+            return "upload-range"
+        if path.startswith("/monitor/"):
+            return "copy-monitor"
+        for token in ("createUploadSession", "/content", "/children", "/copy", "/delta", "$batch", "/drives"):
+            if token in path:
+                return token.strip("/$")
+        if ":/" in path or path.endswith(":"):
+            return "by-path"
+        return "item"
+
+    def _route(self, method: str, path: str, query: Dict, headers: Dict, body: bytes) -> Response:
+        drive = self.drive
+        if path == "/$batch" and method == "POST":
+            return self._batch(json.loads(body or b"{}"))
+
+        m = re.fullmatch(r"/upload/([^/]+)", path)
+        if m:
+            return self._upload_range(method, m.group(1), headers, body)
+        m = re.fullmatch(r"/monitor/([^/]+)", path)
+        if m:
+            mon = self.monitors[m.group(1)]
+            done = time.monotonic() >= mon["ready_at"]
+            return 200 if done else 202, {}, {"status": "completed" if done else "inProgress",
+                                              "resourceId": mon["item_id"]}
+
+        m = re.fullmatch(r"/sites/([^/:]+):(/[^:]*)(:/drives)?", path)
+        if m:
+            if m.group(1) != self.site_host or m.group(2).rstrip("/") != self.site_path:
+                return _error(404, "itemNotFound", "Sitio inexistente")
+            if m.group(3):
+                return 200, {}, self._drives()
+            return 200, {}, {"id": SITE_ID, "webUrl": f"https://{self.site_host}{self.site_path}"}
+        m = re.fullmatch(r"/sites/([^/]+)/drives", path)
+        if m:
+            return 200, {}, self._drives()
+
+        m = re.fullmatch(r"/sites/([^/]+)/drives/([^/]+)(/.*)", path)
+        if not m or m.group(2) != DRIVE_ID:
+            return _error(404, "itemNotFound", f"Ruta no soportada: {path}")
+        rest = m.group(3)
+
+        with self.lock:
+            if rest == "/root" and method == "GET":
+                return 200, {}, drive.items[ROOT_ID]
+            if rest == "/root/delta" and method == "GET":
+                return 200, {}, self._delta()
+            m = re.fullmatch(r"/root:/(.+?):/content", rest)
+            if m and method == "PUT":
+                folder, _, name = m.group(1).rpartition("/")
+                parent = drive.by_path(folder, create=True)
+                return 201, {}, self._put_file(parent["id"], name, body)
+            m = re.fullmatch(r"/root:(/.*?):?", rest)
+            if m and method == "GET":
+                item = drive.by_path(m.group(1))
+                return (200, {}, item) if item else _error(404, "itemNotFound", f"No existe {m.group(1)}")
+            m = re.fullmatch(r"/items/([^/:]+)/children", rest)
+            if m:
+                parent_id = m.group(1)
+                drive.children[parent_id]  # KeyError → 404
+                if method == "GET":
+                    return 200, {}, self._children_page(path, parent_id, query)
+                if method == "POST":
+                    req = json.loads(body or b"{}")
+                    if drive.child_by_name(parent_id, req["name"]) is not None:
+                        return _error(409, "nameAlreadyExists", "Ya existe")
+                    return 201, {}, drive.add(parent_id, req["name"], folder=True)
+            m = re.fullmatch(r"/items/([^/:]+):/([^:/]+):/(content|createUploadSession)", rest)
+            if m:
+                parent_id, name, op = m.groups()
+                drive.children[parent_id]
+                if op == "content" and method == "PUT":
+                    return 201, {}, self._put_file(parent_id, name, body)
+                if op == "createUploadSession" and method == "POST":
+                    sid = f"s{next(self._session_ids)}"  # no len(): las sesiones terminadas se borran
+                    self.sessions[sid] = {"parent_id": parent_id, "name": name, "offset": 0,
+                                          "hash": QuickXorHash() if self.hashes else None}
+                    return 200, {}, {"uploadUrl": f"{self.base_url}/upload/{sid}",
+                                     "expirationDateTime": "2099-01-01T00:00:00Z",
+                                     "nextExpectedRanges": ["0-"]}
+            m = re.fullmatch(r"/items/([^/:]+)/copy", rest)
+            if m and method == "POST":
+                src = drive.items[m.group(1)]
+                req = json.loads(body or b"{}")
+                target = req["parentReference"]["id"]
+                drive.children[target]
+                qxh = ((src.get("file") or {}).get("hashes") or {}).get("quickXorHash")
+                item = drive.add(target, req.get("name") or src["name"], folder=False, size=src.get("size", 0), qxh=qxh)
+                mid = f"m{len(self.monitors) + 1}"
+                self.monitors[mid] = {"item_id": item["id"], "ready_at": time.monotonic() + self.copy_delay}
+                return 202, {"Location": f"{self.base_url}/monitor/{mid}"}, None
+            m = re.fullmatch(r"/items/([^/:]+)", rest)
+            if m:
+                if method == "DELETE":
+                    drive.items[m.group(1)]
+                    drive.remove(m.group(1))
+                    return 204, {}, None
+                if method == "GET":
+                    return 200, {}, drive.items[m.group(1)]
+        return _error(400, "invalidRequest", f"{method} {path} no soportado por el mock")
+
+    # ---------- endpoints ----------
+    def _drives(self) -> Dict:
+        return {"value": [{"id": DRIVE_ID, "name": self.drive.drive_name, "webUrl": "https://mock/root"}]}
+
+    def _children_page(self, path: str, parent_id: str, query: Dict) -> Dict:
+        ids = self.drive.children[parent_id]
+        start = int(query.get("$skiptoken", 0) or 0)
+        size = int(query.get("$top", self.page_size) or self.page_size)
+        page = {"value": [self.drive.items[i] for i in ids[start:start + size]]}
+        if start + size < len(ids):
+            q = {k: v for k, v in query.items() if k != "$skiptoken"}
+            q["$skiptoken"] = str(start + size)
+            page["@odata.nextLink"] = f"{self.graph_url}{path}?{urlencode(q, safe='$,')}"
+        return page
+
+    def _delta(self) -> Dict:
+        # Sin paginar ni cambios incrementales: siempre el árbol completo y un deltaLink fijo
+        return {"value": list(self.drive.items.values()),
+                "@odata.deltaLink": f"{self.graph_url}/sites/{SITE_ID}/drives/{DRIVE_ID}/root/delta?token=latest"}
+
+    def _put_file(self, parent_id: str, name: str, body: bytes) -> Dict:
+        qxh = QuickXorHash().update(body).b64digest() if self.hashes else None
+        return self.drive.add(parent_id, name, folder=False, size=len(body), qxh=qxh)
+
+    def _upload_range(self, method: str, sid: str, headers: Dict, body: bytes) -> Response:
+        with self.lock:
+            session = self.sessions.get(sid)
+            if session is None:
+                return _error(404, "itemNotFound", "Sesión inexistente")
+            if method == "GET":
+                return 200, {}, {"nextExpectedRanges": [f"{session['offset']}-"]}
+            m = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", headers.get("Content-Range", ""))
+            if method != "PUT" or not m:
+                return _error(400, "invalidRange", "Content-Range inválido")
+            start, end, total = (int(x) for x in m.groups())
+            if start != session["offset"] or end - start + 1 != len(body):
+                return _error(416, "invalidRange", f"Se esperaba el byte {session['offset']}")
+            session["offset"] = end + 1
+            if session["hash"] is not None:
+                session["hash"].update(body)
+            if session["offset"] < total:
+                return 202, {}, {"nextExpectedRanges": [f"{session['offset']}-"]}
+            del self.sessions[sid]
+            qxh = session["hash"].b64digest() if session["hash"] is not None else None
+            return 201, {}, self.drive.add(session["parent_id"], session["name"], folder=False, size=total, qxh=qxh)
+
+    def _batch(self, payload: Dict) -> Response:
+        responses = []
+        for req in payload.get("requests", []):
+            url = req["url"] if req["url"].startswith("/") else "/" + req["url"]
+            body = json.dumps(req["body"]).encode() if req.get("body") is not None else b""
+            status, hdrs, out = self.handle(req.get("method", "GET"), url, req.get("headers") or {}, body, sub=True)
+            responses.append({"id": req["id"], "status": status, "headers": hdrs, "body": out})
+        return 200, {}, {"responses": responses}
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {**self.stats, "files": self.drive.files()}
+
+
+class MockGraphServer:
+    """MockGraph servido por HTTP en un hilo (puerto 0 = uno libre)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **options):
+        graph = MockGraph(**options)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como Graph
+            disable_nagle_algorithm = True  # cabeceras y cuerpo salen en dos write()
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if graph.latency:
+                    time.sleep(graph.latency)
+                status, hdrs, payload = graph.handle(self.command, self.path, dict(self.headers), body)
+                data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                for k, v in hdrs.items():
+                    self.send_header(k, v)
+                if data:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _serve
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        graph.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.graph = graph
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def graph_url(self) -> str:
+        return self.graph.graph_url
+
+    def start(self) -> "MockGraphServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock local de Microsoft Graph")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por request")
+    parser.add_argument("--page-size", type=int, default=200, help="Items por página de /children")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Proporción de requests que reciben 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After de los 429 (segundos)")
+    parser.add_argument("--hashes", action="store_true", help="Calcular quickXorHash de lo subido")
+    parser.add_argument("--site-host", default="mock.sharepoint.com")
+    parser.add_argument("--site-path", default="/sites/Bench")
+    parser.add_argument("--drive", default="Facturas")
+    parser.add_argument("--seed", action="append", default=[], help="Carpeta a crear con --folders subcarpetas (repetible)")
+    parser.add_argument("--folders", type=int, default=0, help="Subcarpetas '0701-NNNNN CLIENTE' por cada --seed")
+    args = parser.parse_args()
+
+    server = MockGraphServer(port=args.port, site_host=args.site_host, site_path=args.site_path,
+                             drive_name=args.drive, latency=args.latency, page_size=args.page_size,
+                             throttle_rate=args.throttle, retry_after=args.retry_after, hashes=args.hashes)
+    for base in args.seed:
+        server.graph.drive.seed(base, [f"0701-{i:05d} CLIENTE {i}" for i in range(args.folders)])
+    print(f"Mock Graph en {server.graph_url} (Ctrl+C para terminar)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
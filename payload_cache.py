@@ -0,0 +1,95 @@
+# payload_cache.py
+"""
+Contenido de archivos locales compartido entre subidas.
+
+Cada archivo se abre y se mapea en memoria (mmap) una sola vez; todas las
+subidas reciben memoryviews sin copia (también los trozos de una upload
+session). El mapeo se libera cuando termina la última tarea pendiente de
+ese archivo, así la memoria no crece con la cantidad de destinos.
+"""
+import mmap
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+PathLike = Union[str, Path]
+
+
+class _Entry:
+    __slots__ = ("mm", "pending")
+
+    def __init__(self):
+        self.mm = None
+        self.pending = 0
+
+
+class PayloadCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Path, _Entry] = {}
+
+    @staticmethod
+    def _key(path: PathLike) -> Path:
+        return Path(path).resolve()
+
+    def retain(self, path: PathLike, count: int = 1):
+        """Registra `count` subidas futuras de `path` (normalmente al planificar)."""
+        with self._lock:
+            self._entries.setdefault(self._key(path), _Entry()).pending += count
+
+    def _map(self, key: Path, entry: _Entry):
+        with open(key, "rb") as f:
+            # mmap no admite archivos vacíos
+            entry.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if key.stat().st_size else b""
+
+    @contextmanager
+    def open(self, path: PathLike) -> Iterator[Union[memoryview, bytes]]:
+        """
+        Entrega una vista de solo lectura del archivo completo y, al salir,
+        consume una de las subidas registradas con retain() (o una implícita).
+        Un archivo vacío se entrega como b"": requests manda un memoryview de
+        largo 0 con Transfer-Encoding: chunked en vez de Content-Length: 0.
+        """
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            if entry.pending == 0:
+                entry.pending = 1
+            if entry.mm is None:
+                self._map(key, entry)
+            view = memoryview(entry.mm) if len(entry.mm) else None
+        try:
+            yield view if view is not None else b""
+        finally:
+            if view is not None:
+                view.release()
+            self._release(key)
+
+    def _release(self, key: Path):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.pending -= 1
+            if entry.pending <= 0:
+                del self._entries[key]
+                self._close(entry)
+
+    @staticmethod
+    def _close(entry: _Entry):
+        if isinstance(entry.mm, mmap.mmap):
+            try:
+                entry.mm.close()
+            except BufferError:
+                # Alguna vista (p.ej. un trozo retenido por requests) sigue viva:
+                # el mapeo se cierra solo cuando se libere
+                pass
+        entry.mm = None
+
+    def close_all(self):
+        """Libera todo (p.ej. tareas canceladas que nunca consumieron su reserva)."""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            self._close(entry)
@@ -0,0 +1,91 @@
+# progress_events.py
+"""
+Flujo de eventos de progreso en JSON por línea, mezclado con la salida normal.
+
+Con --events, bulk_copy_sharepoint_graph.py escribe en stdout, además de
+sus mensajes, líneas "@event {...}" con:
+  planned   total de subidas a ejecutar y bytes (no se emite en --dry)
+  skipped   subidas omitidas (count, reason: resume / identical)
+  started   inicio de una subida (row, file, folder, mes, size)
+  uploaded  subida terminada (… + seconds, url)
+  failed    subida con error (… + error)
+  finished  fin de la etapa de subidas (uploaded, seconds)
+La UI (run_bulk_copy_ui.py) los separa con parse_event y muestra el resto
+como log. Con los eventos activos stdout pasa por LockedStdout: los print de
+los hilos de subida salen por líneas completas y nunca cortan un evento.
+"""
+import json
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+EVENT_PREFIX = "@event "
+
+
+class LockedStdout:
+    """
+    Envoltorio de stdout: cada hilo acumula lo que escribe y vuelca solo líneas
+    completas bajo el lock compartido con EventStream (print escribe el texto y
+    el salto de línea por separado, y otro hilo podía colarse en el medio).
+    """
+
+    def __init__(self, stream, lock):
+        self._stream = stream
+        self._lock = lock
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        head, sep, tail = (getattr(self._local, "buf", "") + text).rpartition("\n")
+        self._local.buf = tail
+        if sep:
+            with self._lock:
+                self._stream.write(head + sep)
+                self._stream.flush()
+        return len(text)
+
+    def flush(self):
+        pending, self._local.buf = getattr(self._local, "buf", ""), ""
+        with self._lock:
+            if pending:
+                self._stream.write(pending)
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class EventStream:
+    """No escribe nada mientras enabled sea False (corridas por consola)."""
+
+    def __init__(self, stream=None):
+        self.enabled = False
+        self._stream = stream
+        self._lock = threading.RLock()
+
+    def enable(self):
+        """Activa los eventos; sin stream propio, serializa stdout con LockedStdout."""
+        self.enabled = True
+        if self._stream is None and not isinstance(sys.stdout, LockedStdout):
+            self._stream = sys.stdout
+            sys.stdout = LockedStdout(sys.stdout, self._lock)
+
+    def emit(self, event: str, **fields):
+        if not self.enabled:
+            return
+        rec = {"event": event, "t": round(time.time(), 3), **fields}
+        line = EVENT_PREFIX + json.dumps(rec, ensure_ascii=False, default=str) + "\n"
+        stream = self._stream or sys.stdout
+        with self._lock:  # el mismo lock que LockedStdout: ningún print corta la línea
+            stream.write(line)
+            stream.flush()
+
+
+def parse_event(line: str) -> Optional[Dict]:
+    """El evento de una línea de salida, o None si es un mensaje común."""
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
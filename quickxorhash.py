@@ -0,0 +1,99 @@
+# quickxorhash.py
+"""
+quickXorHash de OneDrive/SharePoint calculado localmente.
+
+Es el hash que Graph expone en driveItem.file.hashes.quickXorHash para
+bibliotecas de SharePoint/OneDrive for Business: permite saber si un
+archivo local ya está idéntico en la carpeta destino sin descargarlo.
+
+El algoritmo hace XOR de cada byte i en un registro circular de 160 bits,
+desplazado 11*i bits, y al final mezcla el largo del archivo. Como el
+desplazamiento se repite cada 160 bytes, primero se "pliegan" (XOR) todos
+los bloques de 160 bytes con enteros grandes de Python, que opera en C, y
+recién después se rota cada una de las 160 posiciones.
+"""
+import base64
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+WIDTH_BITS = 160
+SHIFT = 11
+BLOCK = WIDTH_BITS           # 11*i mod 160 se repite cada 160 bytes
+_MASK = (1 << WIDTH_BITS) - 1
+CHUNK = BLOCK * 8192         # ~1.25 MiB por lectura, múltiplo de BLOCK
+# Por debajo de esto no compensa levantar procesos
+PARALLEL_MIN_FILES = 8
+
+PathLike = Union[str, Path]
+
+
+def _fold(chunk: bytes) -> int:
+    """XOR de todos los bloques de 160 bytes de `chunk` (len múltiplo de BLOCK)."""
+    acc = 0
+    while len(chunk) > BLOCK:
+        n = len(chunk) // BLOCK
+        if n % 2:
+            acc ^= int.from_bytes(chunk[-BLOCK:], "little")
+            chunk = chunk[:-BLOCK]
+            n -= 1
+        half = n // 2 * BLOCK
+        chunk = (int.from_bytes(chunk[:half], "little") ^ int.from_bytes(chunk[half:], "little")).to_bytes(half, "little")
+    return acc ^ int.from_bytes(chunk, "little")
+
+
+class QuickXorHash:
+    def __init__(self):
+        self._folded = 0   # byte k del entero = XOR de los bytes en posiciones ≡ k (mod 160)
+        self._length = 0
+        self._tail = b""   # resto que aún no completa un bloque de 160
+
+    def update(self, data: bytes):
+        self._length += len(data)
+        data = self._tail + bytes(data)
+        usable = len(data) - len(data) % BLOCK
+        if usable:
+            self._folded ^= _fold(data[:usable])
+        self._tail = data[usable:]
+        return self
+
+    def digest(self) -> bytes:
+        folded = self._folded ^ int.from_bytes(self._tail, "little")
+        cells = folded.to_bytes(BLOCK, "little")
+        value = 0
+        for k, byte in enumerate(cells):
+            if byte:
+                shift = (k * SHIFT) % WIDTH_BITS
+                value ^= ((byte << shift) | (byte >> (WIDTH_BITS - shift))) & _MASK
+        out = bytearray(value.to_bytes(WIDTH_BITS // 8, "little"))
+        for i, b in enumerate(self._length.to_bytes(8, "little")):
+            out[WIDTH_BITS // 8 - 8 + i] ^= b
+        return bytes(out)
+
+    def b64digest(self) -> str:
+        return base64.b64encode(self.digest()).decode("ascii")
+
+
+def quickxorhash_file(path: PathLike) -> str:
+    h = QuickXorHash()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.b64digest()
+
+
+def hash_files(paths: Iterable[PathLike], workers: Optional[int] = None) -> Dict[str, str]:
+    """
+    quickXorHash de cada archivo (una sola vez por ruta). Con varios archivos
+    y workers > 1 se reparten entre procesos: el plegado usa CPU y el GIL.
+    """
+    unique: List[str] = list(dict.fromkeys(str(p) for p in paths))
+    workers = workers if workers is not None else min(len(unique), os.cpu_count() or 1)
+    if workers <= 1 or len(unique) < PARALLEL_MIN_FILES:
+        return {p: quickxorhash_file(p) for p in unique}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(unique, pool.map(quickxorhash_file, unique, chunksize=4)))
@@ -0,0 +1,208 @@
+# row_source.py
+"""
+Lectura de las planillas de entrada (Excel, CSV o Parquet) como texto.
+
+- Los .xlsx/.xlsm se leen en streaming con openpyxl en modo read-only y solo
+  se conservan las columnas pedidas: no se arma la hoja completa en memoria.
+- Todos los valores quedan como texto sin espacios alrededor ("" si la celda
+  está vacía; 701.0 → "701"), igual que dtype=str + keep_default_na=False.
+- El resultado se guarda como JSON en la caché del usuario (ver
+  default_row_cache_dir) con la huella del archivo (tamaño + mtime, y sha256
+  si el mtime cambió sin cambiar el contenido): relanzar una corrida con la
+  misma planilla no la vuelve a parsear. Se conservan las ROW_CACHE_MAX_ENTRIES
+  planillas usadas más recientemente.
+"""
+import csv
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd
+
+PathLike = Union[str, Path]
+SheetRef = Optional[Union[str, int]]
+
+ROW_CACHE_MAX_ENTRIES = 32
+ROW_CACHE_VERSION = 1
+CSV_SUFFIXES = {".csv", ".txt"}
+CSV_DELIMITERS = ",;\t|"
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+STREAM_SUFFIXES = {".xlsx", ".xlsm"}
+
+
+def default_row_cache_dir() -> Path:
+    """GRAPH_ROW_CACHE, o la carpeta de caché del usuario (no el directorio de trabajo)."""
+    if os.environ.get("GRAPH_ROW_CACHE"):
+        return Path(os.environ["GRAPH_ROW_CACHE"])
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "sharepoint_bulk_copy" / "row_cache"
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _csv_delimiter(path: Path) -> str:
+    """Separador del CSV (coma, punto y coma, tab o |); con una sola columna, coma."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+
+def _read_xlsx(path: Path, columns: List[str], sheet: SheetRef) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            ws = wb.worksheets[0]
+        elif isinstance(sheet, int):
+            ws = wb.worksheets[sheet]
+        elif sheet in wb.sheetnames:
+            ws = wb[sheet]
+        else:
+            raise ValueError(f"La hoja '{sheet}' no existe en {path}. Hojas: {wb.sheetnames}")
+
+        rows = ws.iter_rows(values_only=True)
+        header = None
+        for values in rows:
+            if any(v is not None for v in values):
+                header = [cell_text(v) for v in values]
+                break
+        if header is None:
+            return pd.DataFrame(columns=[])
+
+        # Posición de cada columna pedida (la primera si el encabezado se repite)
+        wanted = [c for c in columns if c in header]
+        positions = [header.index(c) for c in wanted]
+        data: List[List[str]] = [[] for _ in wanted]
+        n_rows = rows_kept = 0
+        for values in rows:
+            n = len(values)
+            for out, pos in zip(data, positions):
+                out.append(cell_text(values[pos]) if pos < n else "")
+            n_rows += 1
+            if any(v is not None for v in values):
+                rows_kept = n_rows
+        # Como pandas: se descartan las filas vacías del final, no las intermedias
+        return pd.DataFrame({c: col[:rows_kept] for c, col in zip(wanted, data)}, columns=wanted)
+    finally:
+        wb.close()
+
+
+def _read_frame(path: Path, columns: List[str], sheet: SheetRef) -> pd.DataFrame:
+    suffix = path.suffix.lower()
+    if suffix in STREAM_SUFFIXES:
+        return _read_xlsx(path, columns, sheet)
+    if suffix in CSV_SUFFIXES:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, sep=_csv_delimiter(path),
+                         encoding="utf-8-sig", usecols=lambda c: str(c).strip() in columns)
+    elif suffix in PARQUET_SUFFIXES:
+        df = pd.read_parquet(path)
+        df = df[[c for c in df.columns if str(c).strip() in columns]]
+    else:
+        # .xls u otros formatos que openpyxl no abre
+        df = pd.read_excel(path, sheet_name=0 if sheet is None else sheet, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+    wanted = [c for c in columns if c in df.columns]
+    return pd.DataFrame({c: [cell_text(v) for v in df[c]] for c in wanted}, columns=wanted)
+
+
+def _load_cached(cache_file: Path) -> Optional[dict]:
+    """Entrada de la caché, o None si no existe, está cortada o es de otro formato."""
+    try:
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+        if cached.get("version") != ROW_CACHE_VERSION:
+            return None
+        cached["frame"] = pd.DataFrame(cached.pop("data"), columns=cached["columns"], dtype=str)
+        return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _evict(cache_dir: Path):
+    """Borra las entradas menos usadas (mtime más viejo) por encima de ROW_CACHE_MAX_ENTRIES."""
+    entries = []
+    for f in cache_dir.glob("*.json"):
+        try:
+            entries.append((f.stat().st_mtime, f))
+        except OSError:
+            pass  # la borró otro proceso
+    entries.sort(reverse=True)
+    for _, f in entries[ROW_CACHE_MAX_ENTRIES:]:
+        try:
+            f.unlink()
+        except OSError:
+            pass
+
+
+def read_rows(path: PathLike, columns: Iterable[str], sheet: SheetRef = None,
+              cache_dir: Optional[PathLike] = "") -> pd.DataFrame:
+    """
+    Columnas `columns` de la planilla `path` como texto (las que no existan se
+    omiten; cada llamador valida las obligatorias). `sheet`: nombre o índice,
+    None = primera hoja. cache_dir="" usa default_row_cache_dir(); None
+    desactiva la caché.
+    """
+    path = Path(path)
+    columns = list(dict.fromkeys(columns))
+    if cache_dir is None:
+        return _read_frame(path, columns, sheet)
+    cache_dir = Path(cache_dir) if cache_dir else default_row_cache_dir()
+
+    st = path.stat()
+    fingerprint = f"{st.st_size}:{st.st_mtime_ns}"
+    key = hashlib.sha1(f"{path.resolve()}|{sheet!r}|{columns!r}".encode("utf-8")).hexdigest()
+    cache_file = cache_dir / f"{key}.json"
+
+    cached = _load_cached(cache_file) if cache_file.exists() else None
+    if cached and cached["fingerprint"] == fingerprint:
+        try:
+            os.utime(cache_file)  # usada recién: la última en desalojarse
+        except OSError:
+            pass
+        return cached["frame"]
+
+    digest = _file_sha256(path)
+    if cached and cached["sha256"] == digest:
+        frame = cached["frame"]
+    else:
+        frame = _read_frame(path, columns, sheet)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_name(cache_file.name + f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({
+        "version": ROW_CACHE_VERSION,
+        "fingerprint": fingerprint,
+        "sha256": digest,
+        "columns": list(frame.columns),
+        "data": {c: frame[c].tolist() for c in frame.columns},
+    }, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, cache_file)
+    _evict(cache_dir)
+    return frame
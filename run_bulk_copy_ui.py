@@ -3,10 +3,26 @@ import sys
 import threading
 import subprocess
 import queue
+import shutil
+import tempfile
+import time
+from collections import deque
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+from progress_events import parse_event
+
+# Ventana (segundos) para calcular subidas/s y MB/s
+RATE_WINDOW = 15.0
+# Log: cada DRAIN_MS se vuelca la cola en un solo insert (como mucho DRAIN_MAX_ITEMS
+# elementos por vuelta); el Text guarda solo las últimas LOG_MAX_LINES líneas y el
+# log completo queda en un archivo temporal que se puede exportar
+DRAIN_MS = 80
+DRAIN_MAX_ITEMS = 5000
+LOG_MAX_LINES = 5000
+AUTOSCROLL_MS = 250
+
 # Ensure our own stdout/stderr are UTF-8-capable (for any print in this GUI)
 try:
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
@@ -37,6 +53,12 @@ def find_project_python(project_root: str | None) -> str | None:
                 return str(cand)
     return None
 
+def fmt_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
 def venv_bin_dir(project_root: str | None) -> str | None:
     if not project_root:
         return None
@@ -51,11 +73,15 @@ class App(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Bulk Copy SharePoint Graph - UI")
-        self.geometry("920x600")
+        self.geometry("920x760")
         self.resizable(True, True)
 
         self.proc = None
         self.q = queue.Queue()
+        self.log_spool = None     # log completo de la corrida (archivo temporal)
+        self.log_lines = 0        # líneas en el Text
+        self._last_scroll = 0.0
+        self._scroll_pending = False
 
         self.var_script = tk.StringVar(value=str(Path("bulk_copy_sharepoint_graph.py").resolve()))
         self.var_mode = tk.StringVar(value="masiva")
@@ -68,9 +94,11 @@ class App(tk.Tk):
         self.var_use_venv = tk.BooleanVar(value=True)  # NEW: run inside project .venv if available
 
         self._build_form()
+        self._build_progress()
         self._build_log()
         self._toggle_mode_fields()
-        self.after(80, self._drain_queue)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(DRAIN_MS, self._drain_queue)
 
     # ---------------- UI ----------------
     def _build_form(self):
@@ -132,13 +160,95 @@ class App(tk.Tk):
         self.btn_stop = ttk.Button(bar, text="■ Detener", command=self._stop, state="disabled")
         self.btn_stop.pack(side="left", padx=6)
 
+        self.btn_export = ttk.Button(bar, text="💾 Exportar log", command=self._export_log, state="disabled")
+        self.btn_export.pack(side="right")
+
+        for i in range(3):
+            frm.columnconfigure(i, weight=1)
+
+    def _build_progress(self):
+        frm = ttk.Frame(self, padding=(10, 4))
+        frm.pack(fill="x")
+        self.var_count = tk.StringVar(value="")
+        self.var_rate = tk.StringVar(value="")
+        self.var_eta = tk.StringVar(value="")
+        self.pbar = ttk.Progressbar(frm, mode="determinate")
+        self.pbar.grid(row=0, column=0, columnspan=3, sticky="we")
+        ttk.Label(frm, textvariable=self.var_count).grid(row=1, column=0, sticky="w")
+        ttk.Label(frm, textvariable=self.var_rate).grid(row=1, column=1)
+        ttk.Label(frm, textvariable=self.var_eta).grid(row=1, column=2, sticky="e")
         for i in range(3):
             frm.columnconfigure(i, weight=1)
 
+        ttk.Label(frm, text="Fallidos:").grid(row=2, column=0, sticky="w", pady=(6, 0))
+        cols = ("fila", "archivo", "carpeta", "error")
+        self.tbl_failed = ttk.Treeview(frm, columns=cols, show="headings", height=4)
+        for col, width in zip(cols, (60, 200, 220, 380)):
+            self.tbl_failed.heading(col, text=col.capitalize())
+            self.tbl_failed.column(col, width=width, stretch=(col == "error"))
+        self.tbl_failed.grid(row=3, column=0, columnspan=3, sticky="we")
+        self._reset_progress()
+
+    def _reset_progress(self):
+        self.total = 0
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = None
+        self.window = deque()  # (t, bytes) de las subidas recientes
+        self.pbar.configure(value=0, maximum=1)
+        self.var_count.set("")
+        self.var_rate.set("")
+        self.var_eta.set("")
+        self.tbl_failed.delete(*self.tbl_failed.get_children())
+
+    def _on_event(self, ev):
+        kind = ev.get("event")
+        now = ev.get("t") or time.time()
+        if kind == "planned":
+            self.total = ev.get("total", 0)
+            self.started_at = now
+            self.pbar.configure(maximum=max(self.total, 1))
+        elif kind == "skipped":
+            self.skipped += ev.get("count", 0)
+        elif kind == "uploaded":
+            self.uploaded += 1
+            self.uploaded_bytes += ev.get("size") or 0
+            self.window.append((now, ev.get("size") or 0))
+        elif kind == "failed":
+            self.failed += 1
+            self.tbl_failed.insert("", "end", values=(ev.get("row", ""), ev.get("file", ""),
+                                                      ev.get("folder", ""), ev.get("error", "")))
+        elif kind == "finished":
+            self.started_at = None
+
+    def _refresh_progress(self, now):
+        self.pbar.configure(value=self.uploaded)
+        extra = []
+        if self.skipped:
+            extra.append(f"{self.skipped} omitidas")
+        if self.failed:
+            extra.append(f"{self.failed} fallidas")
+        self.var_count.set(f"{self.uploaded} / {self.total} subidas" + (f" ({', '.join(extra)})" if extra else ""))
+
+        while self.window and now - self.window[0][0] > RATE_WINDOW:
+            self.window.popleft()
+        if self.started_at is None:
+            if self.total:
+                self.var_eta.set(f"{self.uploaded_bytes / 1e6:.1f} MB subidos")
+            return
+        span = min(max(now - self.started_at, 1e-6), RATE_WINDOW)
+        per_s = len(self.window) / span
+        mb_s = sum(b for _, b in self.window) / span / 1e6
+        self.var_rate.set(f"{per_s:.1f} subidas/s · {mb_s:.2f} MB/s")
+        remaining = self.total - self.uploaded
+        self.var_eta.set(f"ETA {fmt_eta(remaining / per_s)}" if per_s > 0 and remaining > 0 else "ETA –")
+
     def _build_log(self):
         frm = ttk.Frame(self, padding=10)
         frm.pack(fill="both", expand=True)
-        ttk.Label(frm, text="Salida del proceso:").pack(anchor="w")
+        ttk.Label(frm, text=f"Salida del proceso (últimas {LOG_MAX_LINES} líneas; el log completo se exporta):").pack(anchor="w")
         self.txt = tk.Text(frm, height=20, wrap="word", state="disabled")
         self.txt.pack(fill="both", expand=True)
         self.scroll = ttk.Scrollbar(self.txt, command=self.txt.yview)
@@ -172,25 +282,91 @@ class App(tk.Tk):
         if p: self.var_src_dir.set(p)
 
     def _append_log(self, text):
+        if not text:
+            return
+        if self.log_spool:
+            self.log_spool.write(text)
+        lines = text.count("\n")
+        if lines > LOG_MAX_LINES:
+            # Un lote más grande que el buffer: solo importan sus últimas líneas
+            text = "\n".join(text.split("\n")[-LOG_MAX_LINES - 1:])
+            lines = LOG_MAX_LINES
+        # Se sigue el final solo si el usuario no subió a leer algo anterior
+        follow = self._scroll_pending or self.txt.yview()[1] >= 0.98
         self.txt.configure(state="normal")
         self.txt.insert("end", text)
-        self.txt.see("end")
+        self.log_lines += lines
+        if self.log_lines > LOG_MAX_LINES:
+            excess = self.log_lines - LOG_MAX_LINES
+            self.txt.delete("1.0", f"{excess + 1}.0")
+            self.log_lines = LOG_MAX_LINES
         self.txt.configure(state="disabled")
+        self._scroll_pending = follow
+        self._autoscroll()
+
+    def _autoscroll(self):
+        """see("end") como mucho cada AUTOSCROLL_MS; si toca antes, queda pendiente."""
+        now = time.monotonic()
+        if self._scroll_pending and now - self._last_scroll >= AUTOSCROLL_MS / 1000:
+            self.txt.see("end")
+            self._last_scroll = now
+            self._scroll_pending = False
 
     def _drain_queue(self):
+        chunks = []
+        events = 0
+        finished = False
         try:
-            while True:
-                line = self.q.get_nowait()
-                self._append_log(line)
+            for _ in range(DRAIN_MAX_ITEMS):
+                item = self.q.get_nowait()
+                if item is None:  # fin del hilo lector: ya no quedan líneas del proceso
+                    finished = True
+                elif isinstance(item, dict):
+                    self._on_event(item)
+                    events += 1
+                else:
+                    chunks.append(item)
         except queue.Empty:
             pass
-        if self.proc and self.proc.poll() is not None:
+        self._append_log("".join(chunks))
+        self._autoscroll()
+        if events or self.started_at is not None:
+            self._refresh_progress(time.time())  # el ETA y la velocidad bajan si no llegan subidas
+        if finished:
             self._append_log("\n--- Proceso finalizado ---\n")
+            if self.log_spool:
+                self.log_spool.flush()
             self.btn_run.configure(state="normal")
             self.btn_run_extractor.configure(state="normal")
             self.btn_stop.configure(state="disabled")
             self.proc = None
-        self.after(80, self._drain_queue)
+        # Si quedó cola, la próxima vuelta va enseguida (pero dejando respirar al mainloop)
+        self.after(1 if not self.q.empty() else DRAIN_MS, self._drain_queue)
+
+    def _export_log(self):
+        if not self.log_spool:
+            return
+        p = filedialog.asksaveasfilename(title="Exportar log completo", defaultextension=".log",
+                                         filetypes=[("Log", "*.log"), ("Texto", "*.txt"), ("Todos", "*.*")])
+        if not p:
+            return
+        self.log_spool.flush()
+        shutil.copyfile(self.log_spool.name, p)
+        messagebox.showinfo("Log exportado", f"Log completo guardado en:\n{p}")
+
+    def _close_spool(self):
+        if self.log_spool:
+            self.log_spool.close()
+            try:
+                os.remove(self.log_spool.name)
+            except OSError:
+                pass
+            self.log_spool = None
+
+    def _on_close(self):
+        self._stop()
+        self._close_spool()
+        self.destroy()
 
     # ------------- Runner core -------------
     def _runner(self, args, cwd, venv_dir):
@@ -223,10 +399,13 @@ class App(tk.Tk):
                 env=env_utf8
             )
             for line in self.proc.stdout:
-                self.q.put(line)
+                ev = parse_event(line)
+                self.q.put(ev if ev is not None else line)
             self.proc.wait()
         except Exception as e:
             self.q.put(f"\n[ERROR] {e}\n")
+        finally:
+            self.q.put(None)
 
     def _choose_python(self, project_root: str | None):
         """
@@ -254,7 +433,7 @@ class App(tk.Tk):
         project_root = os.path.dirname(script) or None
 
         py, venv_dir = self._choose_python(project_root)
-        args = [py, script, "--mode", mode, "--excel", excel]
+        args = [py, script, "--mode", mode, "--excel", excel, "--events"]
         if sheet:
             args += ["--sheet", sheet]
         if self.var_dry.get():
@@ -302,6 +481,12 @@ class App(tk.Tk):
         self.txt.configure(state="normal")
         self.txt.delete("1.0", "end")
         self.txt.configure(state="disabled")
+        self.log_lines = 0
+        self._close_spool()
+        self.log_spool = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".log",
+                                                     prefix="bulk_copy_", delete=False)
+        self.btn_export.configure(state="normal")
+        self._reset_progress()
 
         t = threading.Thread(target=self._runner, args=(args, cwd, venv_dir), daemon=True)
         t.start()
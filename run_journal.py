@@ -0,0 +1,118 @@
+# run_journal.py
+"""
+Bitácora de subidas completadas (JSONL, solo se agrega al final).
+
+Cada línea registra (fila, id de carpeta destino, huella del archivo). Con
+--resume las subidas ya registradas se omiten al relanzar una corrida que
+se cortó a la mitad. Las escrituras se agrupan y se hace fsync cada
+`flush_every` registros o `flush_interval` segundos.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Set, Tuple, Union
+
+PathLike = Union[str, Path]
+Key = Tuple[str, str, str]
+
+
+def journal_path_for(excel_path: PathLike) -> Path:
+    """Bitácora por defecto: al lado del Excel (masivo.xlsx → masivo.journal.jsonl)."""
+    p = Path(excel_path)
+    return p.with_name(f"{p.stem}.journal.jsonl")
+
+
+def shard_journal_path(journal_path: PathLike, shard: Tuple[int, int]) -> Path:
+    """Bitácora propia de un shard (masivo.journal.jsonl → masivo.shard1of4.journal.jsonl)."""
+    p = Path(journal_path)
+    stem = p.name[:-len(".journal.jsonl")] if p.name.endswith(".journal.jsonl") else p.stem
+    return p.with_name(f"{stem}.shard{shard[0]}of{shard[1]}.journal.jsonl")
+
+
+class RunJournal:
+    def __init__(self, path: PathLike, flush_every: int = 50, flush_interval: float = 2.0):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._done: Set[Key] = set()
+        self._fingerprints: Dict[str, str] = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._load()
+        self._fh = open(self.path, "a", encoding="utf-8")
+        if self._fh.tell() and not self._ends_with_newline():
+            self._fh.write("\n")  # cerrar la línea cortada antes de seguir agregando
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # última línea cortada por un corte abrupto
+                self._done.add((str(rec["row"]), rec["folder_id"], rec["fingerprint"]))
+
+    def fingerprint(self, local_path: PathLike) -> str:
+        """Tamaño + mtime: cambia si el archivo local se reemplaza entre corridas."""
+        key = str(local_path)
+        fp = self._fingerprints.get(key)
+        if fp is None:
+            st = os.stat(local_path)
+            fp = f"{st.st_size}:{st.st_mtime_ns}"
+            self._fingerprints[key] = fp
+        return fp
+
+    def is_done(self, row, folder_id: str, local_path: PathLike) -> bool:
+        return (str(row), folder_id, self.fingerprint(local_path)) in self._done
+
+    def record(self, row, folder_id: str, local_path: PathLike, **extra):
+        fp = self.fingerprint(local_path)
+        line = json.dumps({"row": str(row), "folder_id": folder_id, "fingerprint": fp,
+                           "file": Path(local_path).name, "ts": time.time(), **extra}, ensure_ascii=False)
+        with self._lock:
+            self._done.add((str(row), folder_id, fp))
+            self._fh.write(line + "\n")
+            self._unsynced += 1
+            if self._unsynced >= self.flush_every or time.monotonic() - self._last_sync >= self.flush_interval:
+                self._sync()
+
+    def absorb(self, other: PathLike) -> int:
+        """Agrega los registros de otra bitácora (p.ej. de un shard) que falten en esta."""
+        added = 0
+        with open(other, "r", encoding="utf-8") as f, self._lock:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                key = (str(rec["row"]), rec["folder_id"], rec["fingerprint"])
+                if key in self._done:
+                    continue
+                self._done.add(key)
+                self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                added += 1
+            if added:
+                self._sync()
+        return added
+
+    def _sync(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._sync()
+                self._fh.close()
@@ -0,0 +1,155 @@
+# site_cache.py
+"""
+Caché persistente de la resolución sitio/biblioteca → (site_id, drive_id).
+
+Los ids de un sitio y de su biblioteca prácticamente no cambian: en vez de
+resolverlos contra Graph en cada corrida (2-3 llamadas antes de empezar) se
+guardan en un JSON (.site_cache.json) con clave (host, ruta del sitio,
+biblioteca) y vencen después de `ttl` segundos.
+
+Si un id tomado de la caché da 404 (sitio o biblioteca recreados), la
+entrada se invalida, se vuelve a resolver una vez y, si el id cambió, el
+llamador reintenta con el nuevo (ver revalidate / call). resolve_checked
+hace esa validación una sola vez, con una llamada barata, antes de usar
+los ids.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import requests
+
+PathLike = Union[str, Path]
+Ids = Dict[str, str]
+
+DEFAULT_SITE_CACHE = ".site_cache.json"
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class SiteNotFound(RuntimeError):
+    """404 del sitio o la biblioteca que no llega como HTTPError (p.ej. dentro de un $batch)."""
+
+
+def is_not_found(exc: BaseException) -> bool:
+    if isinstance(exc, SiteNotFound):
+        return True
+    return (isinstance(exc, requests.HTTPError) and exc.response is not None
+            and exc.response.status_code == 404)
+
+
+class SiteCache:
+    """path=None desactiva la persistencia (todo se resuelve contra Graph)."""
+
+    def __init__(self, path: Optional[PathLike] = DEFAULT_SITE_CACHE, ttl: float = DEFAULT_TTL):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict]] = None  # se lee del disco al primer uso
+        self._served: Dict[str, Ids] = {}  # claves que esta corrida tomó de la caché
+
+    @staticmethod
+    def key(hostname: str, site_path: str, library: str) -> str:
+        return "|".join((hostname.strip().lower(), "/" + site_path.strip().strip("/").lower(),
+                         library.strip().lower()))
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path and self.path.exists():
+                try:
+                    self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass  # caché corrupta: se vuelve a resolver
+        return self._entries
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._entries, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def get(self, hostname: str, site_path: str, library: str) -> Optional[Ids]:
+        with self._lock:
+            entry = self._load().get(self.key(hostname, site_path, library))
+            if not entry or time.time() - entry.get("resolved_at", 0) > self.ttl:
+                return None
+            return {"site_id": entry["site_id"], "drive_id": entry["drive_id"]}
+
+    def put(self, hostname: str, site_path: str, library: str, ids: Ids):
+        with self._lock:
+            self._load()[self.key(hostname, site_path, library)] = {
+                "site_id": ids["site_id"], "drive_id": ids["drive_id"], "resolved_at": time.time()}
+            self._save()
+
+    def invalidate(self, hostname: str, site_path: str, library: str):
+        with self._lock:
+            if self._load().pop(self.key(hostname, site_path, library), None) is not None:
+                self._save()
+
+    def resolve(self, hostname: str, site_path: str, library: str, resolver: Callable[[], Ids]) -> Tuple[Ids, bool]:
+        """(ids, vino_de_la_caché). `resolver` consulta Graph y devuelve {site_id, drive_id}."""
+        with self._lock:
+            cached = self.get(hostname, site_path, library)
+            if cached:
+                self._served[self.key(hostname, site_path, library)] = cached
+                return cached, True
+        ids = resolver()
+        self.put(hostname, site_path, library, ids)
+        return ids, False
+
+    def revalidate(self, hostname: str, site_path: str, library: str, resolver: Callable[[], Ids]) -> Optional[Ids]:
+        """
+        Tras un 404: si la clave salió de la caché en esta corrida, la invalida
+        y la resuelve de nuevo (una sola vez). Devuelve los ids nuevos si
+        cambiaron, o None si el 404 no se debía a la caché.
+        """
+        key = self.key(hostname, site_path, library)
+        with self._lock:
+            old = self._served.pop(key, None)
+            if old is None:
+                return None
+            self.invalidate(hostname, site_path, library)
+        fresh = resolver()
+        self.put(hostname, site_path, library, fresh)
+        return fresh if fresh != old else None
+
+    def resolve_checked(self, hostname: str, site_path: str, library: str, resolver: Callable[[], Ids],
+                        check: Callable[[Ids], object]) -> Ids:
+        """
+        Ids listos para usar. Si salen de la caché, check(ids) los valida (p.ej.
+        GET del root del drive); ante un 404 se resuelven de nuevo. Los ids
+        recién resueltos no se validan.
+        """
+        ids, cached = self.resolve(hostname, site_path, library, resolver)
+        if not cached:
+            return ids
+        try:
+            check(ids)
+            return ids
+        except (requests.HTTPError, SiteNotFound) as e:
+            if not is_not_found(e):
+                raise
+            fresh = self.revalidate(hostname, site_path, library, resolver)
+            if fresh is None:
+                raise
+            print(f"⚠️  El sitio o la biblioteca '{library}' cambió de id; se usa el nuevo")
+            return fresh
+
+    def call(self, hostname: str, site_path: str, library: str, resolver: Callable[[], Ids],
+             fn: Callable[[Ids], object]):
+        """fn(ids) con los ids de la caché; ante un 404 por ids vencidos, una vez más con los nuevos."""
+        ids, _ = self.resolve(hostname, site_path, library, resolver)
+        try:
+            return fn(ids)
+        except (requests.HTTPError, SiteNotFound) as e:
+            if not is_not_found(e):
+                raise
+            fresh = self.revalidate(hostname, site_path, library, resolver)
+            if fresh is None:
+                raise
+            print(f"⚠️  El sitio o la biblioteca '{library}' cambió de id; reintentando con el nuevo")
+            return fn(fresh)
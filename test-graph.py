@@ -1,9 +1,10 @@
-import requests
 import msal
 import sys
 import os
 import json
 
+from graph_client import GraphClient
+
 with open("config_tenant.json", "r") as f:
     config = json.load(f)
 
@@ -28,17 +29,11 @@ if "access_token" not in token:
     print("No token:", token)
     sys.exit(1)
 
-headers = {"Authorization": f"Bearer {token['access_token']}"}
+client = GraphClient(token["access_token"])
 
 def get_json(url):
-    r = requests.get(url, headers=headers, timeout=20)
-    ok = 200 <= r.status_code < 300
-    if not ok:
-        print("URL:", url)
-        print("STATUS:", r.status_code)
-        print("RAW:", r.text)       # <- aquí verás el mensaje real de Graph (403/404/etc.)
-        r.raise_for_status()
-    return r.json()
+    # GraphClient imprime status y mensaje real de Graph (403/404/etc.) antes de lanzar
+    return client.get(url, timeout=20)
 
 # 1) Probar conectividad básica
 root = get_json("https://graph.microsoft.com/v1.0/sites/root?$select=id,webUrl,displayName")
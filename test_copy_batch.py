@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import copy_batch
+
+MESES = [SimpleNamespace(name="01. ENERO"), SimpleNamespace(name="02. FEBRERO")]
+CLIENTES = [SimpleNamespace(name="0701-0057 BCP"), SimpleNamespace(name="0701-0100 IBK")]
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Sin SharePoint: listados fijos y subidas registradas en una lista."""
+    done = []
+    monkeypatch.setattr(copy_batch, "new_context", lambda: object())
+
+    def list_folders(ctx, url):
+        return MESES if url.count("/") == 0 else CLIENTES
+
+    def upload(self, folder_url, local_path, label):
+        done.append((folder_url, local_path))
+        with self._lock:
+            self.copied += 1
+
+    monkeypatch.setattr(copy_batch, "list_folders", list_folders)
+    monkeypatch.setattr(copy_batch.LibraryCopy, "_upload", upload)
+    return done
+
+
+def test_find_folder_ignora_prefijos_vacios():
+    index = copy_batch.FolderNameIndex(CLIENTES, name_of=lambda f: f.name, normalize=str)
+    assert copy_batch.find_folder(index, "0701-0057").name == "0701-0057 BCP"
+    for blank in ("", "   ", "\t"):
+        assert copy_batch.find_folder(index, blank) is None
+
+
+def test_masiva_con_carpetas_vacia_no_sube_nada(uploads):
+    lib = copy_batch.LibraryCopy("Documentos", 2)
+    copy_batch.copy_masiva(lib, MESES, ["", "  "]).wait()
+    assert uploads == []
+    assert (lib.copied, lib.not_found) == (0, 4)  # 2 filas x 2 meses, sin carpeta
+
+
+def test_detracciones_con_carpetas_vacia_no_sube_nada(uploads):
+    df = pd.DataFrame({"CARPETAS": ["", "0701-0100"], "COMPROBANTE": ["F001-1", "F001-2"]})
+    lib = copy_batch.LibraryCopy("Facturas", 2)
+    copy_batch.copy_detracciones(lib, df, "CARPETAS", "COMPROBANTE").wait()
+    assert sorted(uploads) == [(f"Facturas/{m.name}/0701-0100 IBK", "detracciones/F001-2.pdf") for m in MESES]
+    assert (lib.copied, lib.not_found) == (2, 2)
+
+
+def test_una_biblioteca_que_falla_no_corta_el_resumen(uploads, monkeypatch, capsys):
+    listar = copy_batch.list_folders
+
+    def list_folders(ctx, url):
+        if url.startswith("Rota/"):
+            raise RuntimeError("403 Forbidden")
+        return listar(ctx, url)
+
+    monkeypatch.setattr(copy_batch, "list_folders", list_folders)
+    results = copy_batch.run_libraries(
+        ["Documentos", "Rota"], lambda lib: copy_batch.copy_masiva(lib, MESES, ["0701-0057"]))
+
+    ok, rota = results
+    assert (ok.copied, ok.failure) == (2, None)
+    assert rota.copied == 0 and "403" in rota.failure
+    assert rota.pool._shutdown
+    out = capsys.readouterr().out
+    assert "=== Resumen ===" in out
+    assert "Rota: 0 copiados" in out and "interrumpida: 403 Forbidden" in out
+    assert "TOTAL: 2 copiados" in out
@@ -0,0 +1,83 @@
+import pytest
+
+import bulk_copy_sharepoint_graph as bulk
+from copy_plan import parse_shard, read_plan, shard_of, shard_tasks, write_plan
+from mock_graph import DRIVE_ID, SITE_ID
+from run_journal import RunJournal, journal_path_for, shard_journal_path
+
+
+def _tasks(pdf, folder_ids, per_folder=2):
+    return [{"row": n * per_folder + k, "local_path": pdf, "mes": "A", "folder": {"id": fid, "name": f"c{n}"}}
+            for n, fid in enumerate(folder_ids) for k in range(per_folder)]
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("0/4", "5/4", "1/0", "x", "1/2/3"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_shards_son_una_particion_por_carpeta(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"x")
+    tasks = _tasks(pdf, [f"item{i}" for i in range(40)])
+    n = 3
+    parts = [shard_tasks(tasks, (i, n)) for i in range(1, n + 1)]
+    assert sorted(t["row"] for p in parts for t in p) == [t["row"] for t in tasks]
+    for i, part in enumerate(parts, 1):
+        # todas las tareas de una carpeta caen en el mismo shard
+        assert all(shard_of(t["folder"]["id"], n) == i for t in part)
+    assert all(parts)  # con 40 carpetas ningún shard queda vacío
+
+
+def test_plan_ida_y_vuelta(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"abc")
+    tasks = _tasks(pdf, ["f1", "f2"])
+    plan = tmp_path / "plan.jsonl"
+    assert write_plan(plan, {"mode": "masiva"}, tasks) == 4
+    header, back = read_plan(plan)
+    assert header["mode"] == "masiva" and header["tasks"] == 4
+    assert [(t["row"], t["folder"]["id"], t["size"]) for t in back] == [(t["row"], t["folder"]["id"], 3) for t in tasks]
+
+
+def test_ejecutar_por_shards_y_merge(graph, client, tmp_path, capsys):
+    base = graph.drive.seed("A", [f"0701-{i:05d}" for i in range(12)])
+    folder_ids = list(graph.drive.children[base["id"]])
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    tasks = _tasks(pdf, folder_ids, per_folder=1)
+    plan = tmp_path / "plan.jsonl"
+    header = {"mode": "masiva", "site_id": SITE_ID, "drive_id": DRIVE_ID, "base_path": "A",
+              "excel": str(tmp_path / "masivo.xlsx")}
+    write_plan(plan, header, tasks)
+    header, tasks = read_plan(plan)
+
+    n = 3
+    for i in range(1, n + 1):
+        journal = RunJournal(shard_journal_path(journal_path_for(header["excel"]), (i, n)))
+        bulk.process_plan(client, str(plan), header, tasks, dry=False, journal=journal, shard=(i, n))
+        journal.close()
+    assert all(len(graph.drive.children[fid]) == 1 for fid in folder_ids)
+
+    assert bulk.merge_shards(str(plan)) == len(tasks)
+    main = RunJournal(journal_path_for(header["excel"]))
+    assert all(main.is_done(t["row"], t["folder"]["id"], pdf) for t in tasks)
+    main.close()
+    assert "Falta el resultado" not in capsys.readouterr().out
+
+
+def test_merge_avisa_shards_faltantes(graph, client, tmp_path, capsys):
+    base = graph.drive.seed("A", [f"0701-{i:05d}" for i in range(6)])
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    plan = tmp_path / "plan.jsonl"
+    header = {"mode": "masiva", "site_id": SITE_ID, "drive_id": DRIVE_ID, "base_path": "A",
+              "excel": str(tmp_path / "masivo.xlsx")}
+    write_plan(plan, header, _tasks(pdf, list(graph.drive.children[base["id"]]), per_folder=1))
+    header, tasks = read_plan(plan)
+    bulk.process_plan(client, str(plan), header, tasks, dry=False, shard=(1, 2))
+    uploaded = len(shard_tasks(tasks, (1, 2)))
+    assert bulk.merge_shards(str(plan)) == uploaded
+    assert "Falta el resultado del shard 2/2" in capsys.readouterr().out
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+from folder_index import FolderNameIndex
+
+NAMES = ["0701-0057 Cliente", "0701-0057b otro", "0701-0100 X", " 0701-0200 Y", "ab-01"]
+
+
+def test_por_defecto_sin_distinguir_mayusculas_ni_espacios():
+    index = FolderNameIndex({"name": n} for n in NAMES)
+    assert [it["name"] for it in index.startswith("0701-0057")] == ["0701-0057 Cliente", "0701-0057b otro"]
+    assert [it["name"] for it in index.startswith("AB")] == ["ab-01"]
+    assert index.startswith("0701-0200")[0]["name"] == " 0701-0200 Y"
+    assert index.exact("0701-0100 x")["name"] == "0701-0100 X"
+
+
+def test_normalize_str_igual_que_str_startswith():
+    dirs = [SimpleNamespace(name=n) for n in NAMES]
+    index = FolderNameIndex(dirs, name_of=lambda f: f.name, normalize=str)
+    for prefix in ("0701-0057", "AB", "ab", "0701-0200", " 0701", "0701-0100 X"):
+        expected = next((f for f in dirs if f.name.startswith(prefix)), None)
+        assert next(iter(index.startswith(prefix)), None) is expected
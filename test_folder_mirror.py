@@ -0,0 +1,105 @@
+import requests
+
+import bulk_copy_sharepoint_graph as bulk
+from folder_mirror import FolderMirror
+from mock_graph import DRIVE_ID, SITE_ID
+
+
+def _page(items, delta_link="https://graph/delta?token=2", next_link=None):
+    page = {"value": items}
+    if next_link:
+        page["@odata.nextLink"] = next_link
+    else:
+        page["@odata.deltaLink"] = delta_link
+    return page
+
+
+ROOT = {"id": "root", "name": "root", "root": {}, "folder": {"childCount": 1}}
+BASE = {"id": "b", "name": "2025", "folder": {"childCount": 2}, "parentReference": {"id": "root"}}
+ENERO = {"id": "m1", "name": "01. ENERO", "folder": {"childCount": 0}, "parentReference": {"id": "b"}}
+PDF = {"id": "f1", "name": "a.pdf", "file": {}, "parentReference": {"id": "b"}}
+
+
+def _gone():
+    resp = requests.Response()
+    resp.status_code = 410
+    return requests.HTTPError("410 Gone", response=resp)
+
+
+def test_sync_guarda_solo_carpetas_y_sigue_paginas(tmp_path):
+    mirror = FolderMirror(str(tmp_path / "m.db"), "s", "d")
+    pages = {"first": _page([ROOT, BASE], next_link="next"), "next": _page([ENERO, PDF])}
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return pages["next"] if url == "next" else pages["first"]
+
+    assert mirror.sync(fetch) == 4
+    assert [c["name"] for c in mirror.children("b")] == ["01. ENERO"]
+    assert mirror.resolve_path("2025/01. enero")["id"] == "m1"
+
+    # La siguiente corrida parte del deltaLink guardado y aplica bajas
+    deleted = {"id": "m1", "deleted": {}, "parentReference": {"id": "b"}}
+    mirror.sync(lambda url: calls.append(url) or _page([deleted], delta_link="https://graph/delta?token=3"))
+    assert calls[-1] == "https://graph/delta?token=2"
+    assert mirror.children("b") == []
+    mirror.close()
+
+
+def test_delta_link_vencido_resincroniza_completo(tmp_path):
+    mirror = FolderMirror(str(tmp_path / "m.db"), "s", "d")
+    mirror.sync(lambda url: _page([ROOT, BASE, ENERO]))
+    urls = []
+
+    def fetch(url):
+        urls.append(url)
+        if len(urls) == 1:
+            raise _gone()
+        return _page([ROOT, BASE])
+
+    mirror.sync(fetch)
+    assert urls[0] == "https://graph/delta?token=2"
+    assert "/root/delta" in urls[1]
+    # La carpeta que ya no vino en la carga completa no queda en el espejo
+    assert mirror.children("b") == []
+    mirror.close()
+
+
+def test_items_del_espejo_tienen_facet_folder(tmp_path):
+    mirror = FolderMirror(str(tmp_path / "m.db"), "s", "d")
+    mirror.sync(lambda url: _page([ROOT, BASE, ENERO]))
+    item = mirror.get_item("b")
+    assert item == {"id": "b", "name": "2025", "folder": {"childCount": 2}, "webUrl": None,
+                    "parentReference": {"id": "root"}}
+    assert item.get("folder")  # los llamadores filtran carpetas así
+    mirror.close()
+
+
+def test_espejo_e_indice_en_vivo_coinciden(tmp_path, graph, client):
+    base = "LJC/2025"
+    for mes in ("01. ENERO", "02. FEBRERO"):
+        graph.drive.seed(f"{base}/{mes}", [f"0701-{i:05d} CLIENTE {i}" for i in range(5)])
+    graph.drive.add(graph.drive.by_path(f"{base}/01. ENERO")["id"], "suelto.pdf", folder=False)
+
+    live_base = bulk.resolve_base_folder(client, SITE_ID, DRIVE_ID, base)
+    mirror = FolderMirror(str(tmp_path / "m.db"), SITE_ID, DRIVE_ID)
+    mirror.sync(client.get)
+    mirror_base = bulk.resolve_base_folder(client, SITE_ID, DRIVE_ID, base, mirror)
+    assert mirror_base["id"] == live_base["id"]
+
+    def names(index):
+        return sorted(it["name"] for it in index.items)
+
+    live = bulk.index_child_folders(client, SITE_ID, DRIVE_ID, live_base["id"])
+    mirrored = bulk.index_child_folders(client, SITE_ID, DRIVE_ID, live_base["id"], mirror)
+    assert names(mirrored) == names(live) == ["01. ENERO", "02. FEBRERO"]
+
+    month_ids = [live.exact(m)["id"] for m in ("01. ENERO", "02. FEBRERO")]
+    live_many = bulk.list_child_folders_many(client, SITE_ID, DRIVE_ID, month_ids)
+    mirrored_many = bulk.list_child_folders_many(client, SITE_ID, DRIVE_ID, month_ids, mirror)
+    for mid in month_ids:
+        assert len(live_many[mid]) == 5
+        assert sorted((f["name"], f["id"]) for f in mirrored_many[mid]) == \
+               sorted((f["name"], f["id"]) for f in live_many[mid])
+    mirror.close()
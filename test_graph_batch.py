@@ -0,0 +1,82 @@
+import pytest
+
+import bulk_copy_sharepoint_graph as bulk
+import graph_batch
+from graph_batch import batch_get, batch_list
+from mock_graph import SITE_ID
+from site_cache import SiteNotFound
+
+
+class FakeBatch:
+    """POST /$batch simulado: `script[url]` es la lista de (status, headers, body) a devolver en orden."""
+
+    def __init__(self, script):
+        self.script = {url: list(steps) for url, steps in script.items()}
+        self.batches = []
+        self.fetched = []
+
+    def post(self, url, payload):
+        self.batches.append([r["url"] for r in payload["requests"]])
+        responses = []
+        for r in payload["requests"]:
+            status, headers, body = self.script[r["url"]].pop(0)
+            responses.append({"id": r["id"], "status": status, "headers": headers, "body": body})
+        return {"responses": responses}
+
+    def fetch(self, url):
+        self.fetched.append(url)
+        return {"fetched": url}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(graph_batch.time, "sleep", calls.append)
+    return calls
+
+
+def test_throttling_vuelve_al_batch_tras_retry_after(sleeps):
+    fake = FakeBatch({
+        "/a": [(200, {}, {"v": "a"})],
+        "/b": [(429, {"Retry-After": "3"}, None), (503, {"retry-after": "1"}, None), (200, {}, {"v": "b"})],
+        "/c": [(404, {}, None)],
+    })
+    assert batch_get(fake.post, fake.fetch, ["/a", "/b", "/c"]) == [{"v": "a"}, {"v": "b"}, None]
+    assert fake.batches == [["/a", "/b", "/c"], ["/b"], ["/b"]]
+    assert sleeps == [3.0, 1.0]
+    assert fake.fetched == []
+
+
+def test_reintentos_agotados_y_errores_definitivos_se_piden_solos(sleeps):
+    fake = FakeBatch({
+        "/t": [(429, {"Retry-After": "0"}, None)] * (graph_batch.MAX_BATCH_RETRIES + 1),
+        "/f": [(403, {}, None)],
+    })
+    assert batch_get(fake.post, fake.fetch, ["/t", "/f"]) == [{"fetched": "/t"}, {"fetched": "/f"}]
+    assert len(fake.batches) == graph_batch.MAX_BATCH_RETRIES + 1
+    assert sorted(fake.fetched) == ["/f", "/t"]
+
+
+def test_batch_list_sigue_next_link_y_reintenta(sleeps):
+    fake = FakeBatch({
+        "/x": [(200, {}, {"value": [1], "@odata.nextLink": "/x2"})],
+        "/x2": [(429, {"Retry-After": "2"}, None), (200, {}, {"value": [2]})],
+    })
+    assert batch_list(fake.post, fake.fetch, ["/x"]) == [[1, 2]]
+    assert sleeps == [2.0]
+
+
+def test_batch_contra_mock_con_throttling(graph, client, sleeps):
+    graph.drive.seed("A", [f"0701-{i:05d}" for i in range(30)])
+    graph.throttle_rate, graph.retry_after = 0.3, 0.0
+    try:
+        base = bulk.ensure_path_exists(client, SITE_ID, "mock-drive", "A")
+        kids = bulk.list_children_many(client, SITE_ID, "mock-drive", [base["id"]] * 25)
+    finally:
+        graph.throttle_rate = 0.0
+    assert all(len(items) == 30 for items in kids.values())
+
+
+def test_ensure_path_exists_con_drive_inexistente(graph, client):
+    with pytest.raises(SiteNotFound):
+        bulk.ensure_path_exists(client, SITE_ID, "otro-drive", "A/B")
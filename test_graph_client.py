@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+import graph_client
+from graph_client import GraphClient, RetryPolicy
+
+
+def _response(status, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    r._content = b"{}"
+    r.request = requests.Request("POST", "http://graph.local/x").prepare()
+    return r
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """Cliente cuyo transporte devuelve `outcomes` en orden (status o excepción)."""
+    monkeypatch.setattr(graph_client.time, "sleep", lambda s: None)
+    client = GraphClient("t", retry=RetryPolicy(max_attempts=4, base_delay=0))
+    calls = []
+
+    def install(*outcomes):
+        seq = list(outcomes)
+
+        def request(method, url, **kw):
+            calls.append(method)
+            out = seq.pop(0)
+            if isinstance(out, Exception):
+                raise out
+            return _response(*out) if isinstance(out, tuple) else _response(out)
+
+        client.session.request = request
+        return client
+
+    install.calls = calls
+    return install
+
+
+def test_get_se_reintenta_ante_5xx(fake):
+    assert fake(503, 500, 200).get("http://graph.local/x") == {}
+    assert fake.calls == ["GET"] * 3
+
+
+def test_post_no_se_reintenta_ante_5xx(fake):
+    with pytest.raises(requests.HTTPError):
+        fake(503, 200).request("POST", "http://graph.local/copy", json={})
+    assert fake.calls == ["POST"]
+
+
+def test_post_no_se_reintenta_si_se_corta_la_conexion(fake):
+    with pytest.raises(requests.ConnectionError):
+        fake(requests.ConnectionError("reset"), 200).post("http://graph.local/children", {})
+    assert fake.calls == ["POST"]
+
+
+def test_post_se_reintenta_ante_429_y_sin_conectar(fake):
+    client = fake((429, {"Retry-After": "0"}), requests.ConnectTimeout("sin conexión"), 202)
+    assert client.request("POST", "http://graph.local/copy", json={}).status_code == 202
+    assert fake.calls == ["POST"] * 3
+
+
+def test_post_idempotente_se_reintenta_ante_5xx(fake):
+    assert fake(502, requests.ReadTimeout("lento"), 200).post("http://graph.local/$batch", {}, idempotent=True) == {}
+    assert fake.calls == ["POST"] * 3
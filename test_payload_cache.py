@@ -0,0 +1,28 @@
+import requests
+
+from payload_cache import PayloadCache
+
+
+def test_archivo_vacio_se_envia_con_content_length_0(tmp_path):
+    empty = tmp_path / "vacio.pdf"
+    empty.write_bytes(b"")
+    cache = PayloadCache()
+    with cache.open(empty) as body:
+        assert body == b"" and isinstance(body, bytes)
+        headers = requests.Request("PUT", "http://graph.local/x", data=body).prepare().headers
+    assert headers.get("Content-Length") == "0"
+    assert "Transfer-Encoding" not in headers
+
+
+def test_un_mapeo_compartido_hasta_la_ultima_subida(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"0123456789")
+    cache = PayloadCache()
+    cache.retain(pdf, 2)
+    with cache.open(pdf) as first:
+        assert bytes(first) == b"0123456789"
+    entry = cache._entries[cache._key(pdf)]
+    assert entry.mm is not None and entry.pending == 1
+    with cache.open(pdf) as second:
+        assert bytes(second[:4]) == b"0123"
+    assert cache._entries == {}
@@ -0,0 +1,72 @@
+import base64
+import random
+
+from quickxorhash import QuickXorHash, hash_files, quickxorhash_file
+
+
+def reference_quickxorhash(chunks) -> str:
+    """Port directo de la implementación de referencia de Microsoft (C#, celdas de 64 bits)."""
+    width, shift, mask = 160, 11, (1 << 64) - 1
+    cells = [0, 0, 0]
+    shift_so_far = 0
+    length = 0
+    for array in chunks:
+        size = len(array)
+        index, offset = shift_so_far // 64, shift_so_far % 64
+        for i in range(min(size, width)):
+            last = index == len(cells) - 1
+            bits = 32 if last else 64
+            if offset <= bits - 8:
+                for j in range(i, size, width):
+                    cells[index] = (cells[index] ^ (array[j] << offset)) & mask
+            else:
+                other = 0 if last else index + 1
+                xored = 0
+                for j in range(i, size, width):
+                    xored ^= array[j]
+                cells[index] = (cells[index] ^ (xored << offset)) & mask
+                cells[other] ^= xored >> (bits - offset)
+            offset += shift
+            while offset >= bits:
+                index = 0 if last else index + 1
+                offset -= bits
+        shift_so_far = (shift_so_far + shift * (size % width)) % width
+        length += size
+    out = bytearray(cells[0].to_bytes(8, "little") + cells[1].to_bytes(8, "little")
+                    + (cells[2] & 0xFFFFFFFF).to_bytes(4, "little"))
+    for i, b in enumerate(length.to_bytes(8, "little")):
+        out[12 + i] ^= b
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+
+def test_vector_conocido_vacio():
+    assert QuickXorHash().b64digest() == "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
+
+
+def test_coincide_con_la_referencia():
+    rnd = random.Random(7)
+    for size in (1, 5, 159, 160, 161, 320, 1000, 20_000):
+        data = bytes(rnd.getrandbits(8) for _ in range(size))
+        assert QuickXorHash().update(data).b64digest() == reference_quickxorhash([data]), size
+
+
+def test_actualizaciones_parciales_dan_el_mismo_hash():
+    rnd = random.Random(3)
+    data = bytes(rnd.getrandbits(8) for _ in range(5000))
+    cuts = [0, 7, 160, 161, 1999, 4000, 5000]
+    chunks = [data[a:b] for a, b in zip(cuts, cuts[1:])]
+    h = QuickXorHash()
+    for chunk in chunks:
+        h.update(chunk)
+    assert h.b64digest() == QuickXorHash().update(data).b64digest() == reference_quickxorhash(chunks)
+
+
+def test_archivos(tmp_path):
+    paths = []
+    for n in range(3):
+        p = tmp_path / f"{n}.bin"
+        p.write_bytes(bytes(range(n * 50 % 256)) * (n + 1))
+        paths.append(p)
+    hashes = hash_files(paths)
+    for p in paths:
+        assert hashes[str(p)] == quickxorhash_file(p) == reference_quickxorhash([p.read_bytes()])
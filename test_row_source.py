@@ -0,0 +1,51 @@
+import json
+import os
+
+import row_source
+from row_source import read_rows
+
+
+def _csv(path, rows):
+    path.write_text("CARPETAS;COMPROBANTE\n" + "".join(f"{a};{b}\n" for a, b in rows), encoding="utf-8")
+    return path
+
+
+def test_cache_en_json_y_reutilizada(tmp_path, monkeypatch):
+    src = _csv(tmp_path / "in.csv", [("001", "F1"), ("", "F2")])
+    cache = tmp_path / "cache"
+    first = read_rows(src, ["CARPETAS", "COMPROBANTE"], cache_dir=cache)
+    files = list(cache.glob("*.json"))
+    assert len(files) == 1 and not list(cache.glob("*.pkl"))
+    assert json.loads(files[0].read_text(encoding="utf-8"))["data"]["CARPETAS"] == ["001", ""]
+
+    monkeypatch.setattr(row_source, "_read_frame", lambda *a: (_ for _ in ()).throw(AssertionError("releída")))
+    second = read_rows(src, ["CARPETAS", "COMPROBANTE"], cache_dir=cache)
+    assert second.equals(first)
+    assert second["CARPETAS"].tolist() == ["001", ""]
+
+
+def test_cache_por_defecto_fuera_del_directorio_de_trabajo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GRAPH_ROW_CACHE", str(tmp_path / "user_cache"))
+    read_rows(_csv(tmp_path / "in.csv", [("001", "F1")]), ["CARPETAS"])
+    assert not (tmp_path / ".row_cache").exists()
+    assert len(list((tmp_path / "user_cache").glob("*.json"))) == 1
+
+
+def test_desaloja_las_entradas_mas_viejas(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_source, "ROW_CACHE_MAX_ENTRIES", 2)
+    cache = tmp_path / "cache"
+    for i in range(4):
+        read_rows(_csv(tmp_path / f"in{i}.csv", [(str(i), "F")]), ["CARPETAS"], cache_dir=cache)
+        for f in cache.glob("*.json"):
+            st = f.stat()
+            os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))  # las previas, más viejas
+    assert len(list(cache.glob("*.json"))) == 2
+
+
+def test_entrada_corrupta_se_reconstruye(tmp_path):
+    src = _csv(tmp_path / "in.csv", [("001", "F1")])
+    cache = tmp_path / "cache"
+    read_rows(src, ["CARPETAS"], cache_dir=cache)
+    next(cache.glob("*.json")).write_text("{no es json", encoding="utf-8")
+    assert read_rows(src, ["CARPETAS"], cache_dir=cache)["CARPETAS"].tolist() == ["001"]
@@ -0,0 +1,77 @@
+import bulk_copy_sharepoint_graph as bulk
+from mock_graph import DRIVE_ID, SITE_ID
+from run_journal import RunJournal, journal_path_for, shard_journal_path
+
+
+def test_bitacora_nueva_registra_y_se_reanuda(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"x")
+    path = journal_path_for(tmp_path / "masivo.xlsx")
+    assert path.name == "masivo.journal.jsonl"
+
+    journal = RunJournal(path)
+    assert journal  # una bitácora vacía no debe evaluar como falsa
+    journal.record(1, "f1", pdf)
+    journal.close()
+
+    again = RunJournal(path)
+    assert again.is_done(1, "f1", pdf)
+    assert not again.is_done(2, "f1", pdf)
+    again.close()
+
+
+def test_linea_cortada_y_archivo_reemplazado(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"x")
+    path = tmp_path / "r.journal.jsonl"
+    journal = RunJournal(path)
+    journal.record(1, "f1", pdf)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"row": "2", "folder_')  # corte a mitad de escritura
+
+    journal = RunJournal(path)
+    journal.record(3, "f1", pdf)
+    journal.close()
+    journal = RunJournal(path)
+    assert journal.is_done(1, "f1", pdf) and journal.is_done(3, "f1", pdf)
+    journal.close()
+
+    pdf.write_bytes(b"otro contenido")  # cambia la huella: hay que volver a subir
+    assert not RunJournal(path).is_done(1, "f1", pdf)
+
+
+def test_absorb_junta_bitacoras_de_shards(tmp_path):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"x")
+    main_path = tmp_path / "masivo.journal.jsonl"
+    shard_path = shard_journal_path(main_path, (2, 4))
+    assert shard_path.name == "masivo.shard2of4.journal.jsonl"
+    shard = RunJournal(shard_path)
+    shard.record(1, "f1", pdf)
+    shard.record(2, "f2", pdf)
+    shard.close()
+    main = RunJournal(main_path)
+    main.record(1, "f1", pdf)
+    assert main.absorb(shard_path) == 1
+    assert main.absorb(shard_path) == 0
+    main.close()
+    assert RunJournal(main_path).is_done(2, "f2", pdf)
+
+
+def test_resume_omite_lo_ya_subido(graph, client, tmp_path):
+    base = graph.drive.seed("A", ["0701-1", "0701-2"])
+    folders = [graph.drive.items[cid] for cid in graph.drive.children[base["id"]]]
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    tasks = [{"row": n, "local_path": pdf, "mes": "A", "folder": f} for n, f in enumerate(folders)]
+    path = tmp_path / "j.journal.jsonl"
+
+    journal = RunJournal(path)
+    assert bulk.execute_uploads(client, SITE_ID, DRIVE_ID, "A", tasks[:1], dry=False, journal=journal) == 1
+    journal.close()
+
+    journal = RunJournal(path)
+    pending = bulk.skip_journaled(tasks, journal)
+    assert [t["row"] for t in pending] == [1]
+    journal.close()
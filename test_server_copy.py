@@ -0,0 +1,106 @@
+import io
+import sys
+import threading
+
+import pytest
+import requests
+
+import bulk_copy_sharepoint_graph as bulk
+from graph_metrics import GraphMetrics
+from mock_graph import DRIVE_ID, SITE_ID
+from progress_events import EventStream, LockedStdout, parse_event
+
+
+@pytest.fixture
+def events(monkeypatch):
+    buf = io.StringIO()
+    stream = EventStream(buf)
+    stream.enabled = True
+    monkeypatch.setattr(bulk, "EVENTS", stream)
+    return lambda: [parse_event(line) for line in buf.getvalue().splitlines()]
+
+
+def test_server_copy_emite_started_y_mide_cada_copia(graph, client, tmp_path, events, monkeypatch):
+    metrics = GraphMetrics()
+    monkeypatch.setattr(bulk, "METRICS", metrics)
+    graph.copy_delay = 0.0
+    base = graph.drive.seed("A", [f"0701-{i:05d}" for i in range(3)])
+    folders = [graph.drive.items[cid] for cid in graph.drive.children[base["id"]]]
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF" * 10)
+    tasks = [{"row": n, "local_path": pdf, "mes": "A", "folder": f} for n, f in enumerate(folders)]
+
+    assert bulk.execute_server_copies(client, SITE_ID, DRIVE_ID, "A", tasks) == 3
+
+    evs = events()
+    assert sorted(e["row"] for e in evs if e["event"] == "started") == [0, 1, 2]
+    assert sorted(e["row"] for e in evs if e["event"] == "uploaded") == [0, 1, 2]
+    for row in range(3):
+        kinds = [e["event"] for e in evs if e["row"] == row]
+        assert kinds == ["started", "uploaded"]
+    assert metrics.snapshot()["uploads"]["count"] == 3
+    assert all(len(graph.drive.children[f["id"]]) == 1 for f in folders)
+
+
+def test_sin_events_no_se_hace_stat(graph, client, tmp_path, monkeypatch):
+    base = graph.drive.seed("A", ["0701-1"])
+    folder = graph.drive.items[graph.drive.children[base["id"]][0]]
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    monkeypatch.setattr(bulk, "EVENTS", EventStream(io.StringIO()))
+    monkeypatch.setattr(bulk, "task_event", lambda t: pytest.fail("task_event sin --events"))
+    task = {"row": 0, "local_path": pdf, "mes": "A", "folder": folder}
+    assert bulk.upload_task(client, SITE_ID, DRIVE_ID, task)["size"] == 4
+
+
+def test_dry_no_emite_planned(graph, client, tmp_path, events):
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    tasks = [{"row": 0, "local_path": pdf, "mes": "A", "folder": {"id": "f", "name": "c"}}]
+    assert bulk.run_tasks(client, SITE_ID, DRIVE_ID, "A", tasks, dry=True) == 0
+    assert [e["event"] for e in events()] == ["finished"]
+
+
+def test_prints_y_eventos_de_varios_hilos_no_se_mezclan(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", out)
+    stream = EventStream()
+    stream.enable()
+    assert isinstance(sys.stdout, LockedStdout)
+
+    def worker(n):
+        for i in range(200):
+            print(f"  ✅ hilo {n} subida {i}", "x" * 50)
+            stream.emit("uploaded", row=i, file=f"f{n}-{i}.pdf", folder="A" * 80)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 8 * 200 * 2
+    events = [line for line in lines if line.startswith("@event")]
+    assert len(events) == 8 * 200
+    assert all(parse_event(line) and parse_event(line)["event"] == "uploaded" for line in events)
+    assert all(line.startswith("  ✅ hilo ") and line.endswith("x" * 50) for line in lines if not line.startswith("@event"))
+
+
+def test_respaldo_de_copia_fallida_emite_started_una_sola_vez(graph, client, tmp_path, events, monkeypatch):
+    base = graph.drive.seed("A", ["0701-1", "0701-2"])
+    folders = [graph.drive.items[cid] for cid in graph.drive.children[base["id"]]]
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF")
+    tasks = [{"row": n, "local_path": pdf, "mes": "A", "folder": f} for n, f in enumerate(folders)]
+
+    def no_copy(*a, **k):
+        raise requests.ConnectionError("sin /copy")
+
+    monkeypatch.setattr(bulk, "start_copy", no_copy)
+    assert bulk.execute_server_copies(client, SITE_ID, DRIVE_ID, "A", tasks, workers=2) == 2
+
+    evs = events()
+    for row in range(2):
+        assert [e["event"] for e in evs if e["row"] == row] == ["started", "uploaded"]
+    assert all(len(graph.drive.children[f["id"]]) == 1 for f in folders)
@@ -0,0 +1,150 @@
+import json
+
+import pytest
+import requests
+
+import bulk_copy_sharepoint_graph as bulk
+import site_cache
+from mock_graph import DRIVE_ID, SITE_ID
+from site_cache import SiteCache, SiteNotFound
+
+KEY = ("Mock.SharePoint.com", "/sites/Bench/", "Facturas")
+
+
+def _not_found():
+    resp = requests.Response()
+    resp.status_code = 404
+    return requests.HTTPError("404", response=resp)
+
+
+class Resolver:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.answers.pop(0)
+
+
+def test_persistencia_y_vencimiento(tmp_path, monkeypatch):
+    path = tmp_path / "sc.json"
+    now = [1000.0]
+    monkeypatch.setattr(site_cache.time, "time", lambda: now[0])
+    resolver = Resolver({"site_id": "s1", "drive_id": "d1"}, {"site_id": "s1", "drive_id": "d2"})
+
+    assert SiteCache(path, ttl=60).resolve(*KEY, resolver) == ({"site_id": "s1", "drive_id": "d1"}, False)
+    # Otro proceso: la clave no distingue mayúsculas ni la barra final
+    assert SiteCache(path, ttl=60).resolve("mock.sharepoint.com", "sites/bench", "facturas", resolver)[1] is True
+    assert resolver.calls == 1
+
+    now[0] += 61
+    ids, cached = SiteCache(path, ttl=60).resolve(*KEY, resolver)
+    assert (ids["drive_id"], cached, resolver.calls) == ("d2", False, 2)
+    assert json.loads(path.read_text(encoding="utf-8"))[SiteCache.key(*KEY)]["drive_id"] == "d2"
+
+
+def test_sin_archivo_no_persiste(tmp_path):
+    cache = SiteCache(None)
+    resolver = Resolver({"site_id": "s", "drive_id": "d"}, {"site_id": "s", "drive_id": "d"})
+    cache.resolve(*KEY, resolver)
+    assert SiteCache(None).get(*KEY) is None
+
+
+def test_404_con_ids_de_la_cache_revalida_y_reintenta(tmp_path, capsys):
+    path = tmp_path / "sc.json"
+    SiteCache(path).put(*KEY, {"site_id": "s1", "drive_id": "viejo"})
+    resolver = Resolver({"site_id": "s1", "drive_id": "nuevo"})
+    seen = []
+
+    def work(ids):
+        seen.append(ids["drive_id"])
+        if ids["drive_id"] == "viejo":
+            raise SiteNotFound("404 en $batch")
+        return "ok"
+
+    assert SiteCache(path).call(*KEY, resolver, work) == "ok"
+    assert seen == ["viejo", "nuevo"]
+    assert SiteCache(path).get(*KEY)["drive_id"] == "nuevo"
+    assert "cambió de id" in capsys.readouterr().out
+
+
+def test_404_sin_cambio_de_ids_o_sin_cache_se_propaga(tmp_path):
+    path = tmp_path / "sc.json"
+    SiteCache(path).put(*KEY, {"site_id": "s", "drive_id": "d"})
+
+    def work(ids):
+        raise _not_found()
+
+    resolver = Resolver({"site_id": "s", "drive_id": "d"})
+    with pytest.raises(requests.HTTPError):
+        SiteCache(path).call(*KEY, resolver, work)
+    assert resolver.calls == 1  # revalidó una vez; los ids no cambiaron
+
+    fresh = Resolver({"site_id": "s", "drive_id": "d"})
+    with pytest.raises(requests.HTTPError):
+        SiteCache(tmp_path / "otro.json").call(*KEY, fresh, work)
+    assert fresh.calls == 1  # ids recién resueltos: nada que revalidar
+
+
+def test_otros_errores_no_revalidan(tmp_path):
+    path = tmp_path / "sc.json"
+    SiteCache(path).put(*KEY, {"site_id": "s", "drive_id": "d"})
+    resolver = Resolver()
+
+    def work(ids):
+        raise ValueError("otro error")
+
+    with pytest.raises(ValueError):
+        SiteCache(path).call(*KEY, resolver, work)
+    assert resolver.calls == 0
+
+
+def test_drive_recreado_contra_el_mock(graph, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "SITE_HOSTNAME", "mock.sharepoint.com")
+    monkeypatch.setattr(bulk, "SITE_REL_PATH", "/sites/Bench")
+    monkeypatch.setattr(bulk, "DRIVE_NAME", "Facturas")
+    cache = SiteCache(tmp_path / "sc.json")
+    monkeypatch.setattr(bulk, "SITE_CACHE", cache)
+    graph.drive.seed("A/01. ENERO", [])
+    cache.put("mock.sharepoint.com", "/sites/Bench", "Facturas", {"site_id": SITE_ID, "drive_id": "drive-borrado"})
+
+    base = cache.call("mock.sharepoint.com", "/sites/Bench", "Facturas",
+                      lambda: bulk.lookup_site_and_drive(client),
+                      lambda ids: bulk.ensure_path_exists(client, ids["site_id"], ids["drive_id"], "A"))
+    assert base["name"] == "A"
+    assert bulk.resolve_site_and_drive(client) == {"site_id": SITE_ID, "drive_id": DRIVE_ID}
+
+
+def test_run_valida_ids_de_la_cache_una_vez_antes_de_empezar(graph, client, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bulk, "SITE_HOSTNAME", "mock.sharepoint.com")
+    monkeypatch.setattr(bulk, "SITE_REL_PATH", "/sites/Bench")
+    monkeypatch.setattr(bulk, "DRIVE_NAME", "Facturas")
+    cache = SiteCache(tmp_path / "sc.json")
+    monkeypatch.setattr(bulk, "SITE_CACHE", cache)
+    cache.put("mock.sharepoint.com", "/sites/Bench", "Facturas", {"site_id": SITE_ID, "drive_id": "drive-borrado"})
+    seen = []
+
+    def run_mode(args, client, ids):
+        seen.append(ids["drive_id"])
+        raise _not_found()  # un 404 de la corrida ya no la relanza entera
+
+    monkeypatch.setattr(bulk, "run_mode", run_mode)
+    with pytest.raises(requests.HTTPError):
+        bulk.run(type("Args", (), {"execute": None})(), client)
+    assert seen == [DRIVE_ID]
+    assert "cambió de id" in capsys.readouterr().out
+
+    # Ids vigentes: se validan con un GET al root y no se vuelven a resolver
+    resolver = Resolver()
+    checks = []
+    ids = cache.resolve_checked("mock.sharepoint.com", "/sites/Bench", "Facturas", resolver,
+                                lambda ids: checks.append(bulk.check_drive(client, ids)))
+    assert ids == {"site_id": SITE_ID, "drive_id": DRIVE_ID}
+    assert checks[0]["id"] == "root" and resolver.calls == 0
+
+
+def test_ids_recien_resueltos_no_se_validan(tmp_path):
+    resolver = Resolver({"site_id": "s", "drive_id": "d"})
+    ids = SiteCache(tmp_path / "sc.json").resolve_checked(*KEY, resolver, lambda ids: pytest.fail("validó"))
+    assert ids == {"site_id": "s", "drive_id": "d"}
@@ -0,0 +1,42 @@
+import os
+
+from upload_session import CHUNK_UNIT, MAX_CHUNK, UploadSessionStore, next_chunk_size
+
+
+def test_el_store_no_lee_el_disco_al_crearse(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = UploadSessionStore()
+    assert store.path is None and store._data is None
+
+    workdir = tmp_path / "corrida"
+    workdir.mkdir()
+    (workdir / ".upload_sessions.json").write_text('{"k": {"uploadUrl": "u"}}', encoding="utf-8")
+    os.chdir(workdir)  # la ruta relativa se resuelve en el primer uso
+    assert store.get("k") == {"uploadUrl": "u"}
+    assert store.path == (workdir / ".upload_sessions.json").resolve()
+
+    store.put("k2", {"uploadUrl": "v"})
+    store.delete("k")
+    assert UploadSessionStore(workdir / ".upload_sessions.json").get("k2") == {"uploadUrl": "v"}
+    assert not (tmp_path / ".upload_sessions.json").exists()
+
+
+def test_trozos_multiplos_de_320k():
+    size = next_chunk_size(CHUNK_UNIT, CHUNK_UNIT * 10, 1.0)
+    assert size % CHUNK_UNIT == 0 and size == CHUNK_UNIT * 2
+    assert next_chunk_size(MAX_CHUNK, MAX_CHUNK, 0.01) == MAX_CHUNK
+
+
+def test_sesiones_concurrentes_contra_el_mock(graph, client, tmp_path, monkeypatch):
+    import bulk_copy_sharepoint_graph as bulk
+    from mock_graph import DRIVE_ID, SITE_ID
+
+    monkeypatch.setattr(bulk, "LARGE_FILE_THRESHOLD", 1)  # todo por upload session
+    monkeypatch.setattr(bulk, "SESSIONS", UploadSessionStore(tmp_path / "s.json"))
+    base = graph.drive.seed("A", [f"0701-{i:05d}" for i in range(40)])
+    folders = [graph.drive.items[cid] for cid in graph.drive.children[base["id"]]]
+    pdf = tmp_path / "m.pdf"
+    pdf.write_bytes(b"%PDF" * 1000)
+    tasks = [{"row": n, "local_path": pdf, "mes": "A", "folder": f} for n, f in enumerate(folders)]
+    assert bulk.execute_uploads(client, SITE_ID, DRIVE_ID, "A", tasks, dry=False, workers=8) == 40
+    assert all(len(graph.drive.children[f["id"]]) == 1 for f in folders)
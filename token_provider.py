@@ -0,0 +1,108 @@
+# token_provider.py
+"""
+Token app-only de Graph con caché MSAL persistida en disco.
+
+Invocaciones repetidas (p.ej. desde la UI) reutilizan el token guardado sin
+volver a pedirlo a Entra ID, y un hilo en segundo plano lo renueva antes de
+que expire para que las corridas largas no se queden con un token vencido.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+SCOPES = ["https://graph.microsoft.com/.default"]
+DEFAULT_TOKEN_CACHE = ".msal_token_cache.json"
+
+# MSAL descarta de su caché los tokens con < 5 min de vida; renovar justo después
+REFRESH_MARGIN = 240
+
+
+class TokenProvider:
+    """
+    Se usa como función: `provider()` devuelve un access token vigente.
+    Se puede pasar directamente como `token` de GraphClient.
+    """
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str,
+                 cache_path: Optional[str] = DEFAULT_TOKEN_CACHE):
+        import msal  # import pesado (cryptography): solo cuando de verdad se pide un token
+
+        self._msal = msal
+        self.cache_path = cache_path
+        self.cache = msal.SerializableTokenCache()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self.cache.deserialize(f.read())
+            except (OSError, ValueError):
+                pass  # caché corrupta: se pide un token nuevo
+        self.app = msal.ConfidentialClientApplication(
+            client_id,
+            authority=f"https://login.microsoftonline.com/{tenant_id}",
+            client_credential=client_secret,
+            token_cache=self.cache,
+        )
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at - REFRESH_MARGIN:
+                self._acquire()
+            return self._token
+
+    def _acquire(self):
+        # acquire_token_for_client mira primero la caché (también la de disco)
+        tok = self.app.acquire_token_for_client(scopes=SCOPES)
+        if "access_token" not in tok:
+            raise RuntimeError(f"No se obtuvo token: {tok}")
+        self._token = tok["access_token"]
+        self._expires_at = time.time() + int(tok.get("expires_in", 3600))
+        self._persist()
+
+    def _persist(self):
+        if not self.cache_path or not self.cache.has_state_changed:
+            return
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.cache.serialize())
+        try:
+            os.chmod(tmp, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp, self.cache_path)
+        self.cache.has_state_changed = False
+
+    def force_refresh(self):
+        """Descarta el token en memoria y en caché (p.ej. tras un 401)."""
+        with self._lock:
+            for at in self.cache.find(self._msal.TokenCache.CredentialType.ACCESS_TOKEN):
+                self.cache.remove_at(at)
+            self._token = None
+            self._acquire()
+
+    # ---------- renovación en segundo plano ----------
+    def start_background_refresh(self):
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="token-refresh", daemon=True)
+            self._refresher.start()
+        return self
+
+    def _refresh_loop(self):
+        while True:
+            wait = max(self._expires_at - REFRESH_MARGIN - time.time(), 30)
+            if self._stop.wait(wait):
+                break
+            try:
+                with self._lock:
+                    self._acquire()
+            except Exception as e:
+                # El siguiente pedido síncrono volverá a intentarlo
+                print(f"⚠️  No se pudo renovar el token en segundo plano: {e}")
+
+    def stop(self):
+        self._stop.set()
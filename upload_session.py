@@ -0,0 +1,173 @@
+# upload_session.py
+"""
+Subida de archivos grandes con upload sessions de Graph, reanudable.
+
+- La uploadUrl de cada sesión se guarda en disco (UploadSessionStore), así
+  un reintento o una nueva corrida continúa desde nextExpectedRanges en vez
+  de empezar de cero.
+- El tamaño de trozo se adapta al rendimiento medido, siempre múltiplo de
+  320 KiB (requisito de Graph) y sin pasar de 60 MiB por request.
+- Los trozos son vistas del mmap del archivo (PayloadCache): no se copian.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import requests
+
+from graph_client import GraphClient
+from payload_cache import PayloadCache
+
+PathLike = Union[str, Path]
+
+DEFAULT_SESSION_STORE = ".upload_sessions.json"
+
+CHUNK_UNIT = 320 * 1024           # Graph exige múltiplos de 320 KiB
+MIN_CHUNK = CHUNK_UNIT
+MAX_CHUNK = 192 * CHUNK_UNIT      # 60 MiB: máximo por request
+INITIAL_CHUNK = 16 * CHUNK_UNIT   # 5 MiB (lo que se usaba fijo)
+TARGET_SECONDS = 4.0              # duración deseada de cada trozo
+MAX_RESUMES = 5                   # reanudaciones seguidas sin avanzar antes de rendirse
+
+
+class UploadSessionStore:
+    """
+    Sesiones abiertas por archivo/destino, persistidas en un JSON.
+    Crear el store no toca el disco: el archivo se lee en el primer uso y
+    una ruta relativa se resuelve contra el directorio de ese momento.
+    """
+
+    def __init__(self, path: PathLike = DEFAULT_SESSION_STORE):
+        self._raw_path = Path(path)
+        self.path: Optional[Path] = None  # se fija en _load()
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._data is None:
+            self.path = self._raw_path.resolve()
+            self._data = {}
+            if self.path.exists():
+                try:
+                    self._data = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass  # archivo corrupto: las sesiones se vuelven a crear
+        return self._data
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._load()[key] = value
+            self._save()
+
+    def delete(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def next_chunk_size(current: int, sent: int, seconds: float) -> int:
+    """Ajusta el trozo para que tarde ~TARGET_SECONDS, redondeado a 320 KiB."""
+    if seconds <= 0:
+        return min(current * 2, MAX_CHUNK)
+    wanted = sent / seconds * TARGET_SECONDS
+    # No más que duplicar por paso: una medición suelta no debe disparar el tamaño
+    wanted = min(wanted, current * 2)
+    units = max(int(wanted // CHUNK_UNIT), 1)
+    return max(MIN_CHUNK, min(units * CHUNK_UNIT, MAX_CHUNK))
+
+
+def _first_expected(ranges) -> Optional[int]:
+    """'nextExpectedRanges': ['26214400-'] → 26214400."""
+    if not ranges:
+        return None
+    return int(str(ranges[0]).split("-")[0])
+
+
+def upload_resumable(client: GraphClient, create_url: str, file_path: PathLike,
+                     store: Optional[UploadSessionStore] = None, payloads: Optional[PayloadCache] = None,
+                     chunk_size: int = INITIAL_CHUNK, conflict_behavior: str = "replace") -> Dict:
+    """
+    Sube `file_path` usando la sesión de `create_url` (…:/createUploadSession).
+    Si `store` tiene una sesión vigente para el mismo archivo, la retoma.
+    Devuelve el driveItem final.
+    """
+    payloads = payloads or PayloadCache()
+    st = os.stat(file_path)
+    size = st.st_size
+    key = f"{create_url}|{st.st_size}:{st.st_mtime_ns}"
+    chunk_size = max(MIN_CHUNK, chunk_size - chunk_size % CHUNK_UNIT)
+
+    def _new_session() -> str:
+        body = {"item": {"@microsoft.graph.conflictBehavior": conflict_behavior}}
+        # Una sesión repetida no crea nada: solo queda sin usar hasta que expira
+        session = client.post(create_url, body, idempotent=True)
+        if store:
+            store.put(key, {"uploadUrl": session["uploadUrl"],
+                            "expirationDateTime": session.get("expirationDateTime")})
+        return session["uploadUrl"]
+
+    def _resume_offset(url: str) -> Optional[int]:
+        """Consulta la sesión; None si ya no existe (expiró o se completó)."""
+        try:
+            status = client.get(url, auth=False)
+        except requests.HTTPError:
+            return None
+        return _first_expected(status.get("nextExpectedRanges")) or 0
+
+    saved = store.get(key) if store else None
+    upload_url = saved["uploadUrl"] if saved else None
+    start = _resume_offset(upload_url) if upload_url else None
+    if start is None:
+        upload_url, start = _new_session(), 0
+    elif start:
+        print(f"  ↻ Reanudando '{Path(file_path).name}' desde {start / 1048576:.1f} MiB")
+
+    resumes = 0
+    with payloads.open(file_path) as view:
+        while True:
+            end = min(start + chunk_size, size) - 1
+            chunk = view[start:end + 1]
+            headers = {"Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"}
+            t0 = time.monotonic()
+            try:
+                # uploadUrl ya viene pre-autenticada: sin Authorization
+                r = client.request("PUT", upload_url, auth=False, headers=headers, data=chunk,
+                                   ok_statuses=(200, 201, 202))
+            except requests.RequestException:
+                # Corte de red o error persistente: preguntar a la sesión dónde quedó
+                resumes += 1
+                offset = _resume_offset(upload_url)
+                if resumes > MAX_RESUMES:
+                    raise
+                if offset is None:
+                    upload_url, start = _new_session(), 0
+                else:
+                    start = offset
+                chunk_size = max(MIN_CHUNK, chunk_size // 2 // CHUNK_UNIT * CHUNK_UNIT)
+                continue
+            finally:
+                chunk.release()
+
+            if r.status_code in (200, 201):
+                if store:
+                    store.delete(key)
+                return r.json()
+
+            resumes = 0
+            chunk_size = next_chunk_size(chunk_size, end - start + 1, time.monotonic() - t0)
+            expected = _first_expected(r.json().get("nextExpectedRanges") if r.content else None)
+            start = expected if expected is not None else end + 1
+            if start >= size:
+                raise RuntimeError("Upload session no confirmó finalización.")